@@ -0,0 +1,102 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (a.k.a. seek) pagination.
+
+    Rows are ordered on the view's `keyset_ordering`, a tuple of fields that
+    ends in a unique one, e.g. ('date', 'start_time', 'id'). The cursor is
+    the key of the last row served, and the next page is fetched with
+    WHERE (date, start_time, id) > cursor, so every page costs the same
+    index range scan however deep into the list it is, unlike OFFSET.
+
+    paginate_queryset() returns the page as a lazy, sliced queryset holding
+    one extra row; the caller evaluates it and passes the rows together with
+    their keys to get_paginated_response(), which trims the extra row and
+    uses its presence to decide whether there is a next page.
+    """
+    page_size = 100
+    max_page_size = 1000
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            key = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(key, list) or len(key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    def encode_cursor(self, key):
+        data = json.dumps(list(key), cls=JSONEncoder).encode('ascii')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def after(self, key):
+        """Q for rows strictly after `key` in lexicographic order."""
+        clauses = []
+        for i, field in enumerate(self.ordering):
+            equal = {name: value for name, value in zip(self.ordering[:i], key)}
+            clauses.append(Q(**equal, **{f'{field}__gt': key[i]}))
+        return reduce(Q.__or__, clauses)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        key = self.decode_cursor(request)
+        if key is not None:
+            try:
+                queryset = queryset.filter(self.after(key))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.size + 1]
+
+    def get_paginated_response(self, data, keys=()):
+        next_url = None
+        if len(data) > self.size:
+            data = data[:self.size]
+            url = self.request.build_absolute_uri()
+            next_url = replace_query_param(
+                url, self.cursor_query_param, self.encode_cursor(keys[self.size - 1])
+            )
+        return Response({'next': next_url, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -1,7 +1,106 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import serializers
-from coach_app.models import CustomUser, TimeSlot, Session
+from coach_app.availability import day_availability
+from coach_app.booking import SlotUnavailable, book_timeslot
+from coach_app.models import MAX_SESSION_MINUTES, CustomUser, TimeSlot, Session, WaitlistEntry
+
+
+def local_time(value):
+    """Wall-clock time of an aware datetime, in the same zone as TimeSlot.start_time."""
+    return timezone.localtime(value, timezone.get_default_timezone()).time()
+
+
+class FastModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer with two additions for read-heavy endpoints:
+
+    * sparse fieldsets: FastModelSerializer(fields=['id', 'timeslot.date'])
+      keeps only those fields, dotted names reaching into nested serializers;
+    * to_rows(queryset) / iter_rows(queryset): serialize a queryset straight
+      from .values_list(), selecting only the columns the remaining fields
+      need and skipping the per-object field machinery. The result renders
+      to the same JSON as .data does.
+
+    Fields that are not plain model columns must be listed in
+    `value_sources` as name -> (column, function applied to the value).
+    """
+    value_sources = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            self.restrict_fields(fields)
+
+    def restrict_fields(self, names):
+        wanted = {}
+        for name in names:
+            head, _, rest = name.partition('.')
+            wanted.setdefault(head, []).append(rest)
+
+        unknown = set(wanted) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': [f"Unknown field: {name}" for name in sorted(unknown)]}
+            )
+        for name in list(self.fields):
+            if name not in wanted and not self.fields[name].write_only:
+                self.fields.pop(name)
 
-class CustomUserSerializer(serializers.ModelSerializer):
+        for name, rest in wanted.items():
+            nested = [r for r in rest if r]
+            if nested and len(nested) == len(rest):
+                field = self.fields[name]
+                if not isinstance(field, FastModelSerializer):
+                    raise serializers.ValidationError({'fields': [f"{name} has no sub-fields"]})
+                field.restrict_fields(nested)
+
+    def value_columns(self, prefix=''):
+        """Yields (path, column, convert) for each readable field."""
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, FastModelSerializer):
+                for path, column, convert in field.value_columns(f"{prefix}{field.source}__"):
+                    yield (name, *path), column, convert
+            elif name in self.value_sources:
+                column, convert = self.value_sources[name]
+                yield (name,), prefix + column, convert
+            elif isinstance(field, serializers.DateTimeField):
+                # timezone handling lives in the field
+                yield (name,), prefix + field.source, field.to_representation
+            else:
+                yield (name,), prefix + field.source, None
+
+    def iter_rows(self, queryset, extra_columns=(), chunk_size=None):
+        """
+        Yields (row, extra) per object, `extra` being the values of
+        `extra_columns` (e.g. a pagination key). With `chunk_size` the rows
+        are streamed with .iterator() instead of loaded at once.
+        """
+        plan = list(self.value_columns())
+        width = len(plan)
+        records = queryset.values_list(*(column for _, column, _ in plan), *extra_columns)
+        if chunk_size:
+            records = records.iterator(chunk_size=chunk_size)
+        for record in records:
+            row = {}
+            for (path, _, convert), value in zip(plan, record):
+                if convert is not None and value is not None:
+                    value = convert(value)
+                target = row
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = value
+            yield row, record[width:]
+
+    def to_rows(self, queryset):
+        return [row for row, _ in self.iter_rows(queryset)]
+
+
+class CustomUserSerializer(FastModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=8)
 
     class Meta:
@@ -25,17 +124,161 @@ class CustomUserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class TimeSlotSerializer(serializers.ModelSerializer):
-    end_time = serializers.ReadOnlyField()
+class TimeSlotSerializer(FastModelSerializer):
+    end_time = serializers.SerializerMethodField()
+    value_sources = {'end_time': ('end_at', local_time)}
 
     class Meta:
         model = TimeSlot
-        fields = ['id', 'date', 'start_time', 'end_time', 'is_available']
+        fields = ['id', 'coach', 'date', 'start_time', 'end_time', 'is_available']
 
-class SessionSerializer(serializers.ModelSerializer):
+    def get_end_time(self, obj):
+        # end_at is stored, no need to recombine date + start_time per row
+        return local_time(obj.end_at)
+
+class SessionSerializer(FastModelSerializer):
     timeslot = TimeSlotSerializer(read_only=True)
     client = CustomUserSerializer(read_only=True)
+    timeslot_id = serializers.PrimaryKeyRelatedField(
+        queryset=TimeSlot.objects.all(), source='timeslot', write_only=True
+    )
+    client_id = serializers.PrimaryKeyRelatedField(
+        queryset=CustomUser.objects.all(), source='client', write_only=True
+    )
+    # minutes; by default the session is as long as its slot
+    duration = serializers.IntegerField(
+        write_only=True, required=False, min_value=5, max_value=MAX_SESSION_MINUTES
+    )
 
     class Meta:
         model = Session
-        fields = ['id', 'client', 'timeslot', 'subject', 'notes_coach', 'created_at']
+        fields = ['id', 'coach', 'client', 'timeslot', 'subject', 'notes_coach', 'created_at',
+                  'timeslot_id', 'client_id', 'duration']
+
+    def create(self, validated_data):
+        # go through the booking service so the slot is claimed atomically
+        try:
+            session = book_timeslot(
+                client=validated_data['client'],
+                timeslot=validated_data['timeslot'],
+                subject=validated_data['subject'],
+                duration=validated_data.get('duration'),
+            )
+        except SlotUnavailable as exc:
+            raise serializers.ValidationError({'timeslot_id': [str(exc)]})
+        if validated_data.get('notes_coach'):
+            session.notes_coach = validated_data['notes_coach']
+            session.save(update_fields=['notes_coach'])
+        return session
+
+    def update(self, instance, validated_data):
+        # moving a session to another slot must go through a new booking
+        validated_data.pop('timeslot', None)
+        validated_data.pop('client', None)
+        validated_data.pop('duration', None)
+        return super().update(instance, validated_data)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """
+    One booking of a batch: a slot by id, or a coach and start time (which
+    may be a slot the coach's rules offer). Ids are not looked up here,
+    book_batch() resolves them all at once. The client defaults to the
+    user making the request.
+    """
+    client_id = serializers.IntegerField(required=False)
+    timeslot_id = serializers.IntegerField(required=False)
+    coach = serializers.IntegerField(required=False)
+    start = serializers.DateTimeField(required=False)
+    subject = serializers.CharField(max_length=255)
+    duration = serializers.IntegerField(required=False, min_value=5, max_value=MAX_SESSION_MINUTES)
+
+    def validate(self, attrs):
+        by_time = 'coach' in attrs or 'start' in attrs
+        if ('timeslot_id' in attrs) == by_time or by_time and not ('coach' in attrs and 'start' in attrs):
+            raise serializers.ValidationError("Give either timeslot_id, or coach and start.")
+        if by_time:
+            attrs['coach_id'] = attrs.pop('coach')
+        return attrs
+
+
+class SessionBatchSerializer(serializers.Serializer):
+    max_items = 500
+
+    # all or nothing; false books the valid items and reports the others
+    atomic = serializers.BooleanField(default=True)
+    sessions = BatchItemSerializer(many=True, allow_empty=False, max_length=max_items)
+
+
+class WaitlistEntrySerializer(FastModelSerializer):
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'client', 'coach', 'date', 'earliest', 'latest', 'subject', 'priority',
+                  'status', 'session', 'created_at']
+        read_only_fields = ['status', 'session']
+
+    def validate(self, attrs):
+        data = {**(
+            {name: getattr(self.instance, name) for name in ('coach', 'date', 'earliest', 'latest')}
+            if self.instance else {}
+        ), **attrs}
+        if data['date'] < timezone.localdate():
+            raise serializers.ValidationError({'date': ['Must not be in the past.']})
+        if data.get('earliest') and data.get('latest') and data['latest'] < data['earliest']:
+            raise serializers.ValidationError({'latest': ['Must not be before earliest.']})
+        # nobody needs to wait for a slot that is free now
+        now = timezone.now()
+        free = next((
+            slot for slot in day_availability(data['coach'].pk, data['date']).slots
+            if slot.is_available and slot.start_at > now
+            and (data.get('earliest') is None or slot.start_time >= data['earliest'])
+            and (data.get('latest') is None or slot.start_time <= data['latest'])
+        ), None)
+        if free is not None:
+            raise serializers.ValidationError(
+                {'date': [f"{free.start_time:%H:%M} is free on that day, book it instead."]}
+            )
+        return attrs
+
+
+class DateOrDateTimeField(serializers.Field):
+    """Accepts '2030-01-01' (midnight, default timezone) or a full ISO datetime."""
+    default_error_messages = {'invalid': 'Expected a date or an ISO 8601 datetime.'}
+
+    def to_internal_value(self, value):
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None and parse_date(value) is not None:
+                parsed = datetime.combine(parse_date(value), time.min)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is None:
+            self.fail('invalid')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+        return parsed
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    max_range = timedelta(days=366)
+
+    coach = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.filter(is_coach=True))
+    duration = serializers.IntegerField(min_value=1, default=30)
+
+    def get_fields(self):
+        # 'from' is a keyword, so the range bounds can't be declared as attributes
+        fields = super().get_fields()
+        fields['from'] = DateOrDateTimeField(required=False)
+        fields['to'] = DateOrDateTimeField(required=False)
+        return fields
+
+    def validate(self, attrs):
+        attrs.setdefault('from', timezone.now())
+        attrs.setdefault('to', attrs['from'] + timedelta(days=90))
+        if attrs['to'] <= attrs['from']:
+            raise serializers.ValidationError({'to': ['Must be after from.']})
+        if attrs['to'] - attrs['from'] > self.max_range:
+            raise serializers.ValidationError(
+                {'to': [f"Range may not exceed {self.max_range.days} days."]}
+            )
+        return attrs
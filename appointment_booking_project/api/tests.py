@@ -1,3 +1,311 @@
-from django.test import TestCase
+import json
+from datetime import date, time
 
-# Create your tests here.
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api.serializers import SessionSerializer
+from coach_app.booking import book_timeslot
+from coach_app.models import CustomUser, Session, TimeSlot
+from coach_app.slots import date_range, generate_slots
+
+
+class SessionBookingAPITests(APITestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.timeslot = TimeSlot.objects.create(
+            coach=coach, date=timezone.now().date(), start_time=time(10, 0)
+        )
+
+    def book(self, user):
+        return self.client.post('/api/sessions/', {
+            'timeslot_id': self.timeslot.id,
+            'client_id': user.id,
+            'subject': 'Intro',
+        }, format='json')
+
+    def test_create_session_claims_slot(self):
+        response = self.book(self.alice)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['timeslot']['id'], self.timeslot.id)
+        self.timeslot.refresh_from_db()
+        self.assertFalse(self.timeslot.is_available)
+
+    def test_duration(self):
+        # the coach works until 11:30
+        TimeSlot.objects.create(coach=self.timeslot.coach, date=self.timeslot.date, start_time=time(11, 0))
+        response = self.client.post('/api/sessions/', {
+            'timeslot_id': self.timeslot.id, 'client_id': self.alice.id, 'subject': 'Long', 'duration': 90,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['timeslot']['end_time'], '11:30:00')
+
+    def test_sessions_must_end_within_the_coachs_hours(self):
+        late = TimeSlot.objects.create(coach=self.timeslot.coach, date=self.timeslot.date, start_time=time(17, 30))
+        response = self.client.post('/api/sessions/', {
+            'timeslot_id': late.id, 'client_id': self.alice.id, 'subject': 'Long', 'duration': 240,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['timeslot_id'], ["Appointments must end within the coach's working hours."])
+        late.refresh_from_db()
+        self.assertEqual((late.duration, late.is_available), (30, True))
+
+    def test_booking_a_taken_slot_is_a_400(self):
+        self.book(self.alice)
+        response = self.book(self.bob)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('timeslot_id', response.data)
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class SessionBatchAPITests(APITestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        generate_slots(date_range(date(2030, 1, 7), date(2030, 1, 11)), coach=self.coach)
+        self.slots = list(TimeSlot.objects.filter(start_time=time(10, 0)))
+        self.client.force_authenticate(self.alice)
+
+    def batch(self, items, atomic=True):
+        return self.client.post('/api/sessions/batch/', {'atomic': atomic, 'sessions': items}, format='json')
+
+    def item(self, slot, **extra):
+        return {'client_id': self.alice.pk, 'timeslot_id': slot.pk, 'subject': 'Series', **extra}
+
+    def test_all_booked_is_a_201(self):
+        response = self.batch([self.item(slot) for slot in self.slots])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['booked'], 5)
+        result = response.data['results'][0]
+        self.assertEqual(result['status'], 'booked')
+        self.assertEqual(result['session']['timeslot']['id'], self.slots[0].pk)
+        self.assertEqual(Session.objects.count(), 5)
+
+    def test_partial_success_is_a_207(self):
+        book_timeslot(client=self.alice, timeslot=self.slots[2], subject='Taken')
+        response = self.batch([self.item(slot) for slot in self.slots], atomic=False)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['booked'], 4)
+        self.assertEqual(response.data['results'][2]['status'], 'failed')
+
+        response = self.batch([self.item(self.slots[2])])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['error'], "That slot was just booked. Please pick another.")
+
+    def test_by_coach_and_start(self):
+        response = self.batch([{
+            'client_id': self.alice.pk, 'coach': self.coach.pk, 'start': '2030-01-08T11:00:00', 'subject': 'Series',
+        }])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['results'][0]['session']['timeslot']['start_time'], '11:00:00')
+
+    def test_clients_book_for_themselves(self):
+        response = self.batch([{'timeslot_id': self.slots[0].pk, 'subject': 'Mine'}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Session.objects.get().client, self.alice)
+
+        bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        response = self.batch([self.item(self.slots[1], client_id=bob.pk)])
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(CustomUser.objects.create_user(username='ops', is_staff=True))
+        self.assertEqual(self.batch([self.item(self.slots[1], client_id=bob.pk)]).status_code, 201)
+
+        self.client.force_authenticate(None)
+        self.assertIn(self.batch([self.item(self.slots[2])]).status_code, (401, 403))
+        self.assertEqual(Session.objects.count(), 2)
+
+    def test_malformed_items_are_a_400(self):
+        response = self.batch([{'client_id': self.alice.pk, 'coach': self.coach.pk, 'subject': 'No start'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sessions', response.data)
+        self.assertEqual(self.batch([]).status_code, 400)
+
+
+class SessionListAPITests(APITestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        for hour in (9, 10, 11):
+            slot = TimeSlot.objects.create(coach=coach, date=timezone.now().date(), start_time=time(hour, 30))
+            book_timeslot(client=self.alice, timeslot=slot, subject=f'Session at {hour}')
+
+    def test_list_matches_full_serializer_output(self):
+        response = self.client.get('/api/sessions/')
+        expected = SessionSerializer(Session.objects.all(), many=True).data
+        results = response.json()['results']
+        self.assertEqual(results, json.loads(JSONRenderer().render(expected)))
+        self.assertEqual(results[0]['timeslot']['end_time'], '10:00:00')
+
+    def test_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/sessions/')
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get('/api/sessions/', {'fields': 'id,subject,timeslot.date'})
+        first = response.json()['results'][0]
+        self.assertEqual(set(first), {'id', 'subject', 'timeslot'})
+        self.assertEqual(set(first['timeslot']), {'date'})
+
+        response = self.client.get('/api/sessions/', {'fields': 'subject,client'})
+        self.assertEqual(set(response.json()['results'][0]['client']), {'id', 'username', 'email', 'is_coach'})
+
+    def test_sparse_fieldsets_narrow_the_select(self):
+        with self.assertNumQueries(1) as queries:
+            self.client.get('/api/sessions/', {'fields': 'subject'})
+        sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('notes_coach', sql)
+        self.assertNotIn('username', sql)
+
+    def test_sparse_fieldsets_on_detail(self):
+        session = Session.objects.first()
+        response = self.client.get(f'/api/sessions/{session.id}/', {'fields': 'timeslot.start_time'})
+        self.assertEqual(response.json(), {'timeslot': {'start_time': '09:30:00'}})
+
+    def test_unknown_field_is_a_400(self):
+        response = self.client.get('/api/sessions/', {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        generate_slots(date_range(date(2030, 1, 1), date(2030, 1, 3)), coach=self.coach)  # 54 slots
+
+    def test_walks_every_slot_in_order(self):
+        seen = []
+        url = '/api/timeslots/?page_size=20'
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 20)
+            seen.extend((slot['date'], slot['start_time']) for slot in page['results'])
+            url = page['next']
+        self.assertEqual(len(seen), 54)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_last_page_has_no_next(self):
+        page = self.client.get('/api/timeslots/', {'page_size': 54}).json()
+        self.assertEqual(len(page['results']), 54)
+        self.assertIsNone(page['next'])
+
+    def test_invalid_cursor_is_a_404(self):
+        response = self.client.get('/api/timeslots/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_filter_by_coach(self):
+        other = CustomUser.objects.create_user(username='other', password='testpass123', is_coach=True)
+        generate_slots([date(2030, 1, 1)], coach=other)
+        page = self.client.get('/api/timeslots/', {'coach': other.pk, 'page_size': 100}).json()
+        self.assertEqual(len(page['results']), 18)
+        self.assertEqual({slot['coach'] for slot in page['results']}, {other.pk})
+        self.assertEqual(self.client.get('/api/timeslots/', {'coach': 'me'}).status_code, 400)
+
+
+class ExportTests(APITestCase):
+    def test_export_streams_ndjson(self):
+        coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        generate_slots(date_range(date(2030, 1, 1), date(2030, 1, 2)), coach=coach)
+        response = self.client.get('/api/timeslots/export/', {'fields': 'date,start_time'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 36)
+        self.assertEqual(json.loads(lines[0]), {'date': '2030-01-01', 'start_time': '09:00:00'})
+
+
+class AvailabilityAPITests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        generate_slots([date(2030, 1, 7), date(2030, 1, 8)], coach=self.coach)
+        # split the first day in two: 09:00-12:00 and 12:30-18:00
+        noon = TimeSlot.objects.get(date=date(2030, 1, 7), start_time=time(12, 0))
+        book_timeslot(client=self.alice, timeslot=noon, subject='Lunch talk')
+
+    def get(self, headers=None, **params):
+        params = {'coach': self.coach.pk, 'from': '2030-01-07', 'to': '2030-01-09', **params}
+        return self.client.get('/api/availability/', params, **(headers or {}))
+
+    def test_contiguous_free_slots_are_merged(self):
+        windows = self.get().json()['windows']
+        self.assertEqual([(w['start'], w['end']) for w in windows], [
+            ('2030-01-07T09:00:00Z', '2030-01-07T12:00:00Z'),
+            ('2030-01-07T12:30:00Z', '2030-01-07T18:00:00Z'),
+            ('2030-01-08T09:00:00Z', '2030-01-08T18:00:00Z'),
+        ])
+        self.assertEqual(windows[0]['minutes'], 180)
+
+    def test_duration_filters_short_windows(self):
+        windows = self.get(duration=200).json()['windows']
+        self.assertEqual([w['minutes'] for w in windows], [330, 540])
+
+    def test_days_are_cached_until_a_booking_changes_them(self):
+        # the coach lookup, then the days: their rows, the coach's rules and,
+        # as a session is booked, their buffer
+        with self.assertNumQueries(4):
+            self.get()
+        with self.assertNumQueries(1):
+            first = self.get().json()['windows']
+
+        slot = TimeSlot.objects.get(date=date(2030, 1, 8), start_time=time(9, 0))
+        book_timeslot(client=self.alice, timeslot=slot, subject='Early')
+        windows = self.get().json()['windows']
+        self.assertNotEqual(windows, first)
+        self.assertEqual(windows[-1]['start'], '2030-01-08T09:30:00Z')
+
+    def test_conditional_get(self):
+        response = self.get()
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(self.get(headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 304)
+
+        slot = TimeSlot.objects.get(date=date(2030, 1, 8), start_time=time(9, 0))
+        book_timeslot(client=self.alice, timeslot=slot, subject='Early')
+        self.assertEqual(self.get(headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 200)
+
+    def test_etag_covers_the_query(self):
+        etag = self.get()['ETag']
+        matching = {'HTTP_IF_NONE_MATCH': etag}
+        self.assertEqual(self.get(headers=matching, duration=60).status_code, 200)
+        self.assertEqual(self.get(headers=matching, to='2030-01-08').status_code, 200)
+        self.assertEqual(self.get(headers=matching, **{'from': '2030-01-07T10:00'}).status_code, 200)
+
+        # from defaults to now, so a later request never confirms passed windows
+        params = {'coach': self.coach.pk}
+        etag = self.client.get('/api/availability/', params)['ETag']
+        self.assertEqual(
+            self.client.get('/api/availability/', params, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_cache_stats_are_admin_only(self):
+        self.get()
+        self.get()
+        self.assertEqual(self.client.get('/api/availability/cache-stats/').status_code, 403)
+        admin = CustomUser.objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_authenticate(admin)
+        stats = self.client.get('/api/availability/cache-stats/').json()
+        self.assertGreaterEqual(stats['hits'], 2)
+        self.assertIn('hit_ratio', stats)
+
+    def test_bad_parameters_are_a_400(self):
+        self.assertEqual(self.get(to='2030-01-01').status_code, 400)
+        self.assertEqual(self.get(to='2032-01-01').status_code, 400)
+        self.assertEqual(self.get(duration=0).status_code, 400)
+        self.assertEqual(self.client.get('/api/availability/', {'from': 'soon'}).status_code, 400)
+        self.assertEqual(self.get(coach=self.alice.pk).status_code, 400)
+
+    def test_other_coaches_are_not_mixed_in(self):
+        other = CustomUser.objects.create_user(username='other', password='testpass123', is_coach=True)
+        generate_slots([date(2030, 1, 7)], coach=other)
+        response = self.get(coach=other.pk).json()
+        self.assertEqual(response['coach'], other.pk)
+        self.assertEqual([(w['start'], w['end']) for w in response['windows']], [
+            ('2030-01-07T09:00:00Z', '2030-01-07T18:00:00Z'),
+        ])
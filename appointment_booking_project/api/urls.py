@@ -1,12 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CustomUserViewSet, TimeSlotViewSet, SessionViewSet
+from .views import (
+    AvailabilityCacheStatsView,
+    AvailabilityView,
+    CustomUserViewSet,
+    TimeSlotViewSet,
+    SessionViewSet,
+    WaitlistEntryViewSet,
+)
 
 router = DefaultRouter()
 router.register(r'users', CustomUserViewSet)
 router.register(r'timeslots', TimeSlotViewSet)
 router.register(r'sessions', SessionViewSet)
+router.register(r'waitlist', WaitlistEntryViewSet)
 
 urlpatterns = [
+    path('availability/', AvailabilityView.as_view(), name='availability'),
+    path('availability/cache-stats/', AvailabilityCacheStatsView.as_view(), name='availability_cache_stats'),
     path('', include(router.urls)),
 ]
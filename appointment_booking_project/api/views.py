@@ -1,25 +1,253 @@
-from rest_framework import viewsets, filters
-from coach_app.models import CustomUser, TimeSlot, Session
-from .serializers import CustomUserSerializer, TimeSlotSerializer, SessionSerializer
+from datetime import timedelta
 
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.views import APIView
+from coach_app.availability import (
+    cache_stats,
+    date_span,
+    days_availability,
+    free_windows,
+    validators,
+)
+from coach_app.booking import book_batch
+from coach_app.feeds import InvalidToken, changes_since, feed_state, feed_user_id, parse_sync_token
+from coach_app.models import CustomUser, TimeSlot, Session, WaitlistEntry
+from .serializers import (
+    AvailabilityQuerySerializer,
+    CustomUserSerializer,
+    TimeSlotSerializer,
+    SessionBatchSerializer,
+    SessionSerializer,
+    WaitlistEntrySerializer,
+)
 
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class FastListMixin:
+    """
+    Sparse fieldsets (?fields=id,subject,timeslot.date) for every action,
+    a list() that serializes from .values_list() rows instead of model
+    instances (see FastModelSerializer.iter_rows), keyset-paginated on
+    `keyset_ordering`, and an `export/` action streaming every row as NDJSON.
+    """
+    keyset_ordering = ('id',)
+    export_chunk_size = 2000
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.request.query_params.get('fields')
+        if fields:
+            kwargs['fields'] = [name.strip() for name in fields.split(',') if name.strip()]
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(serializer.to_rows(queryset))
+
+        rows, keys = [], []
+        for row, key in serializer.iter_rows(page, extra_columns=self.keyset_ordering):
+            rows.append(row)
+            keys.append(key)
+        return self.paginator.get_paginated_response(rows, keys)
+
+    @action(detail=False)
+    def export(self, request, *args, **kwargs):
+        """Every matching row, one JSON object per line, in constant memory."""
+        queryset = self.filter_queryset(self.get_queryset()).order_by(*self.keyset_ordering)
+        rows = self.get_serializer().iter_rows(queryset, chunk_size=self.export_chunk_size)
+        encoder = JSONEncoder()
+        lines = (encoder.encode(row) + '\n' for row, _ in rows)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+class CoachFilter(filters.BaseFilterBackend):
+    """?coach=<id> keeps one coach's rows, on the indexes leading on coach."""
+
+    def filter_queryset(self, request, queryset, view):
+        coach = request.query_params.get('coach')
+        if coach is None:
+            return queryset
+        if not coach.isdigit():
+            raise ValidationError({'coach': ['Expected a coach id.']})
+        return queryset.filter(coach_id=int(coach))
+
+
+class CustomUserViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['username', 'email']  # fields to search on
 
 
-class TimeSlotViewSet(viewsets.ModelViewSet):
+class TimeSlotViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = TimeSlot.objects.all()
     serializer_class = TimeSlotSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [CoachFilter, filters.SearchFilter]
     search_fields = ['date']  # you can add more fields here
+    keyset_ordering = ('date', 'start_time', 'id')
 
 
-class SessionViewSet(viewsets.ModelViewSet):
-    queryset = Session.objects.all()
+class SessionViewSet(FastListMixin, viewsets.ModelViewSet):
+    queryset = Session.objects.select_related('timeslot', 'client')
     serializer_class = SessionSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [CoachFilter, filters.SearchFilter]
     search_fields = ['subject', 'client__username']  # search by subject or client's username
+    keyset_ordering = ('timeslot__date', 'timeslot__start_time', 'id')
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def batch(self, request, *args, **kwargs):
+        """
+        POST {"atomic": true, "sessions": [{client_id?, timeslot_id | coach + start,
+        subject, duration?}, ...]}: books them in one transaction with a
+        constant number of queries (see booking.book_batch) and answers
+        with a result per item: 201 if all were booked, 207 if some were,
+        400 if none.
+
+        The client is the logged-in user; only staff may give another
+        client_id.
+        """
+        params = SessionBatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        items = params.validated_data['sessions']
+        for item in items:
+            item.setdefault('client_id', request.user.pk)
+        if not request.user.is_staff and any(item['client_id'] != request.user.pk for item in items):
+            raise PermissionDenied("Only staff can book sessions for other clients.")
+        results = book_batch(items, atomic=params.validated_data['atomic'])
+
+        serializer = SessionSerializer()
+        booked = sum(result.session is not None for result in results)
+        if booked == len(results):
+            code = status.HTTP_201_CREATED
+        elif booked:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'atomic': params.validated_data['atomic'],
+            'booked': booked,
+            'results': [
+                {'index': n, 'status': 'booked', 'session': serializer.to_representation(result.session)}
+                if result.session is not None
+                else {'index': n, 'status': 'failed', 'error': result.error}
+                for n, result in enumerate(results)
+            ],
+        }, status=code)
+
+
+    @action(detail=False)
+    def changes(self, request, *args, **kwargs):
+        """
+        GET [?since=<token>]: the user's sessions (as coach or client)
+        created or changed since the token, and the ids of those cancelled
+        since, with the token to send next. Without `since`, every session.
+        Revalidated with an ETag: a poll that finds nothing new is a 304
+        after one query.
+
+        The user is the one logged in, or the owner of the signed feed
+        token given as ?feed=<token> (see feeds.feed_token), for sync
+        clients that can't log in.
+        """
+        feed = request.query_params.get('feed')
+        if feed:
+            try:
+                user = feed_user_id(feed)
+            except InvalidToken:
+                raise AuthenticationFailed('Invalid feed token.')
+        elif request.user.is_authenticated:
+            user = request.user.pk
+        else:
+            raise NotAuthenticated()
+        since = request.query_params.get('since')
+        try:
+            since_at = parse_sync_token(since) if since else None
+        except InvalidToken:
+            raise ValidationError({'since': ['Invalid sync token.']})
+
+        etag = feed_state(user, since)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        changed, cancelled, token = changes_since(user, since_at)
+        response = Response({
+            'since': since,
+            'next': token,
+            'changed': self.get_serializer().to_rows(changed.order_by('id')),
+            'cancelled': list(cancelled.values_list('session_id', flat=True)),
+        })
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class WaitlistEntryViewSet(FastListMixin, viewsets.ModelViewSet):
+    """
+    Clients waiting for a coach's date. Cancelled sessions are booked for
+    them by the waitlist worker (coach_app.waitlist); `status` and
+    `session` show the outcome.
+    """
+    queryset = WaitlistEntry.objects.all()
+    serializer_class = WaitlistEntrySerializer
+    filter_backends = [CoachFilter, filters.SearchFilter]
+    search_fields = ['client__username', 'subject']
+    keyset_ordering = ('date', 'id')
+
+
+class AvailabilityView(APIView):
+    """
+    GET /api/availability/?coach=3&from=2030-01-01&to=2030-03-31&duration=60
+
+    Contiguous free windows in the coach's calendar starting in [from, to)
+    that are at least `duration` minutes long. `from`/`to` accept dates or
+    datetimes; defaults are now and now + 90 days, and a duration of one
+    slot.
+    Built from the per-date availability cache and revalidated with
+    ETag / Last-Modified; the ETag covers the range and duration, so a
+    defaulted `from` (now) never matches an earlier response.
+    """
+
+    def get(self, request):
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        coach, start, end, duration = (
+            params.validated_data[key] for key in ('coach', 'from', 'to', 'duration')
+        )
+
+        days = days_availability(coach.pk, date_span(start, end))
+        etag, last_modified = validators(days.values(), start, end, duration)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        windows = free_windows(coach.pk, start, end, timedelta(minutes=duration), days=days)
+        response = Response({
+            'coach': coach.pk,
+            'from': start,
+            'to': end,
+            'duration': duration,
+            'windows': [
+                {'start': s, 'end': e, 'minutes': int((e - s).total_seconds() // 60)}
+                for s, e in windows
+            ],
+        })
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class AvailabilityCacheStatsView(APIView):
+    """Hit/miss counters of the availability cache in this process."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
@@ -0,0 +1,357 @@
+"""
+Per-view performance metrics, served in Prometheus text format at /metrics.
+
+PerfMiddleware (first in MIDDLEWARE) times every request and labels it with
+the URL name of the view that answered (`dashboard`, `session-list`,
+`chatbot_response`, ...):
+
+    booking_request_seconds    wall time, middleware included
+    booking_db_queries         queries run
+    booking_db_seconds         time spent in them
+    booking_template_seconds   time rendering templates (requests that did)
+    booking_llm_seconds        time waiting on Ollama (requests that did)
+    booking_n_plus_one_total   requests that ran the same SQL N_PLUS_ONE
+                               times or more with different parameters
+
+Queries are seen through an execute wrapper installed once on each
+connection, templates through the Django template backend's render (wrapped
+once, when the middleware is loaded with metrics enabled) and Ollama calls through llm_timer() in
+chatbot.utils. For streaming responses the request
+is recorded when the body has been sent. Each process keeps its own
+histograms, so with several workers scrape each one (or sum them).
+
+/metrics is for staff users, and for scrapers sending the TOKEN as
+`Authorization: Bearer <token>`; anyone else gets a 401.
+
+    PERF_METRICS = {
+        "ENABLED": True,     # False: the middleware removes itself
+        "N_PLUS_ONE": 10,    # repetitions of one query that get flagged
+        "TOKEN": "",         # bearer token for scrapers; empty: staff only
+    }
+"""
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"ENABLED": True, "N_PLUS_ONE": 10, "TOKEN": ""}
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERIES = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+UNMATCHED = "<unmatched>"
+
+# the RequestStats of the request being served, None outside of one
+current = ContextVar("request_stats", default=None)
+
+
+def options():
+    return {**DEFAULTS, **getattr(settings, "PERF_METRICS", {})}
+
+
+class Histogram:
+    """A Prometheus histogram with one `view` label, safe across threads."""
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # view -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, view):
+        series = self._series.get(view)
+        return series[-1] if series else 0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {view: list(values) for view, values in self._series.items()}
+        for view, values in sorted(series.items()):
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, values):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {values[-1]}')
+            lines.append(f"{self.name}_sum{{{label}}} {values[-2]:.6g}")
+            lines.append(f"{self.name}_count{{{label}}} {values[-1]}")
+        return lines
+
+
+class Counter:
+    """A Prometheus counter with one `view` label."""
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, view):
+        with self._lock:
+            self._values[view] = self._values.get(view, 0) + 1
+
+    def count(self, view):
+        return self._values.get(view, 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{{view="{_escape(view)}"}} {n}' for view, n in values)
+        return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_seconds = Histogram("booking_request_seconds", "Wall time per request.", SECONDS)
+db_queries = Histogram("booking_db_queries", "Database queries per request.", QUERIES)
+db_seconds = Histogram("booking_db_seconds", "Time spent in database queries per request.", SECONDS)
+template_seconds = Histogram("booking_template_seconds", "Time spent rendering templates per request.", SECONDS)
+llm_seconds = Histogram("booking_llm_seconds", "Time spent waiting on the LLM per request.", SECONDS)
+n_plus_one = Counter("booking_n_plus_one_total", "Requests that repeated one query with different parameters.")
+REGISTRY = [request_seconds, db_queries, db_seconds, template_seconds, llm_seconds, n_plus_one]
+
+
+def clear():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "template_time", "llm_time", "rendering", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.llm_time = 0.0
+        self.rendering = False  # a template is being rendered: don't time nested ones
+        self.statements = {}  # sql -> [times run, first params, params varied]
+
+    def repeated_queries(self, threshold):
+        """(sql, times run) for statements run `threshold` times or more with different parameters."""
+        return [
+            (sql, seen[0]) for sql, seen in self.statements.items() if seen[0] >= threshold and seen[2]
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+        seen = stats.statements.get(sql)
+        if seen is None:
+            stats.statements[sql] = [1, params, False]
+        else:
+            seen[0] += 1
+            if not seen[2] and params != seen[1]:
+                seen[2] = True
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+_installed = threading.local()
+
+
+def _install_all():
+    """Installs the wrapper on this thread's connections, once per thread."""
+    if not getattr(_installed, "done", False):
+        for connection in connections.all():
+            install(connection)
+        _installed.done = True
+
+
+@contextmanager
+def llm_timer():
+    """Adds the time spent in the block to the current request's LLM time."""
+    stats = current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.llm_time += time.perf_counter() - started
+
+
+def _time_templates():
+    """Wraps the Django template backend's render to time it, once per process."""
+    render = django_backend.Template.render
+    if getattr(render, "perf_timed", False):
+        return
+
+    def timed_render(self, context=None, request=None):
+        stats = current.get()
+        if stats is None or stats.rendering:
+            return render(self, context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+            stats.rendering = False
+
+    timed_render.perf_timed = True
+    django_backend.Template.render = timed_render
+
+
+class PerfMiddleware:
+    """Records the metrics above for every request; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = options()
+        if not config["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = config["N_PLUS_ONE"]
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # a connection opened from now on gets the wrapper when it connects,
+        # those already open when a request first runs on their thread
+        connection_created.connect(_install_on_connect, dispatch_uid="perf-metrics")
+        # outside of a request the wrapper only reads a context variable
+        _time_templates()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        _install_all()
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not getattr(_installed, "async_done", False):
+            # the ORM runs in sync_to_async's thread, with its own connections
+            await sync_to_async(_install_all)()
+            _installed.async_done = True
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        if not response.streaming:
+            self.record(request, stats, started)
+        elif response.is_async:
+            response.streaming_content = self._astream(response.streaming_content, request, stats, started)
+        else:
+            response.streaming_content = self._stream(response.streaming_content, request, stats, started)
+        return response
+
+    def _stream(self, content, request, stats, started):
+        current.set(stats)
+        try:
+            yield from content
+        finally:
+            current.set(None)
+            self.record(request, stats, started)
+
+    async def _astream(self, content, request, stats, started):
+        # the body is produced after the view returned: put the stats back
+        # in scope for the queries and LLM calls made while streaming
+        current.set(stats)
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            current.set(None)
+            self.record(request, stats, started)
+
+    def record(self, request, stats, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else UNMATCHED
+        request_seconds.observe(view, elapsed)
+        db_queries.observe(view, stats.queries)
+        db_seconds.observe(view, stats.db_time)
+        if stats.template_time:
+            template_seconds.observe(view, stats.template_time)
+        if stats.llm_time:
+            llm_seconds.observe(view, stats.llm_time)
+        repeated = stats.repeated_queries(self.threshold)
+        if repeated:
+            n_plus_one.inc(view)
+            sql, times = max(repeated, key=lambda item: item[1])
+            logger.warning("Possible N+1 in %s: %d queries like %s", view, times, sql[:200])
+
+
+def _may_scrape(request, token):
+    if token:
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(credentials.encode(), token.encode()):
+            return True
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+def metrics_view(request):
+    config = options()
+    if not config["ENABLED"]:
+        raise Http404
+    if not _may_scrape(request, config["TOKEN"]):
+        response = HttpResponse("Staff or a bearer token only.\n", status=401, content_type="text/plain")
+        response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+        return response
+    lines = [line for metric in REGISTRY for line in metric.render()]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
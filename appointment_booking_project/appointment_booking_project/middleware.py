@@ -0,0 +1,64 @@
+"""
+Middleware for the production profile (settings/production.py).
+
+The JSON endpoints under /api/ and /chatbot/ don't use flash messages and
+are CSRF-exempt views (DRF's SessionAuthentication does its own CSRF
+check), so the page-only middleware below steps aside for them and they
+run a shorter chain. X-Frame-Options stays on every response: the
+browsable API serves HTML forms under /api/ too.
+"""
+from django.conf import settings
+from django.contrib.messages import middleware as messages
+from django.middleware import csrf, gzip
+
+# overridable with the PAGE_ONLY_EXCLUDED_PATHS setting
+EXCLUDED_PATHS = ("/api/", "/chatbot/")
+
+
+def pages_only(middleware_class):
+    """
+    A subclass of `middleware_class` skipped for requests under
+    PAGE_ONLY_EXCLUDED_PATHS: those go straight to the next middleware.
+    """
+
+    def __init__(self, get_response):
+        middleware_class.__init__(self, get_response)
+        self.excluded = tuple(getattr(settings, "PAGE_ONLY_EXCLUDED_PATHS", EXCLUDED_PATHS))
+
+    def skipped(self, request):
+        return request.path_info.startswith(self.excluded)
+
+    def __call__(self, request):
+        if self.skipped(request):
+            return self.get_response(request)
+        return middleware_class.__call__(self, request)
+
+    namespace = {
+        "__module__": __name__,
+        "__doc__": f"{middleware_class.__name__}, for pages only.",
+        "__init__": __init__,
+        "__call__": __call__,
+        "skipped": skipped,
+    }
+    # the handler calls process_view itself, outside __call__
+    if hasattr(middleware_class, "process_view"):
+        def process_view(self, request, *args, **kwargs):
+            if self.skipped(request):
+                return None
+            return middleware_class.process_view(self, request, *args, **kwargs)
+
+        namespace["process_view"] = process_view
+    return type(middleware_class.__name__, (middleware_class,), namespace)
+
+
+CsrfViewMiddleware = pages_only(csrf.CsrfViewMiddleware)
+MessageMiddleware = pages_only(messages.MessageMiddleware)
+
+
+class GZipMiddleware(gzip.GZipMiddleware):
+    """Leaves Server-Sent Events alone: gzip would hold tokens back until a block fills."""
+
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        return super().process_response(request, response)
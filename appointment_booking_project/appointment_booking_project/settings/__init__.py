@@ -0,0 +1,6 @@
+"""
+Settings profiles, picked with DJANGO_SETTINGS_MODULE:
+
+    appointment_booking_project.settings.development   (default)
+    appointment_booking_project.settings.production
+"""
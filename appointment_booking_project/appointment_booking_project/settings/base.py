@@ -0,0 +1,218 @@
+"""
+Django settings for appointment_booking_project project, shared by the
+development and production profiles (development.py, production.py).
+
+Generated by 'django-admin startproject' using Django 5.2.4.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+
+import os
+from pathlib import Path
+
+from ..database import database_from_env
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+AUTH_USER_MODEL = 'coach_app.CustomUser'
+LOGIN_REDIRECT_URL = 'dashboard'
+LOGOUT_REDIRECT_URL = 'home'
+
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'coach_app',
+    'api',
+    'chatbot',
+    "django.contrib.admin",
+    "django.contrib.auth",
+    'django.contrib.sessions',
+    "django.contrib.contenttypes",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+]
+
+MIDDLEWARE = [
+    "appointment_booking_project.metrics.PerfMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.AllowAny',  # <- opens access (for testing only)
+    ],
+    'DEFAULT_FILTER_BACKENDS': [
+        'rest_framework.filters.SearchFilter',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
+
+ROOT_URLCONF = "appointment_booking_project.urls"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = "appointment_booking_project.wsgi.application"
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+# Picked from DATABASE_URL; see database.py for the Postgres pooling and
+# SQLite WAL options.
+
+DATABASES = {
+    "default": database_from_env(BASE_DIR),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds the per-date availability entries (coach_app.availability). Set
+# REDIS_URL to share them between worker processes.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 5000},
+        }
+    }
+
+# Slot changes pushed to open booking pages (see coach_app.live); across
+# processes only through Redis
+LIVE_UPDATES = {
+    "BACKEND": "redis" if os.environ.get("REDIS_URL") else "local",
+    "REDIS_URL": os.environ.get("REDIS_URL"),
+    "KEEPALIVE": 15,  # seconds
+}
+
+# Background tasks, run by `manage.py run_tasks` (see coach_app.tasks)
+TASKS = {
+    "BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_DELAY": 30,  # seconds, doubled at each attempt
+    "LEASE": 300,  # seconds
+}
+
+# Emails are sent by the task worker. Printed unless a backend is set
+# (django.core.mail.backends.smtp.EmailBackend with EMAIL_HOST etc.)
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", 25))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "") == "1"
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "bookings@localhost")
+
+
+# Ollama (chatbot)
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", 60))  # seconds
+
+# Replies to identical (normalized) messages, per process
+CHATBOT_CACHE_SIZE = int(os.environ.get("CHATBOT_CACHE_SIZE", 1000))
+CHATBOT_CACHE_TTL = int(os.environ.get("CHATBOT_CACHE_TTL", 3600))  # seconds
+
+# Chat messages are written in batches, logged here until committed
+CHATBOT_MESSAGE_BUFFER = {
+    "MAX_SIZE": 200,
+    "INTERVAL": 1.0,  # seconds
+    "LOG_DIR": BASE_DIR / "chat_log",
+}
+
+# Conversation history sent with each prompt (see chatbot.context)
+CHATBOT_CONTEXT = {
+    "MESSAGES": 10,
+    "TOKEN_BUDGET": 1000,
+    "SUMMARY_TOKENS": 200,
+}
+
+
+# Per-view timings and query counts, served at /metrics to staff and to
+# scrapers sending METRICS_TOKEN as a bearer token (see
+# appointment_booking_project.metrics). PERF_METRICS=0 turns them off.
+
+PERF_METRICS = {
+    "ENABLED": os.environ.get("PERF_METRICS", "1").lower() not in ("0", "false", "no", "off"),
+    "N_PLUS_ONE": 10,
+    "TOKEN": os.environ.get("METRICS_TOKEN", ""),
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = "en-us"
+
+TIME_ZONE = "UTC"
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+STATIC_URL = "static/"
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -0,0 +1,12 @@
+from .base import *  # noqa: F401,F403
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = "django-insecure-u8_()+dttid84g_0=o&l)cilgz^qf@@v7-@x7iz@8jo*1s-+%r"
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = True
+
+ALLOWED_HOSTS = []
@@ -0,0 +1,68 @@
+"""
+Production profile:
+
+    DJANGO_SETTINGS_MODULE=appointment_booking_project.settings.production
+    DJANGO_SECRET_KEY=...  DJANGO_ALLOWED_HOSTS=coach.example.com
+
+Run `manage.py collectstatic` at deploy time: it writes the hashed and
+gzip/brotli pre-compressed files WhiteNoise serves from STATIC_ROOT.
+"""
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, TEMPLATES
+
+SECRET_KEY = os.environ["DJANGO_SECRET_KEY"]
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",") if host]
+
+# Timing first, so it sees the whole chain. WhiteNoise answers for static
+# files before GZip: it serves collectstatic's .br/.gz variants and leaves
+# images as they are, which GZip would otherwise recompress on every
+# request. GZip then compresses what the rest produce. The page-only
+# middleware step aside for /api/ and /chatbot/ (see middleware.py).
+MIDDLEWARE = [
+    "appointment_booking_project.metrics.PerfMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "appointment_booking_project.middleware.GZipMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "appointment_booking_project.middleware.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "appointment_booking_project.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+# The CSRF middleware is there, as a subclass the deploy checks don't
+# recognize
+SILENCED_SYSTEM_CHECKS = ["security.W003"]
+
+# Templates are compiled once per process
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "APP_DIRS": False,
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
+        },
+    },
+]
+
+# Hashed names (cached forever by browsers) and .gz/.br variants, written
+# by collectstatic and served by WhiteNoise
+STATIC_ROOT = os.environ.get("DJANGO_STATIC_ROOT", BASE_DIR / "staticfiles")
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
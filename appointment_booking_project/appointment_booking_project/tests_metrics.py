@@ -0,0 +1,117 @@
+from datetime import date, time
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.template.backends import django as django_backend
+from django.test import TestCase, override_settings
+from django.urls import include, path
+
+from coach_app.models import CustomUser, TimeSlot
+
+from . import metrics
+
+
+def one_query_per_slot(request):
+    ids = TimeSlot.objects.values_list("id", flat=True)
+    return HttpResponse(",".join(str(TimeSlot.objects.get(id=pk).start_time) for pk in ids))
+
+
+def same_query_repeated(request):
+    for _ in range(20):
+        TimeSlot.objects.filter(id=1).exists()
+    return HttpResponse()
+
+
+urlpatterns = [
+    path("", include("appointment_booking_project.urls")),
+    path("n-plus-one/", one_query_per_slot, name="n_plus_one"),
+    path("repeated/", same_query_repeated, name="repeated"),
+]
+
+
+class PerfMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.clear()
+
+    def test_page_view(self):
+        user = CustomUser.objects.create_user(username="client", password="pass")
+        self.client.force_login(user)
+        self.client.get("/dashboard/")
+
+        self.assertEqual(metrics.request_seconds.count("dashboard"), 1)
+        self.assertEqual(metrics.template_seconds.count("dashboard"), 1)
+        self.assertEqual(metrics.llm_seconds.count("dashboard"), 0)
+        series = metrics.db_queries._series["dashboard"]
+        self.assertGreater(series[-2], 0)  # the session and user lookups at least
+
+    def test_api_view_is_labelled_by_route_name(self):
+        self.client.get("/api/timeslots/")
+        self.assertEqual(metrics.request_seconds.count("timeslot-list"), 1)
+        self.assertEqual(metrics.template_seconds.count("timeslot-list"), 0)
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/timeslots/")
+        self.client.get("/no-such-page/")
+        self.client.force_login(CustomUser.objects.create_user(username="ops", password="pass", is_staff=True))
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        body = response.content.decode()
+        self.assertIn("# TYPE booking_request_seconds histogram", body)
+        self.assertIn('booking_request_seconds_bucket{view="timeslot-list",le="+Inf"} 1', body)
+        self.assertIn('booking_request_seconds_count{view="<unmatched>"} 1', body)
+        self.assertIn('booking_db_queries_bucket{view="timeslot-list",le="0"} 0', body)
+
+    @override_settings(PERF_METRICS={"TOKEN": "s3cret"})
+    def test_metrics_endpoint_is_private(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="metrics"')
+        self.assertEqual(self.client.get("/metrics", headers={"authorization": "Bearer wrong"}).status_code, 401)
+        self.assertEqual(self.client.get("/metrics", headers={"authorization": "Bearer s3cret"}).status_code, 200)
+
+        self.client.force_login(CustomUser.objects.create_user(username="client", password="pass"))
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+    def test_templates_are_wrapped_once(self):
+        render = django_backend.Template.render
+        metrics.PerfMiddleware(lambda request: HttpResponse())
+        metrics._time_templates()
+        self.assertIs(django_backend.Template.render, render)
+        self.assertTrue(render.perf_timed)
+
+    def test_templates_are_left_alone_when_switched_off(self):
+        def render(self, context=None, request=None):
+            return ""
+
+        with mock.patch.object(django_backend.Template, "render", render):
+            with override_settings(PERF_METRICS={"ENABLED": False}):
+                with self.assertRaises(MiddlewareNotUsed):
+                    metrics.PerfMiddleware(lambda request: HttpResponse())
+            self.assertIs(django_backend.Template.render, render)
+
+            metrics.PerfMiddleware(lambda request: HttpResponse())
+            self.assertTrue(django_backend.Template.render.perf_timed)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_n_plus_one_is_flagged(self):
+        coach = CustomUser.objects.create_user(username="coach", password="testpass123", is_coach=True)
+        TimeSlot.objects.bulk_create(
+            TimeSlot(coach=coach, date=date(2030, 1, day), start_time=time(10)) for day in range(1, 13)
+        )
+        with self.assertLogs("appointment_booking_project.metrics", "WARNING") as logs:
+            self.client.get("/n-plus-one/")
+        self.assertEqual(metrics.n_plus_one.count("n_plus_one"), 1)
+        self.assertIn("Possible N+1 in n_plus_one: 12 queries like SELECT", logs.output[0])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_identical_queries_are_not_n_plus_one(self):
+        self.client.get("/repeated/")
+        self.assertEqual(metrics.n_plus_one.count("repeated"), 0)
+
+    @override_settings(PERF_METRICS={"ENABLED": False})
+    def test_can_be_switched_off(self):
+        self.client.get("/api/timeslots/")
+        self.assertEqual(metrics.request_seconds.count("timeslot-list"), 0)
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
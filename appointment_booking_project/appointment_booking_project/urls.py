@@ -18,8 +18,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path('', include('coach_app.urls')),
     path('api/', include('api.urls')),
     path('chatbot/', include('chatbot.urls')),
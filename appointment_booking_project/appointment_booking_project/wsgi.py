@@ -11,6 +11,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "appointment_booking_project.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "appointment_booking_project.settings.development")
 
 application = get_wsgi_application()
+
+# chat messages an earlier process logged but never wrote
+from chatbot.buffer import recover_at_startup  # noqa: E402
+
+recover_at_startup()
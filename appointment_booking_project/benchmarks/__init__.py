@@ -0,0 +1,61 @@
+"""
+Load and latency benchmarks for the booking project.
+
+Each module is a script run from the project directory (next to manage.py):
+
+    python -m benchmarks.booking_stress --help
+
+They run against a throw-away database built the same way the test runner
+builds one, so db.sqlite3 is never touched.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "appointment_booking_project.settings.development"
+    )
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def bench_database():
+    """
+    Creates a file-backed test database (so worker threads share it, unlike
+    the in-memory SQLite the test runner uses) and drops it on exit.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as tmp:
+        if connection.vendor == "sqlite":
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tmp, "bench.sqlite3")
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+def create_coach(username="coach"):
+    """A coach account for the benchmark's calendar."""
+    from coach_app.models import CustomUser
+
+    return CustomUser.objects.create(username=username, is_coach=True)
+
+
+def report(title, rows):
+    """Prints `rows` (label, value) as an aligned block."""
+    print(f"\n{title}")
+    print("-" * len(title))
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print(f"{label:<{width}}  {value}")
@@ -0,0 +1,63 @@
+"""
+Peak memory of the NDJSON export versus the paginated list, as the number
+of time slots grows.
+
+    python -m benchmarks.api_export --slots 10000 100000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def traced(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--slots", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.test import Client
+
+        from coach_app.models import TimeSlot
+        from coach_app.slots import date_range, generate_slots
+
+        client = Client()
+        coach = create_coach()
+        first_day = date(2030, 1, 1)
+
+        def export():
+            response = client.get("/api/timeslots/export/")
+            return sum(chunk.count(b"\n") for chunk in response.streaming_content)
+
+        def first_page():
+            return len(client.get("/api/timeslots/").json()["results"])
+
+        rows = []
+        for target in sorted(args.slots):
+            days = -(-target // 18)
+            generate_slots(date_range(first_day, first_day + timedelta(days=days - 1)), coach=coach)
+            total = TimeSlot.objects.count()
+            for label, func in [("export", export), ("list page", first_page)]:
+                n, elapsed, peak = traced(func)
+                rows.append((
+                    f"{total} slots, {label}",
+                    f"{n:>7} rows  {elapsed:6.2f}s  peak {peak / 2**20:6.1f} MiB",
+                ))
+        report("Memory per request", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Rows/sec of the /api/sessions/ list, before and after eager loading and
+the values_list() fast path.
+
+    python -m benchmarks.api_list --sessions 10000
+
+"before" is the old list path: SessionSerializer(many=True) over
+Session.objects.all(), which lazily loads each timeslot and client.
+Every variant includes JSON rendering.
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def seed(n_sessions):
+    from coach_app.models import CustomUser, Session, TimeSlot
+    from coach_app.slots import date_range, iter_slots
+
+    clients = CustomUser.objects.bulk_create(
+        CustomUser(username=f"client{i}", email=f"client{i}@example.com") for i in range(50)
+    )
+    first_day = date.today()
+    days = date_range(first_day, first_day + timedelta(days=n_sessions // 18 + 1))
+    slots = TimeSlot.objects.bulk_create(
+        slot for _, slot in zip(range(n_sessions), iter_slots(days, coach=create_coach()))
+    )
+    Session.objects.bulk_create(
+        Session(client=clients[n % len(clients)], timeslot=slot, subject=f"session {n}")
+        for n, slot in enumerate(slots)
+    )
+
+
+def measure(func):
+    from django.db import connection
+
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        rows = func()
+        elapsed = time.perf_counter() - started
+    return len(rows), elapsed, len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from rest_framework.renderers import JSONRenderer
+
+        from api.serializers import SessionSerializer
+        from coach_app.models import Session
+
+        seed(args.sessions)
+        renderer = JSONRenderer()
+        queryset = Session.objects.select_related("timeslot", "client")
+
+        def before():
+            data = SessionSerializer(Session.objects.all(), many=True).data
+            renderer.render(data)
+            return data
+
+        def eager():
+            data = SessionSerializer(queryset, many=True).data
+            renderer.render(data)
+            return data
+
+        def fast():
+            rows = SessionSerializer().to_rows(queryset)
+            renderer.render(rows)
+            return rows
+
+        def sparse():
+            rows = SessionSerializer(fields=["id", "subject", "timeslot.date"]).to_rows(queryset)
+            renderer.render(rows)
+            return rows
+
+        rows = []
+        for label, func in [
+            ("before (N+1)", before),
+            ("select_related", eager),
+            ("fast list", fast),
+            ("fast list, 3 fields", sparse),
+        ]:
+            n, elapsed, queries = measure(func)
+            rows.append((label, f"{n / elapsed:>9.0f} rows/s  {elapsed:6.2f}s  {queries} queries"))
+        report(f"Listing {args.sessions} sessions", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Latency of the free-window query behind /api/availability/.
+
+Seeds a year of 30-minute slots, books every third one, then times
+free_windows() over a --days range with a cold and a warm per-date cache,
+and the full HTTP request with a warm one.
+
+    python -m benchmarks.availability --days 90
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.core.cache import cache
+        from django.test import Client
+        from django.utils import timezone
+
+        from coach_app.availability import free_windows
+        from coach_app.models import TimeSlot
+        from coach_app.slots import date_range, generate_slots
+
+        coach = create_coach()
+        first_day = date.today()
+        generate_slots(date_range(first_day, first_day + timedelta(days=365)), coach=coach)
+        booked = TimeSlot.objects.values_list("pk", flat=True)[::3]
+        TimeSlot.objects.filter(pk__in=list(booked)).update(is_available=False)
+
+        start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+        end = start + timedelta(days=args.days)
+        client = Client()
+        params = {"coach": coach.pk, "from": start.isoformat(), "to": end.isoformat()}
+
+        def timed(func):
+            func()  # warm up
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                result = func()
+            return result, (time.perf_counter() - started) / args.repeat * 1000
+
+        def cold():
+            cache.clear()
+            return free_windows(coach.pk, start, end)
+
+        _, cold_ms = timed(cold)
+        windows, query_ms = timed(lambda: free_windows(coach.pk, start, end))
+        _, http_ms = timed(lambda: client.get("/api/availability/", params))
+        report(f"Availability over {args.days} days ({TimeSlot.objects.count()} slots in table)", [
+            ("windows", len(windows)),
+            ("free_windows(), cold cache", f"{cold_ms:.2f} ms"),
+            ("free_windows(), warm cache", f"{query_ms:.2f} ms"),
+            ("GET /api/availability/", f"{http_ms:.2f} ms"),
+        ])
+
+
+if __name__ == "__main__":
+    main()
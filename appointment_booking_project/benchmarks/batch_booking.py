@@ -0,0 +1,76 @@
+"""
+One batch request against one request per session.
+
+For each size, books that many sessions for one client in a coach's
+calendar, once as separate POST /api/sessions/ requests and once as a
+single POST /api/sessions/batch/ (each on a fresh coach), and reports the
+wall time and the queries of each.
+
+    python -m benchmarks.batch_booking --sizes 10 100 500
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def calendar(name, n_sessions):
+    from coach_app.models import TimeSlot
+    from coach_app.slots import date_range, generate_slots
+
+    coach = create_coach(name)
+    first_day = date.today() + timedelta(days=1)
+    generate_slots(date_range(first_day, first_day + timedelta(days=n_sessions // 18 + 1)), coach=coach)
+    return list(TimeSlot.objects.filter(coach=coach).values_list("pk", flat=True)[:n_sessions])
+
+
+def timed(func):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    return elapsed, len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from rest_framework.test import APIClient
+
+        from coach_app.models import CustomUser
+
+        client = CustomUser.objects.create(username="bench")
+        api = APIClient()
+        api.force_authenticate(client)
+        rows = []
+        for size in args.sizes:
+            singles = calendar(f"single{size}", size)
+            batched = calendar(f"batch{size}", size)
+            items = [{"client_id": client.pk, "timeslot_id": pk, "subject": "bench"} for pk in batched]
+
+            def one_by_one():
+                for pk in singles:
+                    assert api.post("/api/sessions/", items[0] | {"timeslot_id": pk}, format="json").status_code == 201
+
+            def in_one_batch():
+                response = api.post("/api/sessions/batch/", {"sessions": items}, format="json")
+                assert response.status_code == 201, response.data
+
+            single_time, single_queries = timed(one_by_one)
+            batch_time, batch_queries = timed(in_one_batch)
+            rows.append((f"{size} sessions, one request each", f"{single_time * 1000:8.1f} ms  ({single_queries} queries)"))
+            rows.append((f"{size} sessions, one batch", f"{batch_time * 1000:8.1f} ms  ({batch_queries} queries)"))
+        report("Booking a series", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Concurrency stress test for the booking path.
+
+Fires --requests parallel bookings (spread over --slots slots, so most of
+them contend for a slot somebody else is also trying to get) at the
+make_appointment view and at POST /api/sessions/, then reports throughput,
+the share of losers that got a clean "already booked" answer and the share
+that ended in a server error.
+
+    python -m benchmarks.booking_stress --requests 400 --slots 20 --workers 32
+"""
+import argparse
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def seed(n_clients, n_slots):
+    from coach_app.models import CustomUser, TimeSlot
+
+    clients = CustomUser.objects.bulk_create(
+        CustomUser(username=f"stress{i}") for i in range(n_clients)
+    )
+    coach = create_coach()
+    first_day = date.today() + timedelta(days=1)
+    slots = []
+    for i in range(n_slots):
+        day = first_day + timedelta(days=i // 18)
+        start = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=9, minutes=30 * (i % 18)
+        )
+        slots.append(TimeSlot(coach=coach, date=day, start_time=start.time()))
+    return clients, TimeSlot.objects.bulk_create(slots)
+
+
+def login_cookies(clients):
+    from django.test import Client
+
+    cookies = []
+    for user in clients:
+        browser = Client()
+        browser.force_login(user)
+        cookies.append(browser.cookies)
+    return cookies
+
+
+def book_via_view(cookies, slot, n):
+    from django.test import Client
+
+    browser = Client(raise_request_exception=False)
+    browser.cookies = cookies
+    picked = f"{slot.date:%Y-%m-%d} {slot.start_time:%H:%M}"
+    response = browser.post(
+        "/appointment/", {"coach": slot.coach_id, "timeslot": picked, "subject": f"stress {n}"}
+    )
+    if response.status_code == 302:
+        return "won"
+    if response.status_code == 200:
+        return "lost"
+    return "error"
+
+
+def book_via_api(client_user, slot, n):
+    from django.test import Client
+
+    browser = Client(raise_request_exception=False)
+    response = browser.post(
+        "/api/sessions/",
+        {"timeslot_id": slot.pk, "client_id": client_user.pk, "subject": f"stress {n}"},
+        content_type="application/json",
+    )
+    if response.status_code == 201:
+        return "won"
+    if response.status_code == 400:
+        return "lost"
+    return "error"
+
+
+def run(label, func, jobs, workers):
+    from coach_app.models import Session, TimeSlot
+
+    Session.objects.all().delete()
+    TimeSlot.objects.update(is_available=True)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = Counter(pool.map(lambda job: func(*job), jobs))
+    elapsed = time.perf_counter() - started
+
+    contended = {job[1].pk for job in jobs}
+    booked = Session.objects.count()
+    losers = len(jobs) - outcomes["won"]
+    report(
+        label,
+        [
+            ("requests", len(jobs)),
+            ("elapsed", f"{elapsed:.2f}s"),
+            ("throughput", f"{len(jobs) / elapsed:.1f} req/s"),
+            ("won", outcomes["won"]),
+            ("lost cleanly", outcomes["lost"]),
+            ("server errors", outcomes["error"]),
+            ("loser error rate", f"{outcomes['error'] / losers:.1%}" if losers else "n/a"),
+            ("double bookings", max(booked - len(contended), 0)),
+        ],
+    )
+    return outcomes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    # every loser is a 4xx; don't log hundreds of "Bad Request" lines
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    with bench_database():
+        clients, slots = seed(args.clients, args.slots)
+        cookies = login_cookies(clients)
+
+        view_jobs = [
+            (cookies[n % len(clients)], slots[n % len(slots)], n)
+            for n in range(args.requests)
+        ]
+        api_jobs = [
+            (clients[n % len(clients)], slots[n % len(slots)], n)
+            for n in range(args.requests)
+        ]
+        results = [
+            run("make_appointment view", book_via_view, view_jobs, args.workers),
+            run("POST /api/sessions/", book_via_api, api_jobs, args.workers),
+        ]
+    return 1 if any(outcomes["error"] for outcomes in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+"""
+Booking validation latency as a coach's calendar grows.
+
+For each size, books that many sessions for a fresh coach (10-minute
+buffer, sessions of 30, 60 and 90 minutes in turn, packed from 09:00 to
+18:00 over as many days as it takes, ending the day before the probe) plus
+a morning and an afternoon session on the probe day, then times
+SessionForm validation for a free 12:00 slot between them. The conflict
+check is a range scan on (coach, start_at) bounded by the longest session,
+so both latency and query count should stay flat.
+
+    python -m benchmarks.buffer_check --sizes 10 100 1000 10000
+"""
+import argparse
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+LENGTHS = (30, 60, 90)
+
+
+def packed(first_day, n_sessions, buffer):
+    """(date, start_time, minutes) of `n_sessions` back-to-back sessions from `first_day` on."""
+    day, current = first_day, datetime.combine(first_day, time(9, 0))
+    for n in range(n_sessions):
+        minutes = LENGTHS[n % len(LENGTHS)]
+        if current + timedelta(minutes=minutes) > datetime.combine(day, time(18, 0)):
+            day += timedelta(days=1)
+            current = datetime.combine(day, time(9, 0))
+        yield day, current.time(), minutes
+        current += timedelta(minutes=minutes) + buffer
+
+
+def seed(probe_day, n_sessions, client, coach):
+    from coach_app.models import Session, TimeSlot
+
+    per_day = sum(1 for slot in packed(probe_day, 100, coach.buffer) if slot[0] == probe_day)
+    first_day = probe_day - timedelta(days=-(-n_sessions // per_day))
+    sessions = [slot for slot in packed(first_day, n_sessions, coach.buffer) if slot[0] < probe_day]
+    sessions += [(probe_day, time(10, 0), 90), (probe_day, time(13, 0), 60)]
+    slots = TimeSlot.objects.bulk_create(
+        TimeSlot(coach=coach, date=day, start_time=start, duration=minutes, is_available=False)
+        for day, start, minutes in sessions
+    )
+    Session.objects.bulk_create(Session(client=client, timeslot=slot, subject="busy") for slot in slots)
+    TimeSlot.objects.create(coach=coach, date=probe_day, start_time=time(12, 0))
+    return len(slots)
+
+
+def time_validation(day, coach, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from coach_app.forms import SessionForm
+
+    data = {"coach": coach.pk, "timeslot": f"{day:%Y-%m-%d} 12:00", "subject": "probe"}
+    with CaptureQueriesContext(connection) as queries:
+        assert SessionForm(data).is_valid()
+    started = clock.perf_counter()
+    for _ in range(repeat):
+        SessionForm(data).is_valid()
+    return (clock.perf_counter() - started) / repeat, len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from coach_app.models import CustomUser
+
+        client = CustomUser.objects.create(username="bench")
+        probe_day = date.today() + timedelta(days=1)
+        rows = []
+        for n, size in enumerate(args.sizes):
+            coach = create_coach(f"coach{n}")
+            coach.buffer_minutes = 10
+            coach.save()
+            booked = seed(probe_day, size, client, coach)
+            latency, queries = time_validation(probe_day, coach, args.repeat)
+            rows.append((f"{booked} sessions", f"{latency * 1000:.3f} ms  ({queries} queries)"))
+        report("SessionForm.is_valid() latency", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Chat message admin and retention on a large table.
+
+Fills --messages chat messages spread over a year (20 per conversation),
+times the admin changelist (first page, session search, text search) and
+then prune_chat, with and without archiving.
+
+    python -m benchmarks.chat_admin --messages 1000000
+"""
+import argparse
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from benchmarks import bench_database, report, setup_django
+
+
+def fill(n, batch_size=20000):
+    from django.utils import timezone
+
+    from chatbot.models import ChatMessage
+
+    now = timezone.now()
+    step = timedelta(days=365) / n
+    for start in range(0, n, batch_size):
+        ChatMessage.objects.bulk_create(
+            ChatMessage(
+                session_id=f"{i // 20:032x}",
+                sender="user" if i % 2 else "bot",
+                message=f"question {i % 500} about the coaching sessions",
+                timestamp=now - step * (n - i),
+            )
+            for i in range(start, min(start + batch_size, n))
+        )
+
+
+def timed(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.test import Client
+        from django.utils import timezone
+
+        from chatbot.retention import prune_messages
+        from coach_app.models import CustomUser
+
+        started = time.perf_counter()
+        fill(args.messages)
+        report("Setup", [("rows", args.messages), ("fill", f"{time.perf_counter() - started:.1f}s")])
+
+        browser = Client()
+        browser.force_login(CustomUser.objects.create_superuser("bench", "bench@example.com", "pw"))
+        session = f"{args.messages // 40:032x}"
+        pages = [
+            ("first page", {}),
+            ("search session id", {"q": session}),
+            ("search text", {"q": "question 42"}),
+            ("filter sender", {"sender": "user"}),
+        ]
+        report("Admin changelist (best of 5)", [
+            (label, f"{timed(lambda: browser.get('/admin/chatbot/chatmessage/', params)) * 1000:8.1f} ms")
+            for label, params in pages
+        ])
+
+        rows = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, days, archive in [("archive + delete", 270, Path(tmp) / "a.jsonl.gz"),
+                                         ("delete", 180, None)]:
+                result = prune_messages(timezone.now() - timedelta(days=days), archive_path=archive)
+                size = f", {archive.stat().st_size / 2**20:.1f} MiB" if archive else ""
+                rows.append((
+                    f"prune > {days}d, {label}",
+                    f"{result.deleted} rows in {result.elapsed:.2f}s "
+                    f"({result.deleted / result.elapsed:.0f} rows/s{size})",
+                ))
+        report("prune_chat", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+100 concurrent chats against a fake Ollama: blocking workers vs the async view.
+
+The "sync" run is what the old view did: each chat holds one of --workers
+threads (a WSGI worker pool) for the whole generation, so the other chats
+queue. The "async" run posts every chat to /chatbot/stream/ through the
+ASGI handler on a single event loop. With --questions K, the async chats
+only ask K distinct questions, so most are answered by the reply cache or
+join a generation already in flight.
+
+    python -m benchmarks.chat_load --chats 100 --workers 8 --delay 0.05
+    python -m benchmarks.chat_load --questions 5
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import bench_database, report, setup_django
+
+
+class Gauge:
+    """Counts chats in flight and remembers the peak."""
+
+    def __init__(self):
+        self.current = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.current -= 1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def worker_threads():
+    """Live threads, minus the fake Ollama server's own."""
+    return {t.ident for t in threading.enumerate() if not t.name.startswith("fake-ollama")}
+
+
+def run_sync(chats, workers):
+    from chatbot.models import ChatMessage
+    from chatbot.utils import chat_with_ollama
+
+    gauge = Gauge()
+    submitted = time.perf_counter()
+
+    def chat(n):
+        with gauge:
+            ChatMessage.objects.create(session_id=f"sync{n}", sender="user", message=f"question {n}")
+            reply = chat_with_ollama(f"User: question {n}\nAssistant:")
+            ChatMessage.objects.create(session_id=f"sync{n}", sender="bot", message=reply)
+        return time.perf_counter() - submitted
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(chat, range(chats)))
+    return latencies, latencies, gauge.peak, workers
+
+
+async def run_async(chats, questions):
+    from django.test import AsyncClient
+
+    gauge = Gauge()
+    before = worker_threads()
+    threads = set()
+
+    async def chat(n):
+        started = time.perf_counter()
+        first = None
+        with gauge:
+            response = await AsyncClient().post("/chatbot/stream/", {"message": f"question {n % questions}"})
+            async for _ in response.streaming_content:
+                first = first or time.perf_counter() - started
+            threads.update(worker_threads() - before)
+        return first, time.perf_counter() - started
+
+    results = await asyncio.gather(*(chat(n) for n in range(chats)))
+    first_tokens, latencies = zip(*results)
+    # the loop thread plus the thread(s) asgiref runs the ORM writes in
+    return list(first_tokens), list(latencies), gauge.peak, 1 + len(threads)
+
+
+def summarize(label, chats, elapsed, first_tokens, latencies, in_flight, threads):
+    report(label, [
+        ("chats", chats),
+        ("elapsed", f"{elapsed:.2f}s"),
+        ("throughput", f"{chats / elapsed:.1f} chats/s"),
+        ("first token p50 / p99", f"{percentile(first_tokens, .5):.2f}s / {percentile(first_tokens, .99):.2f}s"),
+        ("complete p50 / p99", f"{percentile(latencies, .5):.2f}s / {percentile(latencies, .99):.2f}s"),
+        ("peak chats in flight", in_flight),
+        ("threads occupied", threads),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="sync worker pool size")
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds between tokens")
+    parser.add_argument("--questions", type=int, help="distinct questions (default: all distinct)")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.test import override_settings
+
+    from chatbot.cache import cache_stats
+    from chatbot.fake_ollama import FakeOllama
+
+    with bench_database(), FakeOllama(delay=args.delay) as ollama, override_settings(OLLAMA_URL=ollama.url):
+        started = time.perf_counter()
+        first, done, in_flight, threads = run_sync(args.chats, args.workers)
+        summarize(f"sync, {args.workers} workers", args.chats, time.perf_counter() - started,
+                  first, done, in_flight, threads)
+
+        started = time.perf_counter()
+        first, done, in_flight, threads = asyncio.run(run_async(args.chats, args.questions or args.chats))
+        summarize("async view, 1 event loop", args.chats, time.perf_counter() - started,
+                  first, done, in_flight, threads)
+        stats = cache_stats()
+        report("reply cache", [
+            (name, stats[name]) for name in ("hits", "misses", "coalesced")
+        ] + [("upstream calls", len(ollama.requests) - args.chats)])
+
+
+if __name__ == "__main__":
+    main()
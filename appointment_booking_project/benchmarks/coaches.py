@@ -0,0 +1,99 @@
+"""
+Per-coach query cost as the number of coaches grows.
+
+Adds coaches, each with the same calendar (--days of slots, a third of
+them booked), and after each step times what one coach's page costs:
+the availability of their next --window days with a cold cache, booking
+validation for one of their slots and their dashboard. Every lookup leads
+with the coach (the unique constraint and the (coach, start_at) index),
+so latency and query counts should stay flat while the table grows.
+
+    python -m benchmarks.coaches --coaches 1 10 50
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks import bench_database, report, setup_django
+
+
+def seed_coach(n, first_day, days, client):
+    from coach_app.models import CustomUser, Session, TimeSlot
+    from coach_app.slots import date_range, generate_slots
+
+    coach = CustomUser.objects.create(username=f"coach{n}", is_coach=True)
+    generate_slots(date_range(first_day, first_day + timedelta(days=days - 1)), coach=coach)
+    booked = list(TimeSlot.objects.filter(coach=coach).order_by("start_at")[::3])
+    Session.objects.bulk_create(Session(client=client, timeslot=slot, subject="busy") for slot in booked)
+    TimeSlot.objects.filter(pk__in=[slot.pk for slot in booked]).update(is_available=False)
+    return coach
+
+
+def measure(func, repeat):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    reset_queries()  # a full query log would read as no queries
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000, len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--coaches", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--window", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.core.cache import cache
+        from django.test import Client
+        from django.utils import timezone
+
+        from coach_app.availability import free_windows
+        from coach_app.forms import SessionForm
+        from coach_app.models import CustomUser, TimeSlot
+
+        client = CustomUser.objects.create(username="bench")
+        first_day = date.today() + timedelta(days=1)
+        start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+        end = start + timedelta(days=args.window)
+        coaches = []
+        rows = []
+        for target in sorted(args.coaches):
+            while len(coaches) < target:
+                coaches.append(seed_coach(len(coaches), first_day, args.days, client))
+            coach = coaches[0]
+            free = TimeSlot.objects.filter(coach=coach, is_available=True).order_by("start_at").first()
+            data = {
+                "coach": coach.pk,
+                "timeslot": f"{free.date:%Y-%m-%d} {free.start_time:%H:%M}",
+                "subject": "probe",
+            }
+            browser = Client()
+            browser.force_login(coach)
+
+            def availability():
+                cache.clear()
+                free_windows(coach.pk, start, end)
+
+            timings = [
+                measure(availability, args.repeat),
+                measure(lambda: SessionForm(data).is_valid(), args.repeat),
+                measure(lambda: browser.get("/dashboard/"), args.repeat),
+            ]
+            rows.append((
+                f"{target} coaches, {TimeSlot.objects.count()} slots",
+                "  ".join(f"{ms:6.2f} ms ({queries}q)" for ms, queries in timings),
+            ))
+        report("One coach's availability (cold) / booking validation / dashboard", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Seeds a benchmark database with a realistic calendar.
+
+    from benchmarks.data import generate
+    dataset = generate(coaches=3, clients=200, sessions=2000)
+
+`coaches` coach accounts, each with a year of TimeSlots centred on today
+(so dashboards have both history and upcoming sessions), `clients` client
+accounts and `sessions` sessions booked on randomly picked slots. The same
+`seed` gives the same calendar, so runs compare like with like.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+PASSWORD = "bench-password"
+
+
+@dataclass
+class Dataset:
+    coaches: list
+    clients: list
+    first_day: date
+    last_day: date
+    free_slots: list = field(repr=False)  # future slots nobody booked, in start order
+
+
+def generate(coaches=3, clients=200, sessions=2000, *, days=365, seed=0):
+    from django.contrib.auth.hashers import make_password
+    from django.core.cache import cache
+
+    from coach_app.models import CustomUser, Session, TimeSlot
+    from coach_app.slots import date_range, generate_slots
+
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)  # hashed once, not per user
+    coach_users = CustomUser.objects.bulk_create(
+        CustomUser(username=f"coach{i}", email=f"coach{i}@example.com", is_coach=True, password=password)
+        for i in range(coaches)
+    )
+    client_users = CustomUser.objects.bulk_create(
+        CustomUser(username=f"client{i}", email=f"client{i}@example.com", password=password)
+        for i in range(clients)
+    )
+
+    first_day = date.today() - timedelta(days=days // 2)
+    last_day = first_day + timedelta(days=days - 1)
+    for coach in coach_users:
+        generate_slots(date_range(first_day, last_day), coach=coach)
+
+    slots = list(TimeSlot.objects.order_by("start_at").only("id", "coach", "date", "start_time", "start_at"))
+    booked = rng.sample(slots, min(sessions, len(slots)))
+    Session.objects.bulk_create(
+        (
+            Session(client=rng.choice(client_users), timeslot=slot, subject=f"session {n}")
+            for n, slot in enumerate(booked)
+        ),
+        batch_size=1000,
+    )
+    booked_ids = {slot.id for slot in booked}
+    TimeSlot.objects.filter(session__isnull=False).update(is_available=False)
+    cache.clear()  # bulk writes send no signals to invalidate availability
+
+    today = date.today()
+    free_slots = [slot for slot in slots if slot.id not in booked_ids and slot.start_at.date() > today]
+    return Dataset(coach_users, client_users, first_day, last_day, free_slots)
@@ -0,0 +1,66 @@
+"""
+Booking throughput under each database profile.
+
+Runs the mixed_load workload (bookings through POST /api/sessions/ next to
+threads INSERTing chat messages) once per profile, each in a fresh process
+since DATABASES is read at startup:
+
+    sqlite-default   SQLite with its default rollback journal (SQLITE_TUNING=0)
+    sqlite-wal       WAL, synchronous=NORMAL, busy_timeout, BEGIN IMMEDIATE
+    postgres-pool    --postgres URL through Django's connection pool
+    postgres-persistent  --postgres URL, CONN_MAX_AGE + health checks
+
+    python -m benchmarks.db_profiles --bookings 300 --workers 8 --chatters 8
+    python -m benchmarks.db_profiles --postgres postgres://user:pw@localhost/booking
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+
+from benchmarks import bench_database, setup_django
+
+
+def profiles(postgres_url):
+    yield "sqlite-default", {"DATABASE_URL": "", "SQLITE_TUNING": "0"}
+    yield "sqlite-wal", {"DATABASE_URL": "", "SQLITE_TUNING": "1"}
+    if postgres_url:
+        yield "postgres-pool", {"DATABASE_URL": postgres_url, "DB_POOL": "1"}
+        yield "postgres-persistent", {"DATABASE_URL": postgres_url, "DB_POOL": "0"}
+
+
+def run_profile(label, args):
+    from benchmarks.mixed_load import insert_message, run, seed
+
+    setup_django()
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    with bench_database():
+        seed(args.bookings)
+        run(label, insert_message, args.chatters, args.bookings, args.workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--chatters", type=int, default=8)
+    parser.add_argument("--postgres", metavar="URL", help="Postgres DATABASE_URL to include")
+    parser.add_argument("--profile", help=argparse.SUPPRESS)  # set in the child processes
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        return run_profile(args.profile, args)
+
+    workload = ["--bookings", str(args.bookings), "--workers", str(args.workers),
+                "--chatters", str(args.chatters)]
+    for label, env in profiles(args.postgres):
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.db_profiles", "--profile", label, *workload],
+            env={**os.environ, **env},
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+What a calendar client's poll costs, against re-opening the dashboard.
+
+Gives a coach --sessions sessions spread over the past and next year, then
+times the coach's dashboard, a full ICS download, an ICS poll revalidated
+with If-None-Match, and a delta sync after --changes new bookings.
+
+    python -m benchmarks.feeds --sessions 5000 --changes 5
+"""
+import argparse
+import time
+from datetime import date, time as clock_time, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def seed(coach, client, n_sessions):
+    from coach_app.models import Session, TimeSlot
+
+    first_day = date.today() - timedelta(days=365)
+    slots = TimeSlot.objects.bulk_create(
+        TimeSlot(
+            coach=coach,
+            date=first_day + timedelta(days=n // 16),
+            start_time=clock_time(9 + n % 16 // 2, 30 * (n % 2)),
+            is_available=False,
+        )
+        for n in range(n_sessions)
+    )
+    Session.objects.bulk_create(
+        Session(client=client, timeslot=slot, subject=f"s{n}") for n, slot in enumerate(slots)
+    )
+    spare = TimeSlot.objects.bulk_create(
+        TimeSlot(coach=coach, date=date.today() + timedelta(days=400), start_time=clock_time(9 + n))
+        for n in range(9)
+    )
+    return spare
+
+
+def measure(func, repeat):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        response = func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - started) / repeat
+    return response, f"{elapsed * 1000:8.2f} ms  {len(queries):>3} queries  {len(response.content):>9} bytes"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.test import Client
+        from django.urls import reverse
+        from django.utils import timezone
+
+        from coach_app.booking import book_timeslot
+        from coach_app.feeds import feed_token
+        from coach_app.models import CustomUser, Session
+
+        coach = create_coach()
+        client = CustomUser.objects.create(username="bench")
+        spare = seed(coach, client, args.sessions)
+        browser = Client()
+        browser.force_login(coach)
+        feed = reverse("calendar_feed", args=[feed_token(coach)])
+        changes = "/api/sessions/changes/"
+
+        rows = []
+        _, timing = measure(lambda: browser.get(reverse("dashboard")), args.repeat)
+        rows.append(("dashboard", timing))
+        response, timing = measure(lambda: browser.get(feed), args.repeat)
+        rows.append(("ICS, full", timing))
+        etag = response["ETag"]
+        _, timing = measure(lambda: browser.get(feed, HTTP_IF_NONE_MATCH=etag), args.repeat)
+        rows.append(("ICS, unchanged (304)", timing))
+
+        # as if seeded a minute before the last sync
+        Session.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        since = browser.get(changes).json()["next"]
+        for slot in spare[: args.changes]:
+            book_timeslot(client=client, timeslot=slot, subject="new")
+        _, timing = measure(lambda: browser.get(changes, {"since": since}), args.repeat)
+        rows.append((f"delta, {args.changes} changed", timing))
+        report(f"Polling a coach's calendar, {args.sessions} sessions", rows)
+
+
+if __name__ == "__main__":
+    main()
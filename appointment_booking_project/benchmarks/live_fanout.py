@@ -0,0 +1,140 @@
+"""
+Memory of idle availability streams, and the cost of pushing a change.
+
+For each of --subscribers, opens that many coach_app.live streams (the
+generator the SSE view serves, without the ASGI server's own state per
+connection) on a coach's calendar, spread over --days days, and reports
+the memory they hold once idle. Then changes the first day
+--changes times (invalidate_days, as a booking does) and reports how long
+until every subscriber of that day has the new slots. Finally stops
+reading on every stream and pushes --changes more changes, to show a
+stalled browser holds one event however many it misses.
+
+    python -m benchmarks.live_fanout --subscribers 1000 5000 10000 --days 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+from datetime import date, time as clock_time, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+class Tally:
+    """Counts the events received by a group of subscribers."""
+
+    def __init__(self):
+        self.received = 0
+        self.target = 0
+        self.reached = asyncio.Event()
+
+    def expect(self, events):
+        self.target = self.received + events
+        self.reached.clear()
+
+    def add(self):
+        self.received += 1
+        if self.received == self.target:
+            self.reached.set()
+
+
+async def subscriber(coach_id, day, tally):
+    from coach_app import live
+
+    async for event in live.stream(coach_id, day):
+        if event != live.KEEPALIVE:
+            tally.add()
+
+
+async def measure(coach_id, days, n_subscribers, n_changes):
+    from asgiref.sync import sync_to_async
+
+    from coach_app.availability import invalidate_days
+    from coach_app.live import get_broker
+
+    broker = get_broker()
+    tallies = {day: Tally() for day in days}
+    for day, tally in tallies.items():
+        tally.expect(len(range(days.index(day), n_subscribers, len(days))))
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [
+        asyncio.create_task(subscriber(coach_id, days[n % len(days)], tallies[days[n % len(days)]]))
+        for n in range(n_subscribers)
+    ]
+    for tally in tallies.values():
+        await tally.reached.wait()
+    idle = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    hot = tallies[days[0]]
+    fan_out = hot.target
+    latencies = []
+    for _ in range(n_changes):
+        hot.expect(fan_out)
+        started = time.perf_counter()
+        await sync_to_async(invalidate_days)(coach_id, [days[0]])
+        await hot.reached.wait()
+        latencies.append(time.perf_counter() - started)
+
+    # every browser stalls: nobody reads, changes keep coming
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    mailboxes = [broker.subscribe(coach_id, days[n % len(days)]) for n in range(n_subscribers)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(n_changes):
+        await sync_to_async(invalidate_days)(coach_id, days)
+        await asyncio.sleep(0.05)
+    stalled = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    pending = sum(not mailbox.empty() for mailbox in mailboxes)
+    for n, mailbox in enumerate(mailboxes):
+        broker.unsubscribe(coach_id, days[n % len(days)], mailbox)
+    return idle, fan_out, latencies, stalled, pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--changes", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from coach_app.models import TimeSlot
+
+        coach = create_coach()
+        first_day = date.today() + timedelta(days=1)
+        days = [first_day + timedelta(days=n) for n in range(args.days)]
+        TimeSlot.objects.bulk_create(
+            TimeSlot(coach=coach, date=day, start_time=clock_time(hour)) for day in days for hour in range(9, 18)
+        )
+
+        rows = []
+        for n_subscribers in args.subscribers:
+            idle, fan_out, latencies, stalled, pending = asyncio.run(
+                measure(coach.pk, days, n_subscribers, args.changes)
+            )
+            rows.append((
+                f"{n_subscribers} idle streams",
+                f"{idle / 2**20:7.1f} MiB  ({idle / n_subscribers:,.0f} bytes each)",
+            ))
+            rows.append((
+                f"  change pushed to {fan_out}",
+                f"{statistics.median(latencies) * 1000:7.1f} ms median, {max(latencies) * 1000:.1f} ms max",
+            ))
+            rows.append((
+                f"  {args.changes} changes, nobody reading",
+                f"{stalled / 2**20:7.1f} MiB more, {pending} streams holding one event",
+            ))
+        report(f"Live availability, {args.days} day(s) watched", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Cost of the per-view metrics (appointment_booking_project.metrics).
+
+Whole-request timings through the test client vary by several percent from
+round to round, more than the metrics cost, so the cost is measured in
+parts: the middleware around a view that does nothing (the fixed cost per
+request) and a query with and without the execute wrapper (the cost per
+query). Both are then set against real requests, using the query count the
+middleware itself recorded for them.
+
+    python -m benchmarks.metrics_overhead --requests 200 --sessions 200
+"""
+import argparse
+import time
+
+from benchmarks import bench_database, report, setup_django
+from benchmarks.settings_profiles import seed
+
+URLS = [("home", "/"), ("dashboard", "/dashboard/"), ("/api/sessions/", "/api/sessions/")]
+
+
+def best_of(function, number, rounds=5):
+    """Seconds per call, best of `rounds`."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def fixed_cost():
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from appointment_booking_project.metrics import PerfMiddleware
+
+    request = RequestFactory().get("/")
+    request.resolver_match = resolve("/")
+    response = HttpResponse()
+    middleware = PerfMiddleware(lambda request: response)
+    return best_of(lambda: middleware(request), 20000) - best_of(lambda: response, 20000)
+
+
+def query_cost():
+    from django.db import connection
+
+    from appointment_booking_project import metrics
+
+    def query():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT %s", [1])
+
+    without = best_of(query, 5000)
+    metrics.install(connection)
+    token = metrics.current.set(metrics.RequestStats())
+    try:
+        with_stats = best_of(query, 5000)
+    finally:
+        metrics.current.reset(token)
+    return with_stats - without
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.test import Client
+
+        from appointment_booking_project import metrics
+
+        per_request, per_query = fixed_cost(), query_cost()
+        rows = [
+            ("per request", f"{per_request * 1e6:6.1f} us"),
+            ("per query", f"{per_query * 1e6:6.1f} us"),
+        ]
+        browser = Client()
+        browser.force_login(seed(args.sessions))
+        for name, url in URLS:
+            browser.get(url)
+            metrics.clear()
+            elapsed = best_of(lambda: browser.get(url), args.requests, rounds=3)
+            series = metrics.db_queries._series[browser.get(url).resolver_match.view_name]
+            queries = series[-2] / series[-1]
+            cost = per_request + per_query * queries
+            rows.append((name, f"{elapsed * 1000:7.2f} ms, {queries:4.0f} queries: "
+                               f"metrics {cost * 1e6:5.1f} us = {cost / elapsed * 100:.2f}%"))
+        report("PerfMiddleware overhead", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Booking latency while chat traffic writes to the same database.
+
+Books --bookings distinct slots through POST /api/sessions/ from --workers
+threads while --chatters threads keep saving chat messages, once with no
+chat traffic, once with one INSERT per message (the old views) and once
+through the write-behind buffer (chatbot.buffer).
+
+    python -m benchmarks.mixed_load --bookings 300 --workers 8 --chatters 16
+"""
+import argparse
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def chat_traffic(save, stop, counter):
+    from django.db import connection
+
+    n = 0
+    while not stop.is_set():
+        save(f"bench{threading.get_ident()}-{n // 20}", "user" if n % 2 else "bot", f"message {n}")
+        n += 1
+    counter.append(n)
+    connection.close()
+
+
+def seed(bookings):
+    from coach_app.models import CustomUser
+    from coach_app.slots import date_range, generate_slots
+
+    CustomUser.objects.create(username="bench")
+    first_day = date.today() + timedelta(days=1)
+    generate_slots(date_range(first_day, first_day + timedelta(days=bookings // 18 + 1)), coach=create_coach())
+
+
+def insert_message(session_id, sender, message):
+    from chatbot.models import ChatMessage
+
+    ChatMessage.objects.create(session_id=session_id, sender=sender, message=message)
+
+
+def run(label, save, chatters, bookings, workers):
+    from django.test import Client
+
+    from chatbot.models import ChatMessage
+    from coach_app.models import CustomUser, Session, TimeSlot
+
+    Session.objects.all().delete()
+    TimeSlot.objects.update(is_available=True)
+    ChatMessage.objects.all().delete()
+    client_id = CustomUser.objects.get(username="bench").pk
+    slot_ids = list(TimeSlot.objects.order_by("id").values_list("id", flat=True)[:bookings])
+
+    def book(slot_id):
+        started = time.perf_counter()
+        response = Client(raise_request_exception=False).post(
+            "/api/sessions/",
+            {"timeslot_id": slot_id, "client_id": client_id, "subject": "bench"},
+            content_type="application/json",
+        )
+        return time.perf_counter() - started, response.status_code
+
+    stop, counts = threading.Event(), []
+    chat_threads = [
+        threading.Thread(target=chat_traffic, args=(save, stop, counts)) for _ in range(chatters if save else 0)
+    ]
+    for thread in chat_threads:
+        thread.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(book, slot_ids))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in chat_threads:
+        thread.join()
+
+    latencies = [latency for latency, _ in results]
+    report(label, [
+        ("bookings", len(results)),
+        ("bookings/s", f"{len(results) / elapsed:.1f}"),
+        ("failed", sum(status != 201 for _, status in results)),
+        ("booking p50", f"{percentile(latencies, .5) * 1000:.1f} ms"),
+        ("booking p99", f"{percentile(latencies, .99) * 1000:.1f} ms"),
+        ("chat messages/s", f"{sum(counts) / elapsed:.0f}"),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--chatters", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    # a locked database turns into 500s; they're counted, not logged
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    with bench_database(), tempfile.TemporaryDirectory() as log_dir:
+        from chatbot.buffer import MessageBuffer
+
+        seed(args.bookings)
+        buffer = MessageBuffer(max_size=200, interval=1.0, log_dir=log_dir)
+
+        run("no chat traffic", None, args.chatters, args.bookings, args.workers)
+        run("chat, one INSERT per message", insert_message, args.chatters, args.bookings, args.workers)
+        run("chat, write-behind buffer", buffer.add, args.chatters, args.bookings, args.workers)
+        buffer.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Materialized TimeSlot rows against recurring AvailabilityRules.
+
+For each horizon, fills one coach's calendar with generate_slots() and
+another's with a weekday rule (Monday to Friday, 09:00-18:00), books the
+same --bookings slots in both, and compares the rows stored, a cold
+availability query over the next 90 days, and the memory a whole-horizon
+availability query peaks at.
+
+    python -m benchmarks.rules --horizons 90 365 730 --bookings 200
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, datetime, time as clock_time, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def cold(func, repeat=5):
+    from django.core.cache import cache
+
+    best = float("inf")
+    for _ in range(repeat):
+        cache.clear()
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def peak(func):
+    from django.core.cache import cache
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[90, 365, 730])
+    parser.add_argument("--bookings", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.utils import timezone
+
+        from coach_app.availability import free_windows
+        from coach_app.booking import book_timeslot
+        from coach_app.models import AvailabilityRule, CustomUser, TimeSlot
+        from coach_app.rules import virtual_slot
+        from coach_app.slots import date_range, generate_slots
+
+        client = CustomUser.objects.create(username="bench")
+        first_day = date.today() + timedelta(days=1)
+        start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+        rows = []
+        for n, horizon in enumerate(sorted(args.horizons)):
+            last_day = first_day + timedelta(days=horizon - 1)
+            weekdays = list(date_range(first_day, last_day, weekdays={0, 1, 2, 3, 4}))
+            offered = [(day, clock_time(9 + i // 2, 30 * (i % 2))) for day in weekdays for i in range(18)]
+            picks = offered[:: max(len(offered) // args.bookings, 1)][: args.bookings]
+
+            stored = create_coach(f"stored{n}")
+            generate_slots(weekdays, coach=stored)
+            for day, start_time in picks:
+                book_timeslot(client=client, subject="bench", timeslot=TimeSlot.objects.get(
+                    coach=stored, date=day, start_time=start_time
+                ))
+
+            ruled = create_coach(f"ruled{n}")
+            AvailabilityRule.objects.bulk_create(
+                AvailabilityRule(coach=ruled, weekday=weekday, start_time=clock_time(9), end_time=clock_time(18))
+                for weekday in range(5)
+            )
+            for day, start_time in picks:
+                book_timeslot(client=client, subject="bench", timeslot=virtual_slot(ruled, day, start_time))
+
+            horizon_end = start + timedelta(days=horizon)
+            for label, coach in [("rows", stored), ("rules", ruled)]:
+                count = TimeSlot.objects.filter(coach=coach).count()
+                quarter = cold(lambda: free_windows(coach.pk, start, start + timedelta(days=90)))
+                memory = peak(lambda: free_windows(coach.pk, start, horizon_end))
+                rows.append((
+                    f"{horizon} days, {label}",
+                    f"{count:>6} rows  90-day query {quarter:6.2f} ms  "
+                    f"{horizon}-day query peak {memory / 2**20:5.1f} MiB",
+                ))
+        report(f"Calendar storage, {args.bookings} bookings", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Requests per second for home, dashboard and /api/sessions/ under the
+development and production settings profiles, and for the home page's
+static files under production (WhiteNoise; development leaves them to
+runserver).
+
+Each profile runs in its own process (settings are read at startup); the
+production one against a collectstatic'ed temporary STATIC_ROOT. Requests
+go through Django's test client, so this measures the framework side:
+middleware, template rendering and compression, not a web server.
+
+    python -m benchmarks.settings_profiles --requests 500 --sessions 200
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+PROFILES = {
+    "development": "appointment_booking_project.settings.development",
+    "production": "appointment_booking_project.settings.production",
+}
+URLS = [("home", "/"), ("dashboard", "/dashboard/"), ("/api/sessions/", "/api/sessions/")]
+STATIC_FILES = ["css/style.css", "images/coach.jpg"]
+
+
+def seed(n_sessions):
+    from coach_app.booking import book_timeslot
+    from coach_app.models import CustomUser, TimeSlot
+    from coach_app.slots import date_range, generate_slots
+
+    client = CustomUser.objects.create(username="bench")
+    first_day = date.today() - timedelta(days=n_sessions // 36)
+    generate_slots(date_range(first_day, first_day + timedelta(days=n_sessions // 9 + 1)), coach=create_coach())
+    for slot in TimeSlot.objects.order_by("start_at")[: n_sessions * 2 : 2]:
+        book_timeslot(client=client, timeslot=slot, subject="bench")
+    return client
+
+
+def run_profile(label, args):
+    setup_django()
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    urls = list(URLS)
+    if label == "production":
+        from django.core.management import call_command
+        from django.templatetags.static import static
+
+        call_command("collectstatic", interactive=False, verbosity=0)
+        urls += [(path, static(path)) for path in STATIC_FILES]
+
+    with bench_database():
+        from django.test import Client
+
+        browser = Client(headers={"accept-encoding": "gzip, br"})
+        browser.force_login(seed(args.sessions))
+        rows = []
+        for name, url in urls:
+            response = browser.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+            size = len(response.getvalue())
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                b"".join(browser.get(url))
+            elapsed = time.perf_counter() - started
+            rows.append((name, f"{args.requests / elapsed:7.0f} req/s  {size:>7} bytes "
+                               f"{response.get('Content-Encoding', '')}"))
+        report(label, rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--profile", help=argparse.SUPPRESS)  # set in the child processes
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        return run_profile(args.profile, args)
+
+    workload = ["--requests", str(args.requests), "--sessions", str(args.sessions)]
+    with tempfile.TemporaryDirectory() as static_root:
+        for label, module in PROFILES.items():
+            env = {
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": module,
+                "DJANGO_SECRET_KEY": os.environ.get("DJANGO_SECRET_KEY", "benchmark-only-" + "x" * 40),
+                "DJANGO_ALLOWED_HOSTS": "testserver",
+                "DJANGO_STATIC_ROOT": static_root,
+            }
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.settings_profiles", "--profile", label, *workload],
+                env=env,
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Booking latency with its emails sent inline or left to the task worker.
+
+Books --sessions sessions through POST /api/sessions/, once running the
+booking's task (confirmation, coach notice, reminder) inside the timed
+request, as sending them from the view would, and once leaving it queued.
+Then drains the queue with run_due() as the worker does. Email goes to a
+backend that sleeps --connect-ms per connection and --send-ms per message,
+standing in for an SMTP server.
+
+    python -m benchmarks.tasks --sessions 200 --connect-ms 20 --send-ms 2
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.mail.backends.locmem import EmailBackend
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+DELAYS = {"connect": 0.0, "send": 0.0}
+
+
+class SlowBackend(EmailBackend):
+    """locmem, at the pace of a remote server."""
+
+    connections = 0
+
+    def open(self):
+        SlowBackend.connections += 1
+        time.sleep(DELAYS["connect"])
+        return True
+
+    def send_messages(self, messages):
+        self.open()
+        time.sleep(DELAYS["send"] * len(messages))
+        return super().send_messages(messages)
+
+
+def calendar(name, n_sessions):
+    from coach_app.models import CustomUser, TimeSlot
+    from coach_app.slots import date_range, generate_slots
+
+    coach = create_coach(name)
+    coach.email = f"{name}@example.com"
+    coach.save()
+    first_day = date.today() + timedelta(days=3)
+    generate_slots(date_range(first_day, first_day + timedelta(days=n_sessions // 18 + 1)), coach=coach)
+    client = CustomUser.objects.create(username=f"{name}-client", email=f"{name}-client@example.com")
+    return client, list(TimeSlot.objects.filter(coach=coach).values_list("pk", flat=True)[:n_sessions])
+
+
+def book_all(api, client, slots, inline):
+    from coach_app.tasks import run_due
+
+    times = []
+    for pk in slots:
+        started = time.perf_counter()
+        response = api.post(
+            "/api/sessions/", {"client_id": client.pk, "timeslot_id": pk, "subject": "bench"}, format="json"
+        )
+        if inline:
+            run_due()
+        times.append(time.perf_counter() - started)
+        assert response.status_code == 201, response.data
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--connect-ms", type=float, default=20)
+    parser.add_argument("--send-ms", type=float, default=2)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args(argv)
+    DELAYS.update(connect=args.connect_ms / 1000, send=args.send_ms / 1000)
+
+    setup_django()
+    with bench_database():
+        from django.conf import settings
+        from django.core import mail
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+
+        from coach_app.models import Task
+        from coach_app.tasks import run_due
+
+        # this module, as run: under -m that is __main__, not benchmarks.tasks
+        settings.EMAIL_BACKEND = f"{SlowBackend.__module__}.SlowBackend"
+        api = APIClient()
+        rows = []
+        for label, inline in (("emails sent in the request", True), ("emails queued", False)):
+            client, slots = calendar("inline" if inline else "queued", args.sessions)
+            times = sorted(book_all(api, client, slots, inline))
+            rows.append((
+                f"POST /api/sessions/, {label}",
+                f"{statistics.median(times) * 1000:7.2f} ms median, "
+                f"{times[int(len(times) * 0.95)] * 1000:.2f} ms p95",
+            ))
+
+        queued = Task.objects.filter(run_at__lte=timezone.now()).count()
+        mail.outbox = []
+        SlowBackend.connections = 0
+        started = time.perf_counter()
+        while run_due(args.batch_size)[0]:
+            pass
+        elapsed = time.perf_counter() - started
+        rows.append((
+            f"worker, {queued} tasks",
+            f"{queued / elapsed:7.0f} tasks/s, {len(mail.outbox)} emails over "
+            f"{SlowBackend.connections} connections in {elapsed:.2f}s",
+        ))
+        rows.append(("reminders scheduled", str(Task.objects.filter(key__startswith="reminder:").count())))
+        report(f"Booking side effects, {args.sessions} bookings", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Cancellation cost and waitlist allocation throughput.
+
+Books --sessions sessions (one per day) for a coach, puts --waiters clients
+on the waitlist of each of those days, then cancels every session through
+DELETE /api/sessions/<id>/ and drains the queue with process_openings(),
+reporting the queries and latency a cancellation adds to its request and
+how fast the worker rebooks the freed slots.
+
+    python -m benchmarks.waitlist --sessions 500 --waiters 20
+"""
+import argparse
+import time
+from datetime import date, time as clock_time, timedelta
+
+from benchmarks import bench_database, create_coach, report, setup_django
+
+
+def seed(n_sessions, n_waiters):
+    from coach_app.models import CustomUser, Session, TimeSlot, WaitlistEntry
+
+    coach = create_coach()
+    booker = CustomUser.objects.create(username="booker")
+    waiters = CustomUser.objects.bulk_create(CustomUser(username=f"waiter{i}") for i in range(n_waiters))
+    first_day = date.today() + timedelta(days=1)
+    days = [first_day + timedelta(days=i) for i in range(n_sessions)]
+    slots = TimeSlot.objects.bulk_create(
+        TimeSlot(coach=coach, date=day, start_time=clock_time(10, 0), is_available=False) for day in days
+    )
+    sessions = Session.objects.bulk_create(
+        Session(client=booker, timeslot=slot, subject="booked") for slot in slots
+    )
+    WaitlistEntry.objects.bulk_create(
+        WaitlistEntry(client=waiter, coach=coach, date=day, subject="waiting", priority=i % 3)
+        for day in days
+        for i, waiter in enumerate(waiters)
+    )
+    return sessions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--waiters", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    setup_django()
+    with bench_database():
+        from django.db import connection, reset_queries
+        from django.test import Client
+        from django.test.utils import CaptureQueriesContext
+
+        from coach_app.models import WaitlistEntry
+        from coach_app.waitlist import process_openings
+
+        sessions = seed(args.sessions, args.waiters)
+        browser = Client()
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            assert browser.delete(f"/api/sessions/{sessions[0].pk}/").status_code == 204
+        per_cancel = len(queries)
+        started = time.perf_counter()
+        for session in sessions[1:]:
+            browser.delete(f"/api/sessions/{session.pk}/")
+        cancel = (time.perf_counter() - started) / max(len(sessions) - 1, 1)
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            process_openings(1)
+        per_opening = len(queries)
+        started = time.perf_counter()
+        processed = booked = 0
+        while True:
+            done, rebooked = process_openings(args.batch_size)
+            if not done:
+                break
+            processed += done
+            booked += rebooked
+        elapsed = time.perf_counter() - started
+
+        report(f"Waitlist, {args.sessions} cancellations, {args.waiters} waiters per day", [
+            ("DELETE /api/sessions/<id>/", f"{cancel * 1000:.2f} ms  ({per_cancel} queries)"),
+            ("allocation", f"{per_opening} queries per opening"),
+            ("worker", f"{processed / elapsed:.0f} openings/s ({booked} rebooked in {elapsed:.2f}s)"),
+            ("still waiting", str(WaitlistEntry.objects.filter(status="waiting").count())),
+        ])
+
+
+if __name__ == "__main__":
+    main()
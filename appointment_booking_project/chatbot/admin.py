@@ -1,8 +1,57 @@
+import re
+from datetime import timedelta
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import ChatMessage
 
+SESSION_KEY = re.compile(r'[a-z0-9]{32}')  # Django session keys
+
+
+class CappedCountPaginator(Paginator):
+    """Counts at most `max_count` rows instead of the whole table."""
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.max_count].count()
+
+
+class SenderFilter(admin.SimpleListFilter):
+    """Fixed choices: the default filter runs SELECT DISTINCT over the table."""
+    title = 'sender'
+    parameter_name = 'sender'
+
+    def lookups(self, request, model_admin):
+        return [('user', 'user'), ('bot', 'bot')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(sender=self.value())
+        return queryset
+
+
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
     list_display = ('session_id', 'sender', 'message','timestamp')
-    list_filter = ('sender', 'timestamp')
+    list_filter = (SenderFilter, 'timestamp')
     search_fields = ('message', 'session_id')
+    ordering = ('-timestamp',)  # walks chat_timestamp_idx
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    # text search can't use an index, so it only scans recent messages
+    search_days = 30
+    search_help_text = (
+        f"A session id finds the whole conversation; other text is searched "
+        f"in the last {search_days} days of messages."
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if SESSION_KEY.fullmatch(term):
+            return queryset.filter(session_id=term), False
+        if term:
+            queryset = queryset.filter(timestamp__gte=timezone.now() - timedelta(days=self.search_days))
+        return super().get_search_results(request, queryset, search_term)
@@ -0,0 +1,264 @@
+"""
+Write-behind persistence for ChatMessage.
+
+Chat messages are appended to a local log and kept in memory, then written
+with one bulk_create() once MAX_SIZE are pending or INTERVAL seconds after
+the first one arrived, instead of one INSERT (and one take of SQLite's
+write lock) per message. The interval flush runs on a timer thread of its
+own, so it happens whether the views run on the ASGI server's loop or on
+the throwaway loop of a WSGI request. Each process writes its own log
+segments; a segment is deleted once its messages are committed. Segments
+left behind by a process that died before flushing are replayed when a
+server process starts (recover_at_startup, called by asgi.py and wsgi.py).
+
+    CHATBOT_MESSAGE_BUFFER = {
+        "MAX_SIZE": 200,     # messages per bulk_create
+        "INTERVAL": 1.0,     # seconds a message may wait
+        "LOG_DIR": BASE_DIR / "chat_log",  # None: memory only
+        "FSYNC": False,      # fsync every append (survives power loss)
+    }
+"""
+import json
+import logging
+import os
+import threading
+import time
+from itertools import count
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, connections, transaction
+from django.dispatch import receiver
+from django.utils.dateparse import parse_datetime
+
+from .models import ChatMessage
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one process per LOG_DIR
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"MAX_SIZE": 200, "INTERVAL": 1.0, "LOG_DIR": None, "FSYNC": False}
+
+
+def _lock(file):
+    """Locks `file` for this process; False if another process holds it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class MessageBuffer:
+    def __init__(self, max_size=200, interval=1.0, log_dir=None, fsync=False):
+        self.max_size = max_size
+        self.interval = interval
+        self.log_dir = Path(log_dir) if log_dir else None
+        self.fsync = fsync
+        self._pending = []
+        self._first_pending_at = None
+        self._segment = None  # open log file the pending messages are in
+        self._segments = count()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time per process
+        self._timer = None  # threading.Timer of the scheduled interval flush
+        self._needs_recovery = False  # a flush failed, leaving its segment behind
+
+    def add(self, session_id, sender, message):
+        """
+        Queues a message; flushes if a threshold is reached, otherwise makes
+        sure a flush is scheduled within INTERVAL seconds. Sync callers only.
+        """
+        if self._append(ChatMessage(session_id=session_id, sender=sender, message=message)):
+            self.flush()
+        else:
+            self._schedule()
+
+    async def aadd(self, session_id, sender, message):
+        """
+        Queues a message from async code. Flushes in the ORM thread when
+        MAX_SIZE is reached, otherwise makes sure a flush is scheduled
+        within INTERVAL seconds.
+        """
+        if self._append(ChatMessage(session_id=session_id, sender=sender, message=message)):
+            await sync_to_async(self.flush)()
+        else:
+            self._schedule()
+
+    def _append(self, msg):
+        with self._lock:
+            if self.log_dir is not None:
+                self._log(msg)
+            self._pending.append(msg)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            return (
+                len(self._pending) >= self.max_size
+                or time.monotonic() - self._first_pending_at >= self.interval
+            )
+
+    def _log(self, msg):
+        if self._segment is None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            path = self.log_dir / f"{os.getpid()}-{next(self._segments)}.jsonl"
+            self._segment = open(path, "a", encoding="utf-8")
+            _lock(self._segment)
+        self._segment.write(json.dumps({
+            "session_id": msg.session_id,
+            "sender": msg.sender,
+            "message": msg.message,
+            "timestamp": msg.timestamp.isoformat(),
+        }) + "\n")
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+
+    def _schedule(self):
+        with self._lock:
+            if self._timer is not None or not self._pending:
+                return
+            self._timer = threading.Timer(self.interval, self._flush_later)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_later(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            connection.close()  # the timer thread's own
+        self._schedule()  # for messages that came in during the flush
+
+    def close(self):
+        """Cancels the scheduled flush, leaving pending messages in the log."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def pending(self, session_id=None):
+        """Messages not written yet, optionally only those of one session."""
+        with self._lock:
+            return [m for m in self._pending if session_id is None or m.session_id == session_id]
+
+    def flush(self):
+        """Writes every pending message in one bulk_create(); returns how many."""
+        with self._flush_lock:
+            if self._needs_recovery:
+                self._needs_recovery = False
+                self.recover()
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._first_pending_at = None
+                segment, self._segment = self._segment, None
+            if not batch:
+                return 0
+            try:
+                with transaction.atomic():
+                    ChatMessage.objects.bulk_create(batch)
+            except Exception:
+                # still in the segment, which recover() picks up next time
+                logger.exception("Could not write %d chat messages", len(batch))
+                if segment is not None:
+                    segment.close()
+                    self._needs_recovery = True
+                return 0
+            if segment is not None:
+                os.remove(segment.name)  # while still locked
+                segment.close()
+            return len(batch)
+
+    def recover(self):
+        """
+        Writes the messages of segments no live process owns (left by a
+        crash or a failed flush), skipping those already in the database.
+        """
+        if self.log_dir is None or not self.log_dir.is_dir():
+            return 0
+        own = self._segment.name if self._segment is not None else None
+        replayed = 0
+        for path in sorted(self.log_dir.glob("*.jsonl")):
+            if str(path) == own:
+                continue
+            try:
+                segment = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue  # its owner just flushed it
+            with segment:
+                if not _lock(segment):
+                    continue  # another process is still writing it
+                rows = [json.loads(line) for line in segment if line.endswith("\n")]
+                messages = [
+                    ChatMessage(
+                        session_id=row["session_id"],
+                        sender=row["sender"],
+                        message=row["message"],
+                        timestamp=parse_datetime(row["timestamp"]),
+                    )
+                    for row in rows
+                ]
+                replayed += self._write_missing(messages)
+                path.unlink(missing_ok=True)
+        if replayed:
+            logger.warning("Replayed %d chat messages from %s", replayed, self.log_dir)
+        return replayed
+
+    @staticmethod
+    def _write_missing(messages):
+        if not messages:
+            return 0
+        existing = set(
+            ChatMessage.objects.filter(
+                session_id__in={m.session_id for m in messages},
+                timestamp__in={m.timestamp for m in messages},
+            ).values_list("session_id", "sender", "timestamp")
+        )
+        missing = [m for m in messages if (m.session_id, m.sender, m.timestamp) not in existing]
+        ChatMessage.objects.bulk_create(missing)
+        return len(missing)
+
+
+_buffer = None
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        options = {**DEFAULTS, **getattr(settings, "CHATBOT_MESSAGE_BUFFER", {})}
+        _buffer = MessageBuffer(
+            max_size=options["MAX_SIZE"],
+            interval=options["INTERVAL"],
+            log_dir=options["LOG_DIR"],
+            fsync=options["FSYNC"],
+        )
+    return _buffer
+
+
+def recover_at_startup():
+    """
+    Replays the segments earlier processes left behind; for the server
+    entry points, before the first request.
+    """
+    try:
+        get_buffer().recover()
+    except Exception:
+        logger.exception("Could not replay the chat message log")
+    finally:
+        connections.close_all()
+
+
+@receiver(setting_changed)
+def reset_buffer(*, setting, **kwargs):
+    global _buffer
+    if setting == "CHATBOT_MESSAGE_BUFFER":
+        if _buffer is not None:
+            _buffer.close()
+        _buffer = None
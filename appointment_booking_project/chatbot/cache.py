@@ -0,0 +1,160 @@
+import asyncio
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from .utils import OLLAMA_ERROR, stream_ollama
+
+# per-process hit/miss/coalesced counters, see cache_stats()
+stats = Counter()
+
+
+def normalize_prompt(text):
+    """
+    Cache key for a visitor message: "Prix ?", "prix?" and "  PRIX? " all
+    map to "prix".
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" ?!.,;:")
+
+
+class ResponseCache:
+    """In-process LRU of replies, each kept for at most `ttl` seconds."""
+
+    def __init__(self, maxsize=1000, ttl=3600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires, reply), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, reply = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                stats["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return reply
+
+    def set(self, key, reply):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, reply)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+responses = ResponseCache(
+    maxsize=getattr(settings, "CHATBOT_CACHE_SIZE", 1000),
+    ttl=getattr(settings, "CHATBOT_CACHE_TTL", 3600),
+)
+
+
+class Flight:
+    """
+    One upstream generation, shared by every request for the same key while
+    it runs. It runs as its own task, so a visitor closing the tab doesn't
+    cancel it for the others.
+    """
+
+    def __init__(self, key, prompt, model):
+        self.key = key
+        self.tokens = []
+        self.done = False
+        self.loop = asyncio.get_running_loop()
+        self._changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._run(prompt, model))
+
+    async def _run(self, prompt, model):
+        try:
+            async for token in stream_ollama(prompt, model):
+                await self._publish(token)
+            # only complete, successful replies are worth keeping
+            if OLLAMA_ERROR not in self.tokens:
+                responses.set(self.key, "".join(self.tokens))
+        finally:
+            if _flights.get(self.key) is self:
+                del _flights[self.key]
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def _publish(self, token):
+        self.tokens.append(token)
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def follow(self):
+        """Yields every token, from the first one, as it arrives."""
+        sent = 0
+        while True:
+            while sent < len(self.tokens):
+                yield self.tokens[sent]
+                sent += 1
+            if self.done:
+                return
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or sent < len(self.tokens))
+
+
+_flights = {}  # key -> Flight in progress
+
+
+async def stream_reply(prompt, model="llama3", key=None):
+    """
+    stream_ollama() behind the response cache: a cached reply comes back as
+    a single token, and a prompt already being generated joins that
+    generation instead of starting another. `key` defaults to the
+    normalized prompt.
+    """
+    key = (model, normalize_prompt(prompt) if key is None else key)
+    reply = responses.get(key)
+    if reply is not None:
+        stats["hits"] += 1
+        yield reply
+        return
+
+    flight = _flights.get(key)
+    if flight is not None and flight.loop is asyncio.get_running_loop():
+        stats["coalesced"] += 1
+    else:
+        stats["misses"] += 1
+        flight = _flights[key] = Flight(key, prompt, model)
+    async for token in flight.follow():
+        yield token
+
+
+async def cached_reply(prompt, model="llama3", key=None):
+    return "".join([token async for token in stream_reply(prompt, model, key)])
+
+
+def cache_stats():
+    lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "coalesced": stats["coalesced"],
+        "evictions": stats["evictions"],
+        "expirations": stats["expirations"],
+        "size": len(responses),
+        "maxsize": responses.maxsize,
+        "hit_ratio": (stats["hits"] + stats["coalesced"]) / lookups if lookups else None,
+    }
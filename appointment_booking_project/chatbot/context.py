@@ -0,0 +1,134 @@
+"""
+Conversation context for the chatbot prompt.
+
+The prompt carries the last MESSAGES messages of the conversation (one
+query on the (session_id, timestamp) index, plus those still waiting in
+the write-behind buffer) and a rolling summary of everything older. The
+summary lives in the cache and is only extended, with a second query, when
+messages have left the window since it was last updated. The whole prompt is trimmed to
+TOKEN_BUDGET, so its size, and the generation time with it, stays bounded
+however long the conversation runs.
+
+    CHATBOT_CONTEXT = {
+        "MESSAGES": 10,         # recent messages quoted verbatim
+        "TOKEN_BUDGET": 1000,   # whole prompt
+        "SUMMARY_TOKENS": 200,  # share of it the summary may use
+    }
+"""
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .buffer import get_buffer
+from .models import ChatMessage
+
+DEFAULTS = {"MESSAGES": 10, "TOKEN_BUDGET": 1000, "SUMMARY_TOKENS": 200}
+SUMMARY_TIMEOUT = 14 * 24 * 60 * 60  # a session's lifetime
+FOLD_LIMIT = 200  # most messages folded into the summary at once
+SPEAKERS = {"user": "User", "bot": "Assistant"}
+
+
+def options():
+    return {**DEFAULTS, **getattr(settings, "CHATBOT_CONTEXT", {})}
+
+
+def count_tokens(text):
+    """Rough token count (about four characters per token for Llama-style vocabularies)."""
+    return len(text) // 4 + 1
+
+
+class Summary(NamedTuple):
+    lines: tuple  # one line per earlier visitor question, oldest first
+    through: object  # timestamp of the newest message folded in, or None
+
+
+def _key(session_id):
+    return f"chat-summary:{session_id}"
+
+
+def fold(summary, messages, max_tokens):
+    """
+    `summary` extended with `messages`: what the visitor asked, one short
+    line each, dropping the oldest lines beyond `max_tokens`.
+    """
+    lines = list(summary.lines)
+    for msg in messages:
+        if msg.sender == "user":
+            text = " ".join(msg.message.split())
+            lines.append(text if len(text) <= 120 else text[:117] + "...")
+    while lines and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    through = messages[-1].timestamp if messages else summary.through
+    return Summary(tuple(lines), through)
+
+
+async def recent_messages(session_id, limit):
+    """
+    (window, previous): the last `limit` messages of a conversation, oldest
+    first, and the message just before them (None at the start).
+    """
+    rows = ChatMessage.objects.filter(session_id=session_id).order_by("-timestamp", "-id")[:limit + 1]
+    stored = [msg async for msg in rows]
+    stored.reverse()
+    messages = stored + get_buffer().pending(session_id)
+    window = messages[-limit:]
+    previous = messages[-limit - 1] if len(messages) > limit else None
+    return window, previous
+
+
+async def rolling_summary(session_id, window, previous, max_tokens):
+    """
+    The cached summary of the conversation, brought up to the first message
+    of `window`. Reads the messages that left the window since the last
+    update, and nothing when `previous` (the message before the window) is
+    already in.
+    """
+    summary = await cache.aget(_key(session_id)) or Summary((), None)
+    if previous is None or (summary.through is not None and previous.timestamp <= summary.through):
+        return summary
+    older = ChatMessage.objects.filter(session_id=session_id, timestamp__lt=window[0].timestamp)
+    if summary.through is not None:
+        older = older.filter(timestamp__gt=summary.through)
+    dropped = [msg async for msg in older.order_by("-timestamp", "-id")[:FOLD_LIMIT]]
+    if dropped:
+        dropped.reverse()
+        summary = fold(summary, dropped, max_tokens)
+        await cache.aset(_key(session_id), summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def render(summary_lines, history, user_msg):
+    parts = []
+    if summary_lines:
+        parts.append("Earlier in this conversation the visitor asked about:")
+        parts.extend(f"- {line}" for line in summary_lines)
+    parts.extend(f"{SPEAKERS.get(msg.sender, msg.sender)}: {msg.message}" for msg in history)
+    parts.append(f"User: {user_msg}")
+    parts.append("Assistant:")
+    return "\n".join(parts)
+
+
+async def build_prompt(session_id, user_msg):
+    """
+    (prompt, has_context) for the next reply of `session_id`. Call it before
+    queuing `user_msg` itself.
+    """
+    opts = options()
+    budget = opts["TOKEN_BUDGET"]
+    history, previous = await recent_messages(session_id, opts["MESSAGES"])
+    summary = await rolling_summary(session_id, history, previous, opts["SUMMARY_TOKENS"])
+
+    # an oversized message keeps its beginning and gets the whole budget
+    if count_tokens(user_msg) > budget:
+        user_msg = user_msg[: budget * 3]
+        history, lines = [], ()
+    else:
+        lines = summary.lines
+    # drop the oldest history first, then the oldest summary lines
+    while count_tokens(render(lines, history, user_msg)) > budget and (history or lines):
+        if history:
+            history = history[1:]
+        else:
+            lines = lines[1:]
+    return render(lines, history, user_msg), bool(history or lines)
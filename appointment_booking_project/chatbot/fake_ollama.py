@@ -0,0 +1,128 @@
+"""
+A stand-in for Ollama's /api/generate, for tests and load runs.
+
+Replies with a fixed list of tokens, `delay` seconds apart, streamed as
+NDJSON (or as one JSON object when the request has "stream": false).
+
+    with FakeOllama(tokens=["Hello", " there"], delay=0.01) as ollama:
+        with override_settings(OLLAMA_URL=ollama.url):
+            ...
+
+    python -m chatbot.fake_ollama --port 11434 --delay 0.05
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TOKENS = ["Hello", "!", " How", " can", " I", " help", " you", "?"]
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128  # the default of 5 drops bursts of connects
+
+    def process_request(self, request, client_address):
+        # named, so load scripts can tell these threads from the app's
+        thread = threading.Thread(
+            target=self.process_request_thread, args=(request, client_address),
+            name="fake-ollama-request", daemon=True,
+        )
+        thread.start()
+
+
+class FakeOllama:
+    def __init__(self, tokens=DEFAULT_TOKENS, delay=0.0, port=0, status=200):
+        self.tokens = list(tokens)
+        self.delay = delay
+        self.status = status
+        self.requests = []  # parsed JSON bodies, in arrival order
+        self.server = _Server(("127.0.0.1", port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fake.requests.append(body)
+                if fake.status != 200:
+                    self.send_response(fake.status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if body.get("stream", True):
+                    self.stream(body)
+                else:
+                    for _ in fake.tokens:
+                        time.sleep(fake.delay)
+                    self.send_json(200, {"model": body.get("model"), "response": "".join(fake.tokens), "done": True})
+
+            def stream(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in fake.tokens:
+                    time.sleep(fake.delay)
+                    self.chunk({"model": body.get("model"), "response": token, "done": False})
+                self.chunk({"model": body.get("model"), "response": "", "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def chunk(self, data):
+                line = json.dumps(data).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+
+            def send_json(self, status, data):
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds between tokens")
+    args = parser.parse_args(argv)
+    fake = FakeOllama(delay=args.delay, port=args.port)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
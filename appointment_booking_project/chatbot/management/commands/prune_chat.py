@@ -0,0 +1,53 @@
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from chatbot.retention import prune_messages
+
+UNITS = {'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def parse_age(value):
+    """'90d' -> timedelta(days=90); a bare number is days."""
+    match = re.fullmatch(r'(\d+)([hdw]?)', value.strip().lower())
+    if not match:
+        raise CommandError(f"Invalid age {value!r}, expected e.g. 90d, 12w or 48h.")
+    number, unit = match.groups()
+    return timedelta(**{UNITS[unit or 'd']: int(number)})
+
+
+class Command(BaseCommand):
+    help = "Deletes old chat messages in chunks, optionally archiving them first."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', required=True, type=parse_age,
+                            help="Age of the messages to remove, e.g. 90d, 12w or 48h.")
+        parser.add_argument('--archive', type=Path, metavar='DIR',
+                            help="Write the messages to DIR/chat-<cutoff>.jsonl.gz before deleting them.")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Rows per DELETE. Default: 5000.")
+
+    def handle(self, *args, older_than, archive, chunk_size, **options):
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size must be positive.")
+        before = timezone.now() - older_than
+
+        archive_path = None
+        if archive is not None:
+            archive.mkdir(parents=True, exist_ok=True)
+            archive_path = archive / f"chat-{before:%Y%m%dT%H%M%S}.jsonl.gz"
+            if archive_path.exists():
+                raise CommandError(f"{archive_path} already exists.")
+
+        result = prune_messages(before, archive_path=archive_path, chunk_size=chunk_size)
+        if archive_path is not None and result.archived == 0:
+            archive_path.unlink()
+            archive_path = None
+        archived = f", archived to {archive_path}" if archive_path else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result.deleted} messages older than {before:%Y-%m-%d %H:%M}{archived} "
+            f"in {result.elapsed:.2f}s."
+        ))
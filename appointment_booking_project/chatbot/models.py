@@ -8,9 +8,15 @@ class ChatMessage(models.Model):
     message = models.TextField()
     timestamp = models.DateTimeField(default=timezone.now)
     
+    class Meta:
+        indexes = [
+            # a conversation, in order
+            models.Index(fields=["session_id", "timestamp"], name="chat_session_ts_idx"),
+            # retention (prune_chat) and the admin's date filter
+            models.Index(fields=["timestamp"], name="chat_timestamp_idx"),
+        ]
     
     def __str__(self):
         return f"[{self.sender}] {self.message[:50]}"
     
 
-
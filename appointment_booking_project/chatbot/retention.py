@@ -0,0 +1,65 @@
+import gzip
+import json
+import time as clock
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from .models import ChatMessage
+
+ARCHIVE_FIELDS = ("id", "session_id", "sender", "message", "timestamp")
+
+
+@dataclass
+class PruneResult:
+    deleted: int
+    archived: int
+    elapsed: float
+
+
+def archive_messages(queryset, path, chunk_size=5000):
+    """
+    Streams `queryset` to `path` as gzipped JSON lines, in id order and
+    constant memory. Returns (rows written, highest id written).
+    """
+    written, last_id = 0, None
+    rows = queryset.order_by("id").values_list(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size)
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        for row in rows:
+            record = dict(zip(ARCHIVE_FIELDS, row))
+            record["timestamp"] = record["timestamp"].isoformat()
+            archive.write(json.dumps(record) + "\n")
+            written, last_id = written + 1, record["id"]
+    return written, last_id
+
+
+def delete_in_chunks(queryset, chunk_size=5000):
+    """
+    Deletes `queryset` a chunk of ids at a time, each chunk in its own
+    short transaction, so writers aren't locked out for the whole purge.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by("id").values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            deleted += ChatMessage.objects.filter(id__in=ids).delete()[0]
+
+
+def prune_messages(before, *, archive_path=None, chunk_size=5000):
+    """
+    Deletes the chat messages older than `before` (an aware datetime),
+    first writing them to `archive_path` (.jsonl.gz) if given. Only rows
+    that made it into the archive are deleted.
+    """
+    started = clock.perf_counter()
+    old = ChatMessage.objects.filter(timestamp__lt=before)
+    archived = 0
+    if archive_path is not None:
+        archived, last_id = archive_messages(old, archive_path, chunk_size)
+        if last_id is None:
+            return PruneResult(deleted=0, archived=0, elapsed=clock.perf_counter() - started)
+        old = old.filter(id__lte=last_id)
+    deleted = delete_in_chunks(old, chunk_size)
+    return PruneResult(deleted=deleted, archived=archived, elapsed=clock.perf_counter() - started)
@@ -1,3 +1,248 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import time
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from appointment_booking_project import metrics
+
+from .buffer import MessageBuffer, get_buffer
+from .cache import ResponseCache, normalize_prompt, responses, stats
+from .fake_ollama import FakeOllama
+from .models import ChatMessage
+from .utils import OLLAMA_ERROR
+from .views import MERCI_REPLY
+
+
+def parse_events(body):
+    """[(event, data)] from a text/event-stream body."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+class ChatbotTests(TestCase):
+    def setUp(self):
+        self.ollama = FakeOllama(tokens=["Hi", " there", "!"]).start()
+        self.addCleanup(self.ollama.stop)
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        settings = override_settings(
+            OLLAMA_URL=self.ollama.url,
+            CHATBOT_MESSAGE_BUFFER={"MAX_SIZE": 100, "INTERVAL": 60, "LOG_DIR": log_dir.name},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        responses.clear()
+        stats.clear()
+
+    async def stream(self, message):
+        response = await self.async_client.post("/chatbot/stream/", {"message": message})
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        return response, parse_events(body.decode())
+
+    async def test_response_returns_full_reply(self):
+        response = await self.async_client.post("/chatbot/", {"message": "hello"})
+        self.assertEqual(response.json(), {"response": "Hi there!"})
+        self.assertEqual(self.ollama.requests[0]["prompt"], "User: hello\nAssistant:")
+
+    async def test_stream_sends_tokens_then_done(self):
+        response, events = await self.stream("hello")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(events, [
+            ("message", {"token": "Hi"}),
+            ("message", {"token": " there"}),
+            ("message", {"token": "!"}),
+            ("done", {"response": "Hi there!"}),
+        ])
+
+    async def test_stream_saves_both_messages_in_one_session(self):
+        await self.stream("hello")
+        await self.stream("again")
+        self.assertFalse(await ChatMessage.objects.aexists())
+        self.assertEqual(len(get_buffer().pending()), 4)
+
+        await sync_to_async(get_buffer().flush)()
+        messages = [m async for m in ChatMessage.objects.order_by("id")]
+        self.assertEqual(
+            [(m.sender, m.message) for m in messages],
+            [("user", "hello"), ("bot", "Hi there!"), ("user", "again"), ("bot", "Hi there!")],
+        )
+        self.assertEqual(len({m.session_id for m in messages}), 1)
+
+    async def test_merci_does_not_call_ollama(self):
+        _, events = await self.stream("Merci")
+        self.assertEqual(events[-1], ("done", {"response": MERCI_REPLY}))
+        self.assertEqual(self.ollama.requests, [])
+
+    async def test_llm_time_is_recorded(self):
+        metrics.clear()
+        await self.async_client.post("/chatbot/", {"message": "hello"})
+        response, _ = await self.stream("something else")
+        self.assertEqual(metrics.llm_seconds.count("chatbot_response"), 1)
+        # streamed: recorded once the body has been sent
+        self.assertEqual(metrics.llm_seconds.count("chatbot_stream"), 1)
+        self.assertEqual(metrics.request_seconds.count("chatbot_stream"), 1)
+
+    async def test_upstream_error(self):
+        self.ollama.status = 500
+        response = await self.async_client.post("/chatbot/", {"message": "hello"})
+        self.assertEqual(response.json(), {"response": OLLAMA_ERROR})
+
+    async def test_get_not_allowed(self):
+        response = await self.async_client.get("/chatbot/stream/")
+        self.assertEqual(response.status_code, 405)
+
+    async def test_repeated_message_served_from_cache(self):
+        # three visitors, each opening their conversation with it
+        await AsyncClient().post("/chatbot/", {"message": "Prix ?"})
+        response = await AsyncClient().post("/chatbot/", {"message": "prix?"})
+        _, events = await self.stream("  PRIX? ")
+        self.assertEqual(response.json(), {"response": "Hi there!"})
+        self.assertEqual(events, [("message", {"token": "Hi there!"}), ("done", {"response": "Hi there!"})])
+        self.assertEqual(len(self.ollama.requests), 1)
+        self.assertEqual((stats["misses"], stats["hits"]), (1, 2))
+
+    async def test_concurrent_identical_messages_share_one_generation(self):
+        self.ollama.delay = 0.02
+        replies = await asyncio.gather(*(
+            self.async_client.post("/chatbot/", {"message": "horaires?"}) for _ in range(5)
+        ))
+        self.assertEqual([r.json()["response"] for r in replies], ["Hi there!"] * 5)
+        self.assertEqual(len(self.ollama.requests), 1)
+        self.assertEqual((stats["misses"], stats["coalesced"]), (1, 4))
+
+    async def test_follow_up_gets_context_and_skips_cache(self):
+        await self.async_client.post("/chatbot/", {"message": "prix?"})
+        await self.async_client.post("/chatbot/", {"message": "prix?"})
+        self.assertEqual(len(self.ollama.requests), 2)
+        self.assertEqual(
+            self.ollama.requests[1]["prompt"],
+            "User: prix?\nAssistant: Hi there!\nUser: prix?\nAssistant:",
+        )
+
+    async def test_errors_are_not_cached(self):
+        self.ollama.status = 500
+        await self.async_client.post("/chatbot/", {"message": "hello"})
+        self.ollama.status = 200
+        response = await self.async_client.post("/chatbot/", {"message": "hello"})
+        self.assertEqual(response.json(), {"response": "Hi there!"})
+        self.assertEqual(len(self.ollama.requests), 2)
+
+    async def test_cache_stats_staff_only(self):
+        response = await self.async_client.get("/chatbot/cache-stats/")
+        self.assertEqual(response.status_code, 403)
+
+        staff = await get_user_model().objects.acreate(username="staff", is_staff=True)
+        await self.async_client.aforce_login(staff)
+        response = await self.async_client.get("/chatbot/cache-stats/")
+        self.assertEqual(response.json()["size"], 0)
+
+
+class MessageBufferTests(TestCase):
+    def setUp(self):
+        log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(log_dir.cleanup)
+        self.log_dir = log_dir.name
+
+    def test_flushes_when_full(self):
+        buffer = MessageBuffer(max_size=3, interval=60, log_dir=self.log_dir)
+        self.addCleanup(buffer.close)
+        buffer.add("s1", "user", "one")
+        buffer.add("s2", "user", "two")
+        self.assertEqual(ChatMessage.objects.count(), 0)
+        self.assertEqual([m.message for m in buffer.pending("s1")], ["one"])
+
+        with self.assertNumQueries(3):  # savepoint, INSERT, release
+            buffer.add("s1", "bot", "three")
+        self.assertEqual(ChatMessage.objects.count(), 3)
+        self.assertEqual(buffer.pending(), [])
+        self.assertEqual(os.listdir(self.log_dir), [])
+
+    def test_flushes_after_interval(self):
+        buffer = MessageBuffer(max_size=100, interval=0, log_dir=self.log_dir)
+        buffer.add("s1", "user", "one")
+        self.assertEqual(ChatMessage.objects.count(), 1)
+
+    def test_log_of_dead_process_is_replayed_once(self):
+        crashed = MessageBuffer(max_size=100, interval=60, log_dir=self.log_dir)
+        self.addCleanup(crashed.close)
+        crashed.add("s1", "user", "one")
+        crashed.add("s1", "bot", "two")
+        crashed._segment.close()  # the process dies, releasing its lock
+
+        # a message of the log was committed before the crash
+        ChatMessage.objects.bulk_create([crashed.pending()[0]])
+
+        # at startup (recover_at_startup)
+        restarted = MessageBuffer(max_size=100, interval=60, log_dir=self.log_dir)
+        with self.assertLogs("chatbot.buffer", "WARNING"):
+            self.assertEqual(restarted.recover(), 1)
+        self.assertEqual(restarted.recover(), 0)
+        self.assertEqual(
+            list(ChatMessage.objects.order_by("timestamp").values_list("sender", "message")),
+            [("user", "one"), ("bot", "two")],
+        )
+        self.assertEqual(os.listdir(self.log_dir), [])
+
+    def test_log_of_live_buffer_is_left_alone(self):
+        live = MessageBuffer(max_size=100, interval=60, log_dir=self.log_dir)
+        self.addCleanup(live.close)
+        live.add("s1", "user", "one")
+        other = MessageBuffer(max_size=100, interval=60, log_dir=self.log_dir)
+        self.assertEqual(other.recover(), 0)
+        self.assertEqual(live.flush(), 1)
+        self.assertEqual(ChatMessage.objects.count(), 1)
+
+
+class IntervalFlushTests(TransactionTestCase):
+    def setUp(self):
+        self.ollama = FakeOllama(tokens=["Hi"]).start()
+        self.addCleanup(self.ollama.stop)
+        settings = override_settings(
+            OLLAMA_URL=self.ollama.url,
+            CHATBOT_MESSAGE_BUFFER={"MAX_SIZE": 100, "INTERVAL": 0.2, "LOG_DIR": None},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        responses.clear()
+
+    def test_flushed_under_wsgi_without_further_messages(self):
+        # the sync client runs the async view on a loop of its own, gone
+        # once the response is sent: the timer must not depend on it
+        self.assertEqual(self.client.post("/chatbot/", {"message": "hello"}).status_code, 200)
+        deadline = time.monotonic() + 5
+        while ChatMessage.objects.count() < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(ChatMessage.objects.count(), 2)
+        self.assertEqual(get_buffer().pending(), [])
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = ResponseCache(maxsize=2, ttl=10, clock=lambda: self.now)
+
+    def test_normalize_prompt(self):
+        self.assertEqual(normalize_prompt("  Prix   du\tcoaching ?! "), "prix du coaching")
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertEqual((self.cache.get("a"), self.cache.get("b"), self.cache.get("c")), (1, None, 3))
+
+    def test_entries_expire(self):
+        self.cache.set("a", 1)
+        self.now = 9
+        self.assertEqual(self.cache.get("a"), 1)
+        self.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(len(self.cache), 0)
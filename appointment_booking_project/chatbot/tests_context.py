@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .buffer import get_buffer
+from .context import Summary, build_prompt, fold
+from .models import ChatMessage
+
+SESSION = "s" * 32
+
+
+def conversation(*messages, session_id=SESSION):
+    """Stores alternating user/bot messages, a minute apart."""
+    start = timezone.now() - timedelta(hours=1)
+    return ChatMessage.objects.bulk_create(
+        ChatMessage(
+            session_id=session_id,
+            sender="user" if i % 2 == 0 else "bot",
+            message=text,
+            timestamp=start + timedelta(minutes=i),
+        )
+        for i, text in enumerate(messages)
+    )
+
+
+class BuildPromptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        settings = override_settings(
+            CHATBOT_CONTEXT={"MESSAGES": 2, "TOKEN_BUDGET": 1000, "SUMMARY_TOKENS": 200},
+            CHATBOT_MESSAGE_BUFFER={"MAX_SIZE": 100, "INTERVAL": 60, "LOG_DIR": None},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def build(self, user_msg):
+        return async_to_sync(build_prompt)(SESSION, user_msg)
+
+    def test_first_message(self):
+        self.assertEqual(self.build("hello"), ("User: hello\nAssistant:", False))
+
+    def test_short_conversation_is_one_query(self):
+        conversation("hi")
+        with self.assertNumQueries(1):
+            prompt, has_context = self.build("prix?")
+        self.assertEqual(prompt, "User: hi\nUser: prix?\nAssistant:")
+        self.assertTrue(has_context)
+
+    def test_older_messages_are_summarized_once(self):
+        conversation("prix?", "50 euros", "horaires?", "9h-18h")
+        with self.assertNumQueries(2):
+            prompt, _ = self.build("merci")
+        self.assertEqual(prompt, "\n".join([
+            "Earlier in this conversation the visitor asked about:",
+            "- prix?",
+            "User: horaires?",
+            "Assistant: 9h-18h",
+            "User: merci",
+            "Assistant:",
+        ]))
+        # nothing left the window since: the cached summary is enough
+        with self.assertNumQueries(1):
+            self.assertEqual(self.build("merci")[0], prompt)
+
+    def test_pending_messages_are_part_of_the_window(self):
+        conversation("prix?", "50 euros")
+        get_buffer().add(SESSION, "user", "horaires?")
+        prompt, _ = self.build("merci")
+        self.assertEqual(prompt.splitlines()[-4:], [
+            "Assistant: 50 euros", "User: horaires?", "User: merci", "Assistant:",
+        ])
+
+    def test_trimmed_to_token_budget(self):
+        with self.settings(CHATBOT_CONTEXT={"MESSAGES": 10, "TOKEN_BUDGET": 20, "SUMMARY_TOKENS": 5}):
+            conversation("a" * 40, "b" * 40, "c" * 20, "d" * 8)
+            prompt, _ = self.build("prix?")
+            self.assertEqual(prompt, "User: cccccccccccccccccccc\nAssistant: dddddddd\nUser: prix?\nAssistant:")
+
+            prompt, has_context = self.build("x" * 500)
+            self.assertLessEqual(len(prompt), 20 * 4)
+            self.assertFalse(has_context)
+
+
+class FoldTests(SimpleTestCase):
+    def test_keeps_newest_questions_within_budget(self):
+        messages = [
+            ChatMessage(sender="user", message="first   question", timestamp=timezone.now()),
+            ChatMessage(sender="bot", message="answer", timestamp=timezone.now()),
+            ChatMessage(sender="user", message="x" * 200, timestamp=timezone.now()),
+        ]
+        summary = fold(Summary(("older",), None), messages, max_tokens=35)
+        self.assertEqual(summary.lines, ("first question", "x" * 117 + "..."))
+        self.assertEqual(summary.through, messages[-1].timestamp)
@@ -0,0 +1,86 @@
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .admin import CappedCountPaginator
+from .models import ChatMessage
+from .retention import prune_messages
+
+
+def make_messages(days_ago, n, session_id="a" * 32):
+    when = timezone.now() - timedelta(days=days_ago)
+    return ChatMessage.objects.bulk_create(
+        ChatMessage(session_id=session_id, sender="user", message=f"msg {i}", timestamp=when)
+        for i in range(n)
+    )
+
+
+class PruneChatTests(TestCase):
+    def setUp(self):
+        self.old = make_messages(100, 7)
+        self.recent = make_messages(1, 3)
+
+    def test_deletes_in_chunks(self):
+        # per chunk: savepoint, SELECT ids, DELETE, release; then the empty SELECT
+        with self.assertNumQueries(4 * 4 + 3):
+            result = prune_messages(timezone.now() - timedelta(days=90), chunk_size=2)
+        self.assertEqual(result.deleted, 7)
+        self.assertEqual(
+            set(ChatMessage.objects.values_list("id", flat=True)), {m.id for m in self.recent}
+        )
+
+    def test_archives_before_deleting(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "chat.jsonl.gz"
+            result = prune_messages(timezone.now() - timedelta(days=90), archive_path=path, chunk_size=3)
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertEqual((result.archived, result.deleted), (7, 7))
+        self.assertEqual([row["id"] for row in rows], [m.id for m in self.old])
+        self.assertEqual(rows[0]["message"], "msg 0")
+        self.assertEqual(ChatMessage.objects.count(), 3)
+
+    def test_command(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command("prune_chat", "--older-than", "90d", "--archive", tmp, stdout=out)
+            self.assertEqual(len(list(Path(tmp).glob("chat-*.jsonl.gz"))), 1)
+        self.assertIn("Deleted 7 messages", out.getvalue())
+        self.assertEqual(ChatMessage.objects.count(), 3)
+
+    def test_command_rejects_bad_age(self):
+        with self.assertRaises(CommandError):
+            call_command("prune_chat", "--older-than", "soon")
+
+
+class ChatMessageAdminTests(TestCase):
+    def setUp(self):
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin)
+        make_messages(100, 2, session_id="a" * 32)
+        make_messages(1, 3, session_id="b" * 32)
+
+    def changelist(self, **params):
+        return self.client.get("/admin/chatbot/chatmessage/", params)
+
+    def test_session_id_search_finds_whole_conversation(self):
+        response = self.changelist(q="a" * 32)
+        self.assertEqual(response.context["cl"].result_count, 2)
+
+    def test_text_search_only_scans_recent_messages(self):
+        response = self.changelist(q="msg")
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+    @mock.patch.object(CappedCountPaginator, "max_count", 4)
+    def test_count_is_capped(self):
+        response = self.changelist()
+        self.assertEqual(response.context["cl"].result_count, 4)
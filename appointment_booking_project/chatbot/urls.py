@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import chatbot_response
+from .views import chatbot_cache_stats, chatbot_response, chatbot_stream
 
 
 urlpatterns = [
     path('',chatbot_response,name='chatbot_response'),
+    path('stream/',chatbot_stream,name='chatbot_stream'),
+    path('cache-stats/',chatbot_cache_stats,name='chatbot_cache_stats'),
 ]
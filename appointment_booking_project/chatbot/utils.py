@@ -1,14 +1,77 @@
+import asyncio
+import json
+import weakref
+
+import httpx
 import requests
+from django.conf import settings
+
+from appointment_booking_project.metrics import llm_timer
+
+OLLAMA_ERROR = "Erreur : impossible de joindre Ollama."
+
+# one pooled client per event loop (a client can't be shared across loops)
+_async_clients = weakref.WeakKeyDictionary()
+_sync_session = requests.Session()
+
+
+def _ollama_url():
+    return getattr(settings, "OLLAMA_URL", "http://localhost:11434").rstrip("/") + "/api/generate"
+
+
+def _timeout():
+    return getattr(settings, "OLLAMA_TIMEOUT", 60)
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(_timeout(), connect=5),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _async_clients[loop] = client
+    return client
+
 
 def chat_with_ollama(prompt, model="llama3"):
-    url = "http://localhost:11434/api/generate"
+    url = _ollama_url()
     payload = {
         "model": model,
         "prompt": prompt,
         "stream": False
     }
-    response = requests.post(url, json=payload)
+    try:
+        with llm_timer():
+            response = _sync_session.post(url, json=payload, timeout=(5, _timeout()))
+    except requests.RequestException:
+        return OLLAMA_ERROR
     if response.status_code == 200:
         return response.json().get('response', '')
     else:
-        return "Erreur : impossible de joindre Ollama."
+        return OLLAMA_ERROR
+
+
+async def stream_ollama(prompt, model="llama3"):
+    """
+    Yields the reply token by token as Ollama generates it. On any upstream
+    failure yields OLLAMA_ERROR instead (possibly after partial output).
+    """
+    payload = {"model": model, "prompt": prompt, "stream": True}
+    try:
+        with llm_timer():
+            async with get_async_client().stream("POST", _ollama_url(), json=payload) as response:
+                if response.status_code != 200:
+                    yield OLLAMA_ERROR
+                    return
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        return
+    except (httpx.HTTPError, ValueError):
+        yield OLLAMA_ERROR
@@ -1,33 +1,108 @@
+import json
+
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-from .models import ChatMessage
-from .utils import chat_with_ollama
+from django.http import JsonResponse, StreamingHttpResponse
+from .buffer import get_buffer
+from .cache import cache_stats, normalize_prompt, stream_reply
+from .context import build_prompt
+from .utils import stream_ollama
 
+MERCI_REPLY = 'For more information, create an account and schedule an appointment. We look forward to hearing from you! See you soon!'
+
+
+async def get_session_id(request):
+    if not request.session.session_key:
+        # a non-empty session, so SessionMiddleware sends the cookie back and
+        # the next message lands in the same conversation
+        request.session['chatbot'] = True
+        await request.session.asave()  # forces creation of a session
+    return request.session.session_key
+
+
+async def generate(session_id, user_msg):
+    """
+    Saves the user message and yields the reply tokens. A conversation's
+    first message is answered through the reply cache (see chatbot.cache);
+    later ones depend on the conversation so far (see chatbot.context) and
+    go to Ollama directly.
+    """
+    prompt, has_context = await build_prompt(session_id, user_msg)
+    # save user message (written in batches, see chatbot.buffer)
+    await get_buffer().aadd(session_id, 'user', user_msg)
+    if has_context:
+        tokens = stream_ollama(prompt, model="llama3")
+    else:
+        tokens = stream_reply(prompt, model="llama3", key=normalize_prompt(user_msg))
+    async for token in tokens:
+        yield token
 
-@csrf_exempt
 
-def chatbot_response(request):
+# Both views are async: while Ollama generates, the request only holds a
+# coroutine on the event loop, not a worker thread. Serve through asgi.py.
+
+@csrf_exempt
+async def chatbot_response(request):
     if request.method == 'POST':
         user_msg = request.POST.get('message','')
-        if not request.session.session_key:
-            request.session.save()  # forces creation of a session
-            
-        session_id = request.session.session_key or request.session.create()
-        
-        # save user message
-        ChatMessage.objects.create(session_id = session_id, sender = 'user', message = user_msg)
-        
-        # bot logic 
+        session_id = await get_session_id(request)
+
+        # bot logic
         if user_msg.strip().lower() == 'merci':
-            bot_msg = 'For more information, create an account and schedule an appointment. We look forward to hearing from you! See you soon!'
+            await get_buffer().aadd(session_id, 'user', user_msg)
+            bot_msg = MERCI_REPLY
         else:
-            bot_msg = f" you said : {user_msg}"
-                        # Use Ollama API for intelligent response
-            prompt = f"User: {user_msg}\nAssistant:"
-            bot_msg = chat_with_ollama(prompt, model="llama3")
-            
+            # Use Ollama API for intelligent response
+            bot_msg = "".join([token async for token in generate(session_id, user_msg)])
+
         # save bot response
-        ChatMessage.objects.create(session_id = session_id, sender = 'bot', message = bot_msg)
-        
+        await get_buffer().aadd(session_id, 'bot', bot_msg)
+
         return JsonResponse({'response' : bot_msg})
     return JsonResponse({'response' : 'Non authorized '}, status = 405)
+
+
+def sse(data, event=None):
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@csrf_exempt
+async def chatbot_stream(request):
+    """
+    Same exchange as chatbot_response, but the reply is streamed as
+    Server-Sent Events while it is generated: one `data: {"token": ...}`
+    event per chunk, then `event: done` carrying the full reply.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'response' : 'Non authorized '}, status = 405)
+
+    user_msg = request.POST.get('message','')
+    session_id = await get_session_id(request)
+
+    async def events():
+        tokens = []
+        if user_msg.strip().lower() == 'merci':
+            await get_buffer().aadd(session_id, 'user', user_msg)
+            tokens.append(MERCI_REPLY)
+            yield sse({'token': MERCI_REPLY})
+        else:
+            async for token in generate(session_id, user_msg):
+                tokens.append(token)
+                yield sse({'token': token})
+        bot_msg = "".join(tokens)
+        await get_buffer().aadd(session_id, 'bot', bot_msg)
+        yield sse({'response': bot_msg}, event='done')
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let a proxy hold the tokens back
+    return response
+
+
+async def chatbot_cache_stats(request):
+    """Hit/miss/coalesced counters of the reply cache in this process."""
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'response' : 'Non authorized '}, status = 403)
+    return JsonResponse(cache_stats())
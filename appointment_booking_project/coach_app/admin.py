@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import CustomUser, TimeSlot, Session
+from .models import (
+    AvailabilityException, AvailabilityRule, CustomUser, TimeSlot, Session, Task, WaitlistEntry,
+)
+from django.utils import timezone
+from .slots import generate_slots
 from datetime import datetime, timedelta, time
 from django import forms
 from django.forms.widgets import Select
@@ -39,22 +43,19 @@ class TimeSlotAdminForm(forms.ModelForm):
 
 @admin.action(description="Generate 30-minute slots from 09:00 to 18:00")
 def generate_timeslots(modeladmin, request, queryset):
-    for obj in queryset:
-        selected_date = obj.date
-        start = time(9, 0)
-        end = time(18, 0)
-
-        current_time = datetime.combine(selected_date, start)
-        end_datetime = datetime.combine(selected_date, end)
-
-        while current_time < end_datetime:
-            start_time = current_time.time()
-
-            # Check if this slot already exists
-            if not TimeSlot.objects.filter(date=selected_date, start_time=start_time).exists():
-                TimeSlot.objects.create(date=selected_date, start_time=start_time)
-            
-            current_time += timedelta(minutes=30)
+    # fills the selected dates in each selected slot's coach's calendar
+    dates_by_coach = {}
+    for coach_id, day in queryset.values_list('coach', 'date').distinct():
+        dates_by_coach.setdefault(coach_id, []).append(day)
+    created = elapsed = 0
+    for coach in CustomUser.objects.filter(pk__in=dates_by_coach):
+        result = generate_slots(dates_by_coach[coach.pk], coach=coach)
+        created += result.created
+        elapsed += result.elapsed
+    modeladmin.message_user(
+        request,
+        f"Created {created} slots ({created / elapsed if elapsed else 0:.0f} rows/s).",
+    )
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
@@ -67,14 +68,53 @@ class CustomUserAdmin(admin.ModelAdmin):
 class TimeSlotAdmin(admin.ModelAdmin):
     form = TimeSlotAdminForm
     search_fields = ['date', 'start_time']
-    list_display = ('date', 'start_time', 'is_available')
-    list_filter = ('date', 'is_available')
+    list_display = ('coach', 'date', 'start_time', 'is_available')
+    list_filter = ('coach', 'date', 'is_available')
+    list_select_related = ('coach',)
     actions = [generate_timeslots]
 
 @admin.register(Session)
 class SessionAdmin(admin.ModelAdmin):
-    list_display = ['subject', 'client', 'timeslot']
+    list_display = ['subject', 'coach', 'client', 'timeslot']
     search_fields = ['subject', 'client__username']
     autocomplete_fields = ['client', 'timeslot']
-    list_filter = ['timeslot__date']
+    list_filter = ['coach', 'timeslot__date']
+    list_select_related = ['coach', 'client', 'timeslot']
+
+@admin.register(AvailabilityRule)
+class AvailabilityRuleAdmin(admin.ModelAdmin):
+    list_display = ('coach', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until')
+    list_filter = ('coach', 'weekday')
+    list_select_related = ('coach',)
+
+@admin.register(AvailabilityException)
+class AvailabilityExceptionAdmin(admin.ModelAdmin):
+    list_display = ('coach', 'date', 'start_time', 'end_time', 'reason')
+    list_filter = ('coach',)
+    search_fields = ('reason',)
+    date_hierarchy = 'date'
+    list_select_related = ('coach',)
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('client', 'coach', 'date', 'earliest', 'latest', 'priority', 'status', 'created_at')
+    list_filter = ('status', 'coach')
+    search_fields = ('client__username', 'subject')
+    date_hierarchy = 'date'
+    raw_id_fields = ('session',)
+    list_select_related = ('client', 'coach')
+
+@admin.action(description="Run again now")
+def retry_tasks(modeladmin, request, queryset):
+    updated = queryset.update(
+        status=Task.Status.PENDING, run_at=timezone.now(), attempts=0, locked_by='', locked_until=None
+    )
+    modeladmin.message_user(request, f"{updated} task(s) queued again.")
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'run_at', 'status', 'attempts', 'max_attempts', 'key', 'locked_until')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key', 'last_error')
+    date_hierarchy = 'run_at'
+    actions = [retry_tasks]
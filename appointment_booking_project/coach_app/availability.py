@@ -0,0 +1,233 @@
+import hashlib
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import live, rules
+from .models import CustomUser, TimeSlot, slot_bounds
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+# per-process hit/miss/invalidation counters, see cache_stats()
+stats = Counter()
+
+
+class Slot(NamedTuple):
+    id: int  # None for a slot only offered by the coach's rules
+    start_time: object
+    start_at: datetime
+    end_at: datetime
+    is_available: bool
+
+
+class DayAvailability(NamedTuple):
+    slots: tuple
+    modified: float  # unix time the entry was built, for Last-Modified
+    etag: str
+
+    @classmethod
+    def build(cls, slots, modified):
+        slots = tuple(slots)
+        digest = hashlib.md5(repr(slots).encode(), usedforsecurity=False).hexdigest()
+        return cls(slots, modified, f'"{digest}"')
+
+
+def _generation(coach_id):
+    """
+    The generation of coach `coach_id`'s rules, part of each of their keys:
+    a rule can change any number of dates, so changing one starts a new
+    generation (invalidate_rules) instead of deleting keys. An evicted
+    generation is replaced by a new one, which only costs misses.
+    """
+    key = f"availability-rules:{coach_id}"
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def _key(coach_id, generation, day):
+    return f"availability:{coach_id}:{generation}:{day.isoformat()}"
+
+
+def days_availability(coach_id, days):
+    """
+    {date: DayAvailability} of coach `coach_id`'s calendar for `days`, read
+    from the cache. Missing days are built together: their TimeSlot rows in
+    one query (on the (coach, date, start_time) index), over the slots the
+    coach's rules offer (one more query, two with exceptions); a row wins
+    over the rule slot at the same time. A slot closer to a booked session
+    than the coach's buffer (one more query, if any is booked) is listed
+    as taken.
+    """
+    days = list(days)
+    generation = _generation(coach_id)
+    cached = cache.get_many([_key(coach_id, generation, day) for day in days])
+    result = {}
+    missing = []
+    for day in days:
+        entry = cached.get(_key(coach_id, generation, day))
+        if entry is None:
+            missing.append(day)
+        else:
+            result[day] = entry
+    stats["hits"] += len(result)
+    stats["misses"] += len(missing)
+
+    if missing:
+        by_day = {day: {} for day in missing}
+        booked = {day: [] for day in missing}
+        for day, start_time, minutes in rules.expand(*rules.load(coach_id, missing), missing):
+            by_day[day][start_time] = Slot(None, start_time, *slot_bounds(day, start_time, minutes), True)
+        rows = TimeSlot.objects.filter(coach_id=coach_id, date__in=missing).values_list(
+            "date", "id", "start_time", "start_at", "end_at", "is_available", "session"
+        )
+        for day, *slot, session in rows:
+            slot = by_day[day][slot[1]] = Slot(*slot)
+            if session is not None:
+                booked[day].append(slot)
+        buffer = timedelta(0)
+        if any(booked.values()):
+            buffer = timedelta(minutes=(
+                CustomUser.objects.filter(pk=coach_id).values_list("buffer_minutes", flat=True).first() or 0
+            ))
+        built = time.time()
+        fresh = {
+            day: DayAvailability.build(_mark_taken(slots.values(), booked[day], buffer), built)
+            for day, slots in by_day.items()
+        }
+        cache.set_many(
+            {_key(coach_id, generation, day): entry for day, entry in fresh.items()}, CACHE_TIMEOUT
+        )
+        result.update(fresh)
+    return result
+
+
+def _mark_taken(slots, booked, buffer):
+    """`slots` in start order, those within `buffer` of a `booked` one no longer available."""
+    result = []
+    for slot in sorted(slots, key=lambda slot: slot.start_at):
+        if slot.is_available and any(
+            slot.start_at < other.end_at + buffer and slot.end_at > other.start_at - buffer
+            for other in booked
+        ):
+            slot = slot._replace(is_available=False)
+        result.append(slot)
+    return result
+
+
+def day_availability(coach_id, day):
+    return days_availability(coach_id, [day])[day]
+
+
+def invalidate_days(coach_id, days):
+    """
+    Drops the cached entries of coach `coach_id` for `days`, now and again
+    once the current transaction commits, so a reader can't re-cache
+    pre-commit data; then tells the pages showing those days (live).
+    """
+    days = set(days)
+    if not days:
+        return
+    generation = _generation(coach_id)
+    keys = [_key(coach_id, generation, day) for day in days]
+    stats["invalidations"] += len(keys)
+    cache.delete_many(keys)
+
+    def committed():
+        cache.delete_many(keys)
+        live.publish(coach_id, days)
+
+    transaction.on_commit(committed)
+
+
+def invalidate_rules(coach_id):
+    """
+    Drops every cached day of coach `coach_id` by starting a new generation,
+    now and again once the current transaction commits, then tells every
+    page showing one of their days.
+    """
+    key = f"availability-rules:{coach_id}"
+    stats["invalidations"] += 1
+    cache.set(key, time.time_ns(), None)
+
+    def committed():
+        cache.set(key, time.time_ns(), None)
+        live.publish(coach_id)
+
+    transaction.on_commit(committed)
+
+
+def cache_stats():
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "invalidations": stats["invalidations"],
+        "hit_ratio": stats["hits"] / lookups if lookups else None,
+    }
+
+
+def validators(entries, *query):
+    """
+    (etag, last_modified) covering several DayAvailability entries.
+
+    `query` (e.g. the requested range and duration) is mixed into the ETag,
+    so a response is only revalidated for the same question.
+    """
+    entries = list(entries)
+    digest = hashlib.md5(
+        "".join([*(entry.etag for entry in entries), *map(repr, query)]).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    last_modified = max((entry.modified for entry in entries), default=0)
+    return f'"{digest}"', int(last_modified)
+
+
+def _local_date(value):
+    return timezone.localtime(value, timezone.get_default_timezone()).date()
+
+
+def free_windows(coach_id, start, end, min_duration=timedelta(0), days=None):
+    """
+    Contiguous free time in coach `coach_id`'s calendar between `start` and
+    `end` (aware datetimes), as a list of (window_start, window_end) at
+    least `min_duration` long.
+
+    Free slots that touch (one ends when the next starts) are merged into a
+    single window. Slots come from the per-day cache; pass `days` (as
+    returned by days_availability) to reuse entries already fetched.
+    """
+    if days is None:
+        days = days_availability(coach_id, date_span(start, end))
+    windows = []
+    current_start = current_end = None
+    for day in sorted(days):
+        for slot in days[day].slots:
+            if not slot.is_available or not start <= slot.start_at < end:
+                continue
+            if current_end is not None and slot.start_at == current_end:
+                current_end = slot.end_at
+                continue
+            if current_end is not None:
+                windows.append((current_start, current_end))
+            current_start, current_end = slot.start_at, slot.end_at
+    if current_end is not None:
+        windows.append((current_start, current_end))
+    return [(s, e) for s, e in windows if e - s >= min_duration]
+
+
+def date_span(start, end):
+    """Local dates touched by [start, end)."""
+    day, last = _local_date(start), _local_date(end - timedelta(microseconds=1))
+    days = []
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
@@ -0,0 +1,372 @@
+from bisect import bisect_right
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from typing import NamedTuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import notifications, tasks
+from .availability import invalidate_days
+from .models import MAX_SESSION_MINUTES, CustomUser, Session, TimeSlot
+from .rules import coach_hours, hours_by_day, virtual_slots, within
+
+LONGEST_SESSION = timedelta(minutes=MAX_SESSION_MINUTES)
+
+TAKEN = "That slot was just booked. Please pick another."
+OUT_OF_HOURS = "Appointments must end within the coach's working hours."
+
+
+class SlotUnavailable(Exception):
+    """
+    Raised when a TimeSlot was claimed by someone else before us.
+    """
+
+
+def conflicts(coach, start_at, end_at, exclude=None):
+    """
+    The coach's booked slots closer to [start_at, end_at) than their
+    buffer: those with start < end_at + buffer and end > start_at - buffer.
+
+    Both ends are open, but the start is also bounded below by the longest
+    session, so this is a range scan on the (coach, start_at) index that
+    reads only the sessions near the interval: O(log n) in the calendar's
+    size. `exclude` is the pk of the slot being booked.
+    """
+    before, after = start_at - coach.buffer, end_at + coach.buffer
+    booked = TimeSlot.objects.filter(
+        coach=coach,
+        start_at__gt=before - LONGEST_SESSION,
+        start_at__lt=after,
+        end_at__gt=before,
+        session__isnull=False,
+    )
+    if exclude is not None:
+        booked = booked.exclude(pk=exclude)
+    return booked
+
+
+def book_timeslot(*, client, timeslot, subject, duration=None):
+    """
+    Claims `timeslot` for `client` and creates the Session, all in one
+    transaction.
+
+    The claim is a conditional UPDATE ... WHERE is_available, so only one
+    of several concurrent callers can flip the flag; the others see 0 rows
+    updated and get SlotUnavailable instead of an IntegrityError on the
+    OneToOneField. This works on every backend (SQLite has no
+    select_for_update) and costs a single UPDATE + INSERT.
+
+    An unsaved `timeslot` (a slot offered by the coach's rules, see
+    coach_app.rules) is claimed by inserting its row already taken: the
+    (coach, date, start_time) constraint lets only one caller do that.
+
+    `duration` (minutes) resizes the slot to the session's length; a row
+    made longer must still end within the coach's hours that day
+    (rules.coach_hours), or SlotUnavailable is raised. Once claimed, the
+    slot is checked against the coach's other sessions and buffer
+    (conflicts()) inside the same transaction, which serializes overlapping
+    bookings on SQLite; on PostgreSQL the exclusion constraint of
+    0009_session_duration does it for overlaps.
+    """
+    if duration is not None and duration != timeslot.duration:
+        # rule slots were sized against the rules' hours by virtual_slot()
+        if timeslot.pk is not None and duration > timeslot.duration and not within(
+            coach_hours(timeslot.coach, timeslot.date), timeslot.date, timeslot.start_time, duration
+        ):
+            raise SlotUnavailable(OUT_OF_HOURS)
+        timeslot.duration = duration
+        timeslot.fill_bounds()
+    with transaction.atomic():
+        try:
+            if timeslot.pk is None:
+                timeslot.is_available = False
+                with transaction.atomic():
+                    timeslot.save()
+            else:
+                claimed = TimeSlot.objects.filter(
+                    pk=timeslot.pk, is_available=True
+                ).update(is_available=False, duration=timeslot.duration, end_at=timeslot.end_at)
+                if not claimed:
+                    raise SlotUnavailable(TAKEN)
+        except IntegrityError:
+            timeslot.is_available = True
+            raise SlotUnavailable(TAKEN)
+
+        if conflicts(timeslot.coach, timeslot.start_at, timeslot.end_at, exclude=timeslot.pk).exists():
+            # raising out of atomic() rolls the claim back
+            raise SlotUnavailable("That time is too close to another session. Please pick another.")
+
+        try:
+            session = Session.objects.create(
+                client=client, coach_id=timeslot.coach_id, timeslot=timeslot, subject=subject
+            )
+        except IntegrityError:
+            # is_available was stale: a Session already points at this slot.
+            # Raising out of atomic() rolls the claim back as well.
+            raise SlotUnavailable(TAKEN)
+        # emails and reminders are left to the task worker
+        tasks.enqueue(notifications.sessions_booked, session_ids=[session.pk])
+
+    timeslot.is_available = False
+    return session
+
+
+class BatchResult(NamedTuple):
+    session: object  # the booked Session, or None
+    error: str  # why the item was not booked, or None
+
+
+class _Contended(Exception):
+    """Something in a batch was booked concurrently, or an atomic batch failed."""
+
+
+ROLLED_BACK = "Not booked: another session in the batch could not be."
+
+
+def book_batch(items, *, atomic=True):
+    """
+    Books several sessions in one transaction and returns a BatchResult per
+    item, in order. An item is a dict of client_id, subject, an optional
+    duration (minutes) and either timeslot_id or coach_id and start (an
+    aware datetime, for slots the coach's rules offer).
+
+    Atomic batches book every item or none; otherwise the valid items are
+    booked and the others get their error.
+
+    Validation is set-based, with the same rules as book_timeslot: one
+    query for the slots, one for the coaches, one for the clients, the
+    rules of coaches whose rule slots are asked for, two for the hours of
+    the days whose rows are made longer (rules.hours_by_day), and one for
+    the sessions already booked near the batch, checked in memory against each
+    item and the items before it. Writing is one UPDATE claiming the
+    slots, one INSERT for new rule slots, a re-check of the sessions near
+    the batch now that the claim holds the write lock, and one INSERT for
+    the sessions: the query count does not grow with the batch. If the
+    claim finds a slot taken meanwhile, the batch falls back to booking
+    item by item.
+    """
+    items = list(items)
+    errors = [None] * len(items)
+    slots, resized = _batch_slots(items, errors)
+    clients = CustomUser.objects.in_bulk({item['client_id'] for item in items})
+    for n, item in enumerate(items):
+        if errors[n] is None and item['client_id'] not in clients:
+            errors[n] = "Unknown client."
+    _check_batch_conflicts(slots, errors, _booked_near(slots.values()))
+    if atomic and any(errors):
+        return [BatchResult(None, error or ROLLED_BACK) for error in errors]
+
+    todo = [n for n, error in enumerate(errors) if error is None]
+    unsaved = {n for n in todo if slots[n].pk is None}
+    try:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    sessions = _insert_batch(todo, items, slots, resized, clients)
+            except _Contended:
+                sessions = _book_one_by_one(todo, unsaved, items, slots, clients, errors)
+                if atomic and any(errors):
+                    raise
+    except _Contended:
+        return [BatchResult(None, error or ROLLED_BACK) for error in errors]
+    return [BatchResult(sessions.get(n), errors[n]) for n in range(len(items))]
+
+
+def _batch_slots(items, errors):
+    """
+    ({item index: TimeSlot}, indexes of rows resized) for the valid items;
+    the others get their error. Rule slots are unsaved, rows are the ones
+    still available, and no longer than the coach's hours allow.
+    """
+    wanted = {}
+    for n, item in enumerate(items):
+        if item.get('timeslot_id') is None:
+            local = timezone.localtime(item['start'], timezone.get_default_timezone())
+            wanted[n] = (item['coach_id'], local.date(), local.time())
+    lookup = Q(pk__in={item['timeslot_id'] for item in items if item.get('timeslot_id') is not None})
+    if wanted:
+        lookup |= Q(
+            coach_id__in={coach_id for coach_id, _, _ in wanted.values()},
+            date__in={day for _, day, _ in wanted.values()},
+            start_time__in={start for _, _, start in wanted.values()},
+        )
+    rows = list(TimeSlot.objects.filter(lookup))
+    by_pk = {row.pk: row for row in rows}
+    by_time = {(row.coach_id, row.date, row.start_time): row for row in rows}
+    coaches = CustomUser.objects.filter(is_coach=True).in_bulk(
+        {row.coach_id for row in rows} | {coach_id for coach_id, _, _ in wanted.values()}
+    )
+
+    slots, resized, longer, used, virtual = {}, set(), set(), set(), {}
+    for n, item in enumerate(items):
+        if n in wanted:
+            slot = by_time.get(wanted[n])
+            if slot is None:
+                if wanted[n][0] not in coaches:
+                    errors[n] = "Unknown coach."
+                else:
+                    virtual.setdefault(wanted[n][0], []).append(n)
+                continue
+        else:
+            slot = by_pk.get(item['timeslot_id'])
+            if slot is None:
+                errors[n] = "Unknown time slot."
+                continue
+        if not slot.is_available or slot.pk in used:
+            errors[n] = TAKEN
+            continue
+        used.add(slot.pk)
+        slot.coach = coaches[slot.coach_id]
+        if item.get('duration') is not None and item['duration'] != slot.duration:
+            if item['duration'] > slot.duration:
+                longer.add(n)
+            slot.duration = item['duration']
+            slot.fill_bounds()
+            resized.add(n)
+        slots[n] = slot
+
+    hours = hours_by_day((slots[n].coach_id, slots[n].date) for n in longer)
+    for n in longer:
+        slot = slots[n]
+        if not within(hours[slot.coach_id, slot.date], slot.date, slot.start_time, slot.duration):
+            errors[n] = OUT_OF_HOURS
+            del slots[n]
+            resized.discard(n)
+
+    for coach_id, indexes in virtual.items():
+        offered = virtual_slots(coaches[coach_id], [(*wanted[n][1:], items[n].get('duration')) for n in indexes])
+        for n, slot in zip(indexes, offered):
+            if slot is None:
+                errors[n] = "This time is not offered by the coach."
+            else:
+                slots[n] = slot
+    return slots, resized
+
+
+def _booked_near(slots):
+    """
+    {coach_id: [(start_at, end_at, pk)] in start order} of the sessions
+    conflicts() could find for any of `slots`, in one query: per coach,
+    the range from their batch's first start to its last end.
+    """
+    spans = {}
+    for slot in slots:
+        low, high, _ = spans.get(slot.coach_id, (slot.start_at, slot.end_at, None))
+        spans[slot.coach_id] = (min(low, slot.start_at), max(high, slot.end_at), slot.coach.buffer)
+    booked = {coach_id: [] for coach_id in spans}
+    if not spans:
+        return booked
+    rows = TimeSlot.objects.filter(
+        reduce(or_, (
+            Q(coach_id=coach_id, start_at__gt=low - buffer - LONGEST_SESSION, start_at__lt=high + buffer)
+            for coach_id, (low, high, buffer) in spans.items()
+        )),
+        session__isnull=False,
+    ).order_by('start_at').values_list('coach_id', 'start_at', 'end_at', 'pk')
+    for coach_id, *interval in rows:
+        booked[coach_id].append(tuple(interval))
+    return booked
+
+
+def _clash(booked, slot, exclude=None):
+    """The first of `booked` (start order) closer to `slot` than its coach's buffer, as conflicts() does."""
+    before, after = slot.start_at - slot.coach.buffer, slot.end_at + slot.coach.buffer
+    for other in booked[bisect_right(booked, before - LONGEST_SESSION, key=lambda b: b[0]):]:
+        if other[0] >= after:
+            break
+        if other[1] > before and other[2] != exclude:
+            return other
+    return None
+
+
+def _check_batch_conflicts(slots, errors, booked):
+    """Errors for the items of `slots` too close to a booked session or to an earlier item."""
+    accepted = {coach_id: [] for coach_id in booked}
+    for n, slot in sorted(slots.items()):
+        if errors[n] is not None:
+            continue
+        other = _clash(booked[slot.coach_id], slot, exclude=slot.pk)
+        if other is None:
+            other = _clash(accepted[slot.coach_id], slot)
+        if other is None:
+            taken = accepted[slot.coach_id]
+            taken.insert(bisect_right(taken, slot.start_at, key=lambda b: b[0]), (slot.start_at, slot.end_at, n))
+        elif other[0] < slot.end_at and other[1] > slot.start_at:
+            errors[n] = "That time overlaps another session."
+        else:
+            errors[n] = f"There must be at least {slot.coach.buffer_minutes} minutes between sessions."
+
+
+def _insert_batch(todo, items, slots, resized, clients):
+    """Claims the slots of items `todo` and creates their sessions in bulk; raises _Contended if it can't."""
+    rows = [n for n in todo if slots[n].pk is not None]
+    new = [slots[n] for n in todo if slots[n].pk is None]
+    if rows:
+        claimed = TimeSlot.objects.filter(
+            pk__in=[slots[n].pk for n in rows], is_available=True
+        ).update(is_available=False)
+        if claimed != len(rows):
+            raise _Contended
+        changed = [slots[n] for n in rows if n in resized]
+        if changed:
+            TimeSlot.objects.bulk_update(changed, ['duration', 'end_at'])
+    for slot in new:
+        slot.is_available = False
+    try:
+        TimeSlot.objects.bulk_create(new)
+    except IntegrityError:
+        raise _Contended
+
+    # from the first write on SQLite holds the write lock: what is booked
+    # now stays as it is until we commit
+    booked = _booked_near(slots[n] for n in todo)
+    if any(_clash(booked[slots[n].coach_id], slots[n], exclude=slots[n].pk) for n in todo):
+        raise _Contended
+    try:
+        created = Session.objects.bulk_create(
+            Session(
+                client=clients[items[n]['client_id']],
+                coach_id=slots[n].coach_id,
+                timeslot=slots[n],
+                subject=items[n]['subject'],
+            )
+            for n in todo
+        )
+    except IntegrityError:
+        raise _Contended
+    for n in todo:
+        slots[n].is_available = False
+    tasks.enqueue(notifications.sessions_booked, session_ids=[session.pk for session in created])
+
+    # bulk writes send no signals: drop the cached days here
+    days = {}
+    for n in todo:
+        days.setdefault(slots[n].coach_id, set()).add(slots[n].date)
+    for coach_id, dates in days.items():
+        invalidate_days(coach_id, dates)
+    return dict(zip(todo, created))
+
+
+def _book_one_by_one(todo, unsaved, items, slots, clients, errors):
+    """
+    book_timeslot() for each of items `todo`, after _insert_batch() was
+    rolled back; `unsaved` are those whose slot had no row before.
+    """
+    sessions = {}
+    for n in todo:
+        slot = slots[n]
+        slot.is_available = True
+        if n in unsaved:
+            # the rolled back INSERT had given it one
+            slot.pk = None
+            slot._state.adding = True
+        try:
+            sessions[n] = book_timeslot(
+                client=clients[items[n]['client_id']], timeslot=slot, subject=items[n]['subject']
+            )
+        except SlotUnavailable as exc:
+            errors[n] = str(exc)
+    return sessions
@@ -0,0 +1,191 @@
+"""
+Calendar feeds and delta syncs of a user's sessions, as coach or client.
+
+Both are built on Session.updated_at and the CancelledSession rows left by
+deletes, each indexed per coach and per client, so "has anything changed
+since?" is one query reading the ends of four indexes (feed_state) and a
+delta reads only the sessions that did change.
+
+A sync token is the time a delta was read, less SYNC_OVERLAP: a session
+written by a transaction still open at that moment commits with an earlier
+updated_at, which the next delta still covers. Clients get such sessions
+twice and apply them by id.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from .models import CancelledSession, CustomUser, Session
+
+FEED_SALT = "coach_app.feeds"
+FEED_PAST = timedelta(days=90)  # how far back a feed lists sessions
+FEED_CANCELLED = timedelta(days=30)  # and cancellations
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def feed_token(user):
+    """The secret in `user`'s feed URL: calendar apps can't log in."""
+    return signing.Signer(salt=FEED_SALT).sign(str(user.pk))
+
+
+def feed_user_id(token):
+    try:
+        return int(signing.Signer(salt=FEED_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        raise InvalidToken(token)
+
+
+def sync_token(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def parse_sync_token(token):
+    if not token.isdigit():
+        raise InvalidToken(token)
+    return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+
+
+def user_sessions(user_id):
+    return Session.objects.filter(Q(coach_id=user_id) | Q(client_id=user_id))
+
+
+def user_cancellations(user_id):
+    return CancelledSession.objects.filter(Q(coach_id=user_id) | Q(client_id=user_id))
+
+
+def _latest(model, user_column, column, user_id):
+    return Subquery(
+        model.objects.filter(**{user_column: user_id}).order_by(f"-{column}").values(column)[:1]
+    )
+
+
+def feed_state(user_id, *extra):
+    """
+    An ETag for everything `user_id`'s feed or delta depends on: the
+    latest updated_at and cancelled_at of their sessions as coach and as
+    client, read in one query from the end of four (user, time) indexes,
+    and `extra`.
+    """
+    latest = CustomUser.objects.filter(pk=user_id).values_list(
+        _latest(Session, "coach_id", "updated_at", user_id),
+        _latest(Session, "client_id", "updated_at", user_id),
+        _latest(CancelledSession, "coach_id", "cancelled_at", user_id),
+        _latest(CancelledSession, "client_id", "cancelled_at", user_id),
+    ).first()
+    state = "|".join(str(part) for part in (user_id, latest, *extra))
+    return f'"{hashlib.md5(state.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def changes_since(user_id, since=None):
+    """
+    (changed, cancelled, next_token) for `user_id`: the sessions written
+    since `since` (every session without it) as a queryset, the ids of
+    those cancelled since, and the token to pass next time.
+    """
+    read_at = timezone.now()
+    changed = user_sessions(user_id)
+    cancelled = user_cancellations(user_id)
+    if since is not None:
+        changed = changed.filter(updated_at__gte=since)
+        cancelled = cancelled.filter(cancelled_at__gte=since)
+    else:
+        cancelled = cancelled.none()
+    return changed, cancelled, sync_token(read_at - SYNC_OVERLAP)
+
+
+# ─────────────────────────────────────────────
+# iCalendar (RFC 5545)
+# ─────────────────────────────────────────────
+def _escape(text):
+    return (
+        text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _stamp(moment):
+    return moment.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fold(line):
+    """Splits `line` into 75-octet lines, continuations starting with a space."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:  # not inside a UTF-8 sequence
+            end -= 1
+        parts.append(data[start:end].decode())
+        start, limit = end, 74
+    return "\r\n ".join(parts)
+
+
+def _event(uid, start_at, end_at, stamp, status, summary=None, sequence=0):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{_stamp(stamp)}",
+        f"LAST-MODIFIED:{_stamp(stamp)}",
+        f"SEQUENCE:{sequence}",
+        f"STATUS:{status}",
+    ]
+    if start_at is not None:
+        lines += [f"DTSTART:{_stamp(start_at)}", f"DTEND:{_stamp(end_at)}"]
+    if summary is not None:
+        lines.append(f"SUMMARY:{_escape(summary)}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def session_uid(session_id):
+    return f"session-{session_id}@coach-booking"
+
+
+def render_feed(user, now=None):
+    """`user`'s sessions since FEED_PAST and cancellations since FEED_CANCELLED, as an iCalendar."""
+    now = now or timezone.now()
+    sessions = (
+        user_sessions(user.pk)
+        .filter(timeslot__start_at__gte=now - FEED_PAST)
+        .select_related("timeslot", "coach", "client")
+        .only(
+            "subject", "updated_at", "coach_id", "client_id",
+            "timeslot__start_at", "timeslot__end_at", "coach__username", "client__username",
+        )
+        .order_by("timeslot__start_at")
+    )
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Coach booking//Sessions//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(f'Sessions of {user.username}')}",
+    ]
+    for session in sessions:
+        other = session.client if session.coach_id == user.pk else session.coach
+        lines += _event(
+            session_uid(session.pk),
+            session.timeslot.start_at,
+            session.timeslot.end_at,
+            session.updated_at,
+            "CONFIRMED",
+            f"{session.subject} with {other.username}",
+            sequence=int(session.updated_at.timestamp()),
+        )
+    for gone in user_cancellations(user.pk).filter(cancelled_at__gte=now - FEED_CANCELLED):
+        lines += _event(
+            session_uid(gone.session_id), gone.start_at, gone.end_at, gone.cancelled_at, "CANCELLED",
+            sequence=int(gone.cancelled_at.timestamp()),
+        )
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
@@ -1,9 +1,10 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from datetime import datetime, timedelta, time as time_obj
 from django.forms.widgets import DateTimeInput
 
-from .models import Session, TimeSlot, CustomUser
+from .booking import OUT_OF_HOURS, book_timeslot, conflicts
+from .models import MAX_SESSION_MINUTES, Session, TimeSlot, CustomUser
+from .rules import coach_hours, virtual_slot, within
 
 
 # ─────────────────────────────────────────────
@@ -20,9 +21,23 @@ class CustomUserCreationForm(UserCreationForm):
 # ─────────────────────────────────────────────
 class SessionForm(forms.Form):
     """
-    Users type / pick a free‑text datetime (Flatpickr); we validate it
-    and map it to a TimeSlot instance. No changes to models.py needed.
+    Users pick a coach and type / pick a free‑text datetime (Flatpickr),
+    optionally a length; we validate it and map it to a TimeSlot in that
+    coach's calendar.
     """
+    coach = forms.ModelChoiceField(
+        label="Coach",
+        queryset=CustomUser.objects.filter(is_coach=True).order_by("username"),
+        widget=forms.Select(attrs={"class": "form-input"}),
+    )
+    # minutes; left empty, the session is as long as the slot
+    duration = forms.IntegerField(
+        label="Length (minutes)",
+        required=False,
+        min_value=5,
+        max_value=MAX_SESSION_MINUTES,
+        widget=forms.NumberInput(attrs={"class": "form-input", "step": 5, "placeholder": "30"}),
+    )
     timeslot = forms.DateTimeField(
         label="Date & time",
         widget=DateTimeInput(
@@ -42,39 +57,52 @@ class SessionForm(forms.Form):
     # ── validation ───────────────────────────
     def clean_timeslot(self):
         picked_dt = self.cleaned_data["timeslot"]
-
-        # 1) must be within working hours
-        start_ok, end_ok = time_obj(9, 0), time_obj(18, 0)
-        if picked_dt.time() < start_ok or picked_dt.time() >= end_ok:
-            raise forms.ValidationError(
-                "Appointments must be between 09:00 and 18:00."
-            )
-
-        # 2) must match an existing TimeSlot row
-        try:
-            slot = TimeSlot.objects.get(
-                date=picked_dt.date(), start_time=picked_dt.time()
-            )
-        except TimeSlot.DoesNotExist:
+        coach = self.cleaned_data.get("coach")
+        if coach is None or "duration" in self.errors:
+            # those fields have their own errors; there's nothing to look up
+            return picked_dt
+        duration = self.cleaned_data.get("duration")
+
+        # 1) must match a TimeSlot row in the coach's calendar, or a slot
+        #    their rules offer (its row is written when it's booked); a
+        #    virtual slot made longer is checked against the rules' hours
+        #    by virtual_slot()
+        slot = TimeSlot.objects.filter(
+            coach=coach, date=picked_dt.date(), start_time=picked_dt.time()
+        ).first()
+        stretched = False
+        if slot is None:
+            slot = virtual_slot(coach, picked_dt.date(), picked_dt.time(), duration)
+        elif duration is not None:
+            stretched = duration > slot.duration
+            slot.duration = duration
+            slot.fill_bounds()
+        if slot is None:
             raise forms.ValidationError("This time is not offered by the coach.")
+        slot.coach = coach
 
-        # 3) must still be free
+        # 2) must still be free
         if not slot.is_available:
             raise forms.ValidationError("That slot was just booked. Please pick another.")
 
-        # 4) 10‑minute buffer around other sessions
-        buffer_before = picked_dt - timedelta(minutes=10)
-        buffer_after = picked_dt + timedelta(minutes=10)
-        overlapping = (
-            Session.objects.filter(timeslot__date=picked_dt.date())
-            .exclude(timeslot__start_time=picked_dt.time())
+        # 3) clear of the coach's other sessions by their buffer: one range
+        #    scan on (coach, start_at), see booking.conflicts()
+        nearest = (
+            conflicts(coach, slot.start_at, slot.end_at, exclude=slot.pk)
+            .values_list("start_at", "end_at")
+            .first()
         )
-        for sess in overlapping:
-            sess_dt = datetime.combine(sess.timeslot.date, sess.timeslot.start_time)
-            if buffer_before <= sess_dt <= buffer_after:
-                raise forms.ValidationError(
-                    "There must be at least 10 minutes between sessions."
-                )
+        if nearest is not None:
+            if nearest[0] < slot.end_at and nearest[1] > slot.start_at:
+                raise forms.ValidationError("That time overlaps another session.")
+            raise forms.ValidationError(
+                f"There must be at least {coach.buffer_minutes} minutes between sessions."
+            )
+
+        # 4) a row booked for longer than it lasts must still end within the
+        #    coach's hours that day (rules.coach_hours)
+        if stretched and not within(coach_hours(coach, slot.date), slot.date, slot.start_time, slot.duration):
+            raise forms.ValidationError(OUT_OF_HOURS)
 
         # stash for use in save()
         self._validated_slot = slot
@@ -83,24 +111,28 @@ class SessionForm(forms.Form):
     # ── creator ──────────────────────────────
     def save(self, *, client):
         """
-        Creates Session and flips TimeSlot.is_available → False.
-        Call only after is_valid().
+        Creates Session and flips TimeSlot.is_available → False in one
+        transaction. Call only after is_valid().
+
+        Raises booking.SlotUnavailable if another client claimed the slot
+        between validation and save.
         """
-        slot = self._validated_slot
-        session = Session.objects.create(
+        return book_timeslot(
             client=client,
-            timeslot=slot,
+            timeslot=self._validated_slot,
             subject=self.cleaned_data["subject"],
         )
-        slot.is_available = False
-        slot.save()
-        return session
 
 
 # ─────────────────────────────────────────────
 # Other helper forms (unchanged)
 # ─────────────────────────────────────────────
 class DateSelectionForm(forms.Form):
+    coach = forms.ModelChoiceField(
+        queryset=CustomUser.objects.filter(is_coach=True).order_by("username"),
+        widget=forms.Select(attrs={"class": "form-control"}),
+        label="Coach",
+    )
     date = forms.DateField(
         widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
         label="Choisir une date",
@@ -0,0 +1,272 @@
+"""
+Live slot availability, pushed to the booking page as Server-Sent Events.
+
+Every change to a coach's calendar already goes through invalidate_days or
+invalidate_rules; once its transaction commits, the change is published for
+that coach and those dates. Each process keeps its subscribers per (coach,
+date): on a change it rebuilds the day once (day_availability) and puts
+the same encoded event in every subscriber's mailbox, so fanning out to a
+thousand open pages costs a thousand puts, not a thousand queries. Each
+event is the whole day, so a mailbox only keeps the latest: a subscriber
+that stops reading holds one event however many changes it misses.
+
+The local broker only hears changes made in its own process. When several
+processes serve or write (WSGI workers, the waitlist worker), use the Redis
+backend: changes are published on Redis, and every process relays them to
+its own subscribers.
+
+    LIVE_UPDATES = {
+        "BACKEND": "local",  # or "redis" (needs redis-py)
+        "REDIS_URL": None,   # for the redis backend
+        "KEEPALIVE": 15,     # seconds between comments on an idle stream
+    }
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"BACKEND": "local", "REDIS_URL": None, "KEEPALIVE": 15}
+REDIS_CHANNEL = "coach_app.live"
+KEEPALIVE = ": keepalive\n\n"
+
+
+def sse(data, event=None):
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def day_payload(coach_id, day):
+    from .availability import day_availability
+
+    entry = day_availability(coach_id, day)
+    return {
+        "coach": coach_id,
+        "date": day.isoformat(),
+        "etag": entry.etag,
+        "slots": [
+            {"time": f"{slot.start_time:%H:%M}", "available": slot.is_available}
+            for slot in entry.slots
+        ],
+    }
+
+
+def _detached(loop, coroutine):
+    """
+    A task outside the caller's context, so its sync_to_async calls aren't
+    sent to the thread of whichever request or sync call happened to start it.
+    """
+    return contextvars.Context().run(loop.create_task, coroutine)
+
+
+class Mailbox:
+    """
+    The event a subscriber has yet to read, a newer one replacing it. A
+    few hundred bytes per open page, where an asyncio.Queue has four deques.
+    """
+
+    __slots__ = ("event", "_waiter")
+
+    def __init__(self):
+        self.event = None
+        self._waiter = None
+
+    def put(self, event):
+        self.event = event
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def empty(self):
+        return self.event is None
+
+    async def get(self):
+        while self.event is None:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        event, self.event = self.event, None
+        return event
+
+
+class LocalBroker:
+    def __init__(self, keepalive=15):
+        self.keepalive = keepalive
+        self._subscribers = {}  # coach id: {date: set of mailboxes}
+        self._refreshing = {}  # (coach id, date): changed again meanwhile
+        self._loop = None
+        self._ticker = None
+
+    def subscribe(self, coach_id, day):
+        """A Mailbox receiving the events of coach `coach_id`'s `day`. From the event loop only."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # subscribers of a loop that is gone are gone with it
+            self._loop, self._subscribers, self._refreshing = loop, {}, {}
+            self._ticker = None
+        mailbox = Mailbox()
+        self._subscribers.setdefault(coach_id, {}).setdefault(day, set()).add(mailbox)
+        if self._ticker is None or self._ticker.done():
+            self._ticker = _detached(loop, self._keep_alive())
+        return mailbox
+
+    def unsubscribe(self, coach_id, day, mailbox):
+        days = self._subscribers.get(coach_id, {})
+        mailboxes = days.get(day, set())
+        mailboxes.discard(mailbox)
+        if not mailboxes:
+            days.pop(day, None)
+            if not days:
+                self._subscribers.pop(coach_id, None)
+
+    def subscriber_count(self):
+        return sum(len(mailboxes) for days in self._subscribers.values() for mailboxes in days.values())
+
+    async def _keep_alive(self):
+        """
+        Every `keepalive` seconds, a comment to each idle subscriber: one
+        timer for all of them rather than one per stream.
+        """
+        while self._subscribers:
+            await asyncio.sleep(self.keepalive)
+            for days in self._subscribers.values():
+                for mailboxes in days.values():
+                    for mailbox in mailboxes:
+                        if mailbox.empty():
+                            mailbox.put(KEEPALIVE)
+
+    def publish(self, coach_id, days=None):
+        """Coach `coach_id`'s `days` (every day if None) changed. From any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._changed, coach_id, days)
+
+    def _changed(self, coach_id, days):
+        subscribed = self._subscribers.get(coach_id, {})
+        if days is None:
+            days = list(subscribed)
+        for day in (day for day in days if day in subscribed):
+            channel = (coach_id, day)
+            if channel in self._refreshing:
+                self._refreshing[channel] = True  # rebuilt again once the running one is sent
+                continue
+            self._refreshing[channel] = False
+            _detached(self._loop, self._refresh(channel))
+
+    async def _refresh(self, channel):
+        try:
+            while True:
+                event = sse(await sync_to_async(day_payload)(*channel), "slots")
+                for mailbox in self._subscribers.get(channel[0], {}).get(channel[1], ()):
+                    mailbox.put(event)
+                if not self._refreshing.get(channel):
+                    break
+                self._refreshing[channel] = False
+        except Exception:
+            logger.exception("Could not send the availability of coach %s on %s", *channel)
+        finally:
+            self._refreshing.pop(channel, None)
+
+
+class RedisBroker(LocalBroker):
+    """Publishes changes on Redis; each process relays them to its own subscribers."""
+
+    def __init__(self, url, keepalive=15):
+        super().__init__(keepalive)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("The redis backend of LIVE_UPDATES needs redis-py: pip install redis")
+        self.url = url
+        self._redis = redis.Redis.from_url(url)
+        self._relay = None
+
+    def publish(self, coach_id, days=None):
+        change = {"coach": coach_id, "days": None if days is None else [day.isoformat() for day in days]}
+        try:
+            self._redis.publish(REDIS_CHANNEL, json.dumps(change))
+        except Exception:
+            # the booking is committed; its pages catch up on the next change
+            logger.exception("Could not publish the change of coach %s", coach_id)
+
+    def subscribe(self, coach_id, day):
+        mailbox = super().subscribe(coach_id, day)
+        if self._relay is None or self._relay.done():
+            self._relay = _detached(self._loop, self._listen())
+        return mailbox
+
+    async def _listen(self):
+        import redis.asyncio
+
+        while True:
+            try:
+                async with redis.asyncio.Redis.from_url(self.url).pubsub() as pubsub:
+                    await pubsub.subscribe(REDIS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        change = json.loads(message["data"])
+                        days = change["days"] and [date.fromisoformat(day) for day in change["days"]]
+                        self._changed(change["coach"], days)
+            except redis.RedisError:
+                logger.exception("Lost the live updates channel, reconnecting")
+                await asyncio.sleep(1)
+
+
+async def stream(coach_id, day):
+    """
+    The events of coach `coach_id`'s `day`: the current slots, then the
+    slots again after every change, with a comment every KEEPALIVE seconds
+    of silence so proxies keep the connection open.
+    """
+    broker = get_broker()
+    mailbox = broker.subscribe(coach_id, day)
+    try:
+        yield sse(await sync_to_async(day_payload)(coach_id, day), "slots")
+        while True:
+            yield await mailbox.get()
+    finally:
+        broker.unsubscribe(coach_id, day, mailbox)
+
+
+def publish(coach_id, days=None):
+    get_broker().publish(coach_id, days)
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, "LIVE_UPDATES", {})}
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        options = _options()
+        if options["BACKEND"] == "redis":
+            _broker = RedisBroker(options["REDIS_URL"], keepalive=options["KEEPALIVE"])
+        elif options["BACKEND"] == "local":
+            _broker = LocalBroker(keepalive=options["KEEPALIVE"])
+        else:
+            raise ImproperlyConfigured(f"Unknown LIVE_UPDATES backend {options['BACKEND']!r}")
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(*, setting, **kwargs):
+    global _broker
+    if setting == "LIVE_UPDATES":
+        _broker = None
@@ -0,0 +1,75 @@
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from coach_app.models import MAX_SESSION_MINUTES, CustomUser
+from coach_app.slots import ALL_WEEKDAYS, date_range, generate_slots
+
+WEEKDAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD.")
+
+
+def parse_weekdays(value):
+    try:
+        return frozenset(WEEKDAY_NAMES.index(name.strip().lower()[:3]) for name in value.split(','))
+    except ValueError:
+        raise CommandError(f"Invalid weekdays {value!r}, expected e.g. mon,tue,wed.")
+
+
+def parse_hours(value):
+    """'09:00-12:00,13:00-18:00' -> [(time(9), time(12)), (time(13), time(18))]"""
+    hours = []
+    try:
+        for block in value.split(','):
+            start, end = (datetime.strptime(part.strip(), '%H:%M').time() for part in block.split('-'))
+            hours.append((start, end))
+    except ValueError:
+        raise CommandError(f"Invalid hours {value!r}, expected e.g. 09:00-12:00,13:00-18:00.")
+    return hours
+
+
+class Command(BaseCommand):
+    help = "Bulk-creates bookable TimeSlots in a coach's calendar for a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--coach', required=True,
+                            help="Username of the coach whose calendar is filled.")
+        parser.add_argument('--from', dest='start', required=True, type=parse_date,
+                            help="First date (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='end', required=True, type=parse_date,
+                            help="Last date, inclusive (YYYY-MM-DD).")
+        parser.add_argument('--weekdays', type=parse_weekdays, default=ALL_WEEKDAYS,
+                            help="Comma-separated days to fill, e.g. mon,tue,wed,thu,fri. Default: every day.")
+        parser.add_argument('--slot-minutes', type=int, default=30,
+                            help="Length of each slot in minutes; slots follow each other back to back. Default: 30.")
+        parser.add_argument('--hours', type=parse_hours, default='09:00-18:00',
+                            help="Working-hours template, e.g. 09:00-12:00,13:00-18:00.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows per INSERT. Default: 1000.")
+
+    def handle(self, *args, coach, start, end, weekdays, slot_minutes, hours, batch_size, **options):
+        try:
+            coach = CustomUser.objects.get(username=coach, is_coach=True)
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No coach with username {coach!r}.")
+        if end < start:
+            raise CommandError("--to must not be before --from.")
+        if not 5 <= slot_minutes <= MAX_SESSION_MINUTES:
+            raise CommandError(f"--slot-minutes must be between 5 and {MAX_SESSION_MINUTES}.")
+
+        result = generate_slots(
+            date_range(start, end, weekdays),
+            coach=coach,
+            slot_minutes=slot_minutes,
+            hours=hours,
+            batch_size=batch_size,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {result.created} slots in {result.elapsed:.2f}s ({result.rate:.0f} rows/s)."
+        ))
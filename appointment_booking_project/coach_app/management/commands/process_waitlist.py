@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from coach_app.waitlist import process_openings
+
+
+class Command(BaseCommand):
+    help = "Books slots freed by cancellations for waitlisted clients, until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Process the openings queued now, then exit.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty. Default: 1.")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Openings per pass. Default: 100.")
+
+    def handle(self, *args, once, interval, batch_size, **options):
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+        total = booked = 0
+        try:
+            while True:
+                processed, newly_booked = process_openings(batch_size)
+                total += processed
+                booked += newly_booked
+                if processed and options['verbosity'] > 1:
+                    self.stdout.write(f"{processed} openings, {newly_booked} booked.")
+                if once and processed < batch_size:
+                    break
+                if not processed:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {total} openings, booked {booked} sessions from the waitlist."
+        ))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from coach_app.tasks import run_due
+
+
+class Command(BaseCommand):
+    help = "Runs queued background tasks (emails, reminders) as they fall due, until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Run the tasks due now, then exit.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to wait when no task is due. Default: 1.")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Tasks per pass. Default: TASKS['BATCH_SIZE'].")
+
+    def handle(self, *args, once, interval, batch_size, **options):
+        if batch_size is not None and batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+        total = failed = 0
+        try:
+            while True:
+                run, newly_failed = run_due(batch_size)
+                total += run
+                failed += newly_failed
+                if run and options['verbosity'] > 1:
+                    self.stdout.write(f"{run} tasks, {newly_failed} failed.")
+                if once and not run:
+                    break
+                if not run:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} tasks, {failed} failed."))
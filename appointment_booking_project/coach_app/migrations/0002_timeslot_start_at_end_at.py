@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coach_app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="timeslot",
+            name="start_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="timeslot",
+            name="end_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
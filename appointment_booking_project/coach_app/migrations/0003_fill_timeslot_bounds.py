@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def fill_bounds(apps, schema_editor):
+    TimeSlot = apps.get_model("coach_app", "TimeSlot")
+    tz = timezone.get_default_timezone()
+    slots = list(TimeSlot.objects.filter(start_at__isnull=True))
+    for slot in slots:
+        slot.start_at = timezone.make_aware(datetime.combine(slot.date, slot.start_time), tz)
+        slot.end_at = slot.start_at + timedelta(minutes=30)
+    TimeSlot.objects.bulk_update(slots, ["start_at", "end_at"], batch_size=500)
+
+
+# On its own, between the nullable columns and NOT NULL, as 0006_assign_coach:
+# Django advises against mixing RunPython and schema changes in one
+# PostgreSQL transaction ("cannot ALTER TABLE ... pending trigger events").
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coach_app", "0002_timeslot_start_at_end_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_bounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coach_app", "0003_fill_timeslot_bounds"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="timeslot",
+            name="start_at",
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name="timeslot",
+            name="end_at",
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(fields=["start_at"], name="timeslot_start_at_idx"),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coach_app", "0004_timeslot_bounds_required"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="timeslot",
+            name="coach",
+            field=models.ForeignKey(
+                limit_choices_to={"is_coach": True},
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="timeslots",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="session",
+            name="coach",
+            field=models.ForeignKey(
+                editable=False,
+                limit_choices_to={"is_coach": True},
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="coaching_sessions",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def assign_coach(apps, schema_editor):
+    """Existing calendars were the one coach's: give them to the first coach account."""
+    CustomUser = apps.get_model("coach_app", "CustomUser")
+    TimeSlot = apps.get_model("coach_app", "TimeSlot")
+    Session = apps.get_model("coach_app", "Session")
+    if not TimeSlot.objects.exists():
+        return
+    coach = CustomUser.objects.filter(is_coach=True).order_by("id").first()
+    if coach is None:
+        coach = CustomUser.objects.create(username="coach", is_coach=True, password="!")
+    TimeSlot.objects.filter(coach__isnull=True).update(coach=coach)
+    Session.objects.filter(coach__isnull=True).update(
+        coach=Subquery(TimeSlot.objects.filter(pk=OuterRef("timeslot")).values("coach")[:1])
+    )
+
+
+# On its own, between the nullable columns and NOT NULL: PostgreSQL won't
+# alter a table with the updates' deferred foreign key checks still pending
+# in the same transaction.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coach_app", "0005_coach"),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_coach, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coach_app", "0006_assign_coach"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="timeslot",
+            name="coach",
+            field=models.ForeignKey(
+                limit_choices_to={"is_coach": True},
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="timeslots",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="session",
+            name="coach",
+            field=models.ForeignKey(
+                editable=False,
+                limit_choices_to={"is_coach": True},
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="coaching_sessions",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="timeslot",
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name="timeslot",
+            name="timeslot_start_at_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="timeslot",
+            constraint=models.UniqueConstraint(
+                fields=("coach", "date", "start_time"), name="timeslot_coach_date_start_uniq"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(fields=["coach", "start_at"], name="timeslot_coach_start_at_idx"),
+        ),
+    ]
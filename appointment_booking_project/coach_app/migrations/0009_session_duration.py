@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+import django.core.validators
+from django.db import migrations, models
+
+# PostgreSQL only: no two taken slots of a coach may overlap, enforced by
+# the database even between concurrent bookings (see booking.book_timeslot)
+EXCLUSION = """
+    CREATE EXTENSION IF NOT EXISTS btree_gist;
+    ALTER TABLE coach_app_timeslot ADD CONSTRAINT timeslot_taken_no_overlap
+        EXCLUDE USING gist (coach_id WITH =, tstzrange(start_at, end_at) WITH &&)
+        WHERE (NOT is_available);
+"""
+DROP_EXCLUSION = "ALTER TABLE coach_app_timeslot DROP CONSTRAINT IF EXISTS timeslot_taken_no_overlap;"
+
+
+def add_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(EXCLUSION)
+
+
+def drop_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_EXCLUSION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coach_app', '0008_availability_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='buffer_minutes',
+            field=models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(240)]),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='duration',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(240)]),
+        ),
+        migrations.AlterField(
+            model_name='availabilityrule',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(240)]),
+        ),
+        migrations.RunPython(add_exclusion, drop_exclusion),
+    ]
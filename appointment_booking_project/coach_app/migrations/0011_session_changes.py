@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coach_app', '0010_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CancelledSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.BigIntegerField()),
+                ('coach_id', models.BigIntegerField()),
+                ('client_id', models.BigIntegerField()),
+                ('start_at', models.DateTimeField(null=True)),
+                ('end_at', models.DateTimeField(null=True)),
+                ('cancelled_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['cancelled_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['coach', 'updated_at'], name='session_coach_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['client', 'updated_at'], name='session_client_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cancelledsession',
+            index=models.Index(fields=['coach_id', 'cancelled_at'], name='cancelled_coach_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cancelledsession',
+            index=models.Index(fields=['client_id', 'cancelled_at'], name='cancelled_client_idx'),
+        ),
+    ]
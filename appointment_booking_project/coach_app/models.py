@@ -1,56 +1,408 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 from datetime import datetime, timedelta
 
+SLOT_MINUTES = 30  # length of a slot unless it says otherwise
+# the longest session: conflict checks scan start_at back this far, which
+# keeps them a bounded range scan on the (coach, start_at) index
+MAX_SESSION_MINUTES = 240
+DURATION_VALIDATORS = [MinValueValidator(5), MaxValueValidator(MAX_SESSION_MINUTES)]
+
 
 class CustomUser(AbstractUser):
     """
     Custom user model extending Django's default User.
     """
     is_coach = models.BooleanField(default=False)  # Distinguishes coaches from clients
+    # free time a coach keeps between two of their sessions
+    buffer_minutes = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(MAX_SESSION_MINUTES)]
+    )
+
+    @property
+    def buffer(self):
+        return timedelta(minutes=self.buffer_minutes)
 
     def __str__(self):
         return self.username
 
 
+def slot_bounds(day, start_time, minutes=SLOT_MINUTES):
+    """(start_at, end_at) of a `minutes` long slot starting at `start_time` on `day`, as aware datetimes."""
+    start_at = timezone.make_aware(
+        datetime.combine(day, start_time), timezone.get_default_timezone()
+    )
+    return start_at, start_at + timedelta(minutes=minutes)
+
+
+class TimeSlotQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() skips save(), so fill the denormalized columns here
+        objs = list(objs)
+        for obj in objs:
+            obj.fill_bounds()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class TimeSlot(models.Model):
     """
-    Represents a predefined time slot that can be booked.
+    Represents a predefined time slot that can be booked, in one coach's
+    calendar.
     """
+    coach = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='timeslots',
+        limit_choices_to={'is_coach': True},
+    )
     date = models.DateField()
     start_time = models.TimeField()
-     
+    duration = models.PositiveSmallIntegerField(default=SLOT_MINUTES, validators=DURATION_VALIDATORS)
+
     is_available = models.BooleanField(default=True)
 
+    # date + start_time / end_time as aware datetimes, kept in sync by save()
+    # so overlap checks can run as indexed range queries
+    start_at = models.DateTimeField(editable=False)
+    end_at = models.DateTimeField(editable=False)
+
+    objects = TimeSlotQuerySet.as_manager()
+
     @property
     def end_time(self):
-        """Returns end time 30 minutes after start_time"""
+        """Returns end time `duration` minutes after start_time"""
         start_dt = datetime.combine(self.date, self.start_time)
-        end_dt = start_dt + timedelta(minutes=30)
+        end_dt = start_dt + timedelta(minutes=self.duration)
         return end_dt.time()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # where the slot is stored, for the signals to know the day it leaves
+        # if it moves (None for fields not loaded)
+        instance._stored = (instance.__dict__.get('coach_id'), instance.__dict__.get('date'))
+        return instance
+
+    def fill_bounds(self):
+        self.start_at, self.end_at = slot_bounds(self.date, self.start_time, self.duration)
+
+    def save(self, *args, **kwargs):
+        self.fill_bounds()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date', 'start_time', 'duration'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'start_at', 'end_at'}
+        super().save(*args, **kwargs)
     
     class Meta:
-        unique_together = ['date', 'start_time']
         ordering = ['date', 'start_time']
+        # every lookup is within one coach's calendar, so both indexes lead
+        # on coach: the unique one serves (coach, date[, start_time])
+        # lookups, the other the buffer range scans on start_at
+        constraints = [
+            models.UniqueConstraint(
+                fields=['coach', 'date', 'start_time'], name='timeslot_coach_date_start_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['coach', 'start_at'], name='timeslot_coach_start_at_idx'),
+        ]
 
     def __str__(self):
         status = "Available" if self.is_available else "Booked"
         return f"{self.date} at {self.start_time} ({status})"
 
 
+class AvailabilityRule(models.Model):
+    """
+    A coach's recurring working hours: every `weekday`, slots of
+    `slot_minutes` from `start_time` until `end_time`, optionally only
+    between `valid_from` and `valid_until`.
+
+    Rules are expanded into virtual slots when a range is queried (see
+    coach_app.rules); a TimeSlot row is only written when one is booked.
+    """
+    WEEKDAYS = [
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    ]
+
+    coach = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='availability_rules',
+        limit_choices_to={'is_coach': True},
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=SLOT_MINUTES, validators=DURATION_VALIDATORS)
+    valid_from = models.DateField(null=True, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['coach', 'weekday', 'start_time']
+        indexes = [
+            models.Index(fields=['coach', 'weekday'], name='rule_coach_weekday_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_time__gt=models.F('start_time')),
+                name='rule_ends_after_start',
+                violation_error_message="End time must be after start time.",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(slot_minutes__gt=0),
+                name='rule_slot_minutes_positive',
+                violation_error_message="Slots must last at least a minute.",
+            ),
+        ]
+
+    def applies_on(self, day):
+        return (
+            day.weekday() == self.weekday
+            and (self.valid_from is None or day >= self.valid_from)
+            and (self.valid_until is None or day <= self.valid_until)
+        )
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class AvailabilityException(models.Model):
+    """
+    A date taken out of a coach's rules: a holiday (no times) or part of a
+    day off (`start_time` until `end_time`). Only rule slots are affected,
+    TimeSlot rows stay as they are.
+    """
+    coach = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='availability_exceptions',
+        limit_choices_to={'is_coach': True},
+    )
+    date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    reason = models.CharField(max_length=120, blank=True)
+
+    class Meta:
+        ordering = ['coach', 'date', 'start_time']
+        indexes = [
+            models.Index(fields=['coach', 'date'], name='exception_coach_date_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(start_time__isnull=True, end_time__isnull=True)
+                    | models.Q(end_time__gt=models.F('start_time'))
+                ),
+                name='exception_whole_day_or_range',
+                violation_error_message="Give both times (end after start) or neither.",
+            ),
+        ]
+
+    def blocks(self, start_time, end_time):
+        """Whether this exception takes out a slot from `start_time` to `end_time` on its date."""
+        return self.start_time is None or (start_time < self.end_time and end_time > self.start_time)
+
+    def __str__(self):
+        if self.start_time is None:
+            return f"{self.date} (whole day)"
+        return f"{self.date} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class SessionQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() skips save(), so fill the denormalized coach here
+        objs = list(objs)
+        for obj in objs:
+            obj.fill_coach()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Session(models.Model):
     """
     Represents a coaching session.
     """
     client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='sessions')
     timeslot = models.OneToOneField(TimeSlot, on_delete=models.CASCADE, related_name='session')
+    # the timeslot's coach, copied so a coach's sessions are found without
+    # going through the slot table
+    coach = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='coaching_sessions',
+        limit_choices_to={'is_coach': True},
+        editable=False,
+    )
     subject = models.CharField(max_length=255)
     notes_coach = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+    # bumped by every save(), and by signals when the slot moves: what
+    # calendar feeds and delta syncs compare against (see coach_app.feeds)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SessionQuerySet.as_manager()
+
+    def fill_coach(self):
+        if self.coach_id is None:
+            self.coach_id = self.timeslot.coach_id
+
+    def save(self, *args, **kwargs):
+        self.fill_coach()
+        super().save(*args, **kwargs)
 
     class Meta:
         ordering = ['timeslot__date', 'timeslot__start_time']
+        indexes = [
+            models.Index(fields=['coach', 'updated_at'], name='session_coach_updated_idx'),
+            models.Index(fields=['client', 'updated_at'], name='session_client_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Session '{self.subject}' on {self.timeslot.date} at {self.timeslot.start_time} with {self.client.username}"
+
+
+class CancelledSession(models.Model):
+    """
+    What is left of a deleted Session, so calendar feeds and delta syncs
+    can tell their clients it is gone. Written in the deleting transaction.
+    """
+    # plain ids: the session is gone, its users may follow
+    session_id = models.BigIntegerField()
+    coach_id = models.BigIntegerField()
+    client_id = models.BigIntegerField()
+    start_at = models.DateTimeField(null=True)
+    end_at = models.DateTimeField(null=True)
+    cancelled_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['cancelled_at']
+        indexes = [
+            models.Index(fields=['coach_id', 'cancelled_at'], name='cancelled_coach_idx'),
+            models.Index(fields=['client_id', 'cancelled_at'], name='cancelled_client_idx'),
+        ]
+
+    def __str__(self):
+        return f"Session {self.session_id} cancelled {self.cancelled_at:%Y-%m-%d %H:%M}"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A client waiting for a slot in a coach's calendar on `date`, optionally
+    only one starting between `earliest` and `latest`. When a matching
+    session is cancelled the slot is booked for the first waiting entry by
+    priority (highest first), then by age (see coach_app.waitlist).
+    """
+    class Status(models.TextChoices):
+        WAITING = 'waiting', 'Waiting'
+        BOOKED = 'booked', 'Booked'
+        WITHDRAWN = 'withdrawn', 'Withdrawn'
+
+    client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='waitlist_entries')
+    coach = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='waitlisted',
+        limit_choices_to={'is_coach': True},
+    )
+    date = models.DateField()
+    earliest = models.TimeField(null=True, blank=True)
+    latest = models.TimeField(null=True, blank=True)
+    subject = models.CharField(max_length=255)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.WAITING)
+    # the session booked for this entry
+    session = models.OneToOneField(
+        Session, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['date', '-priority', 'created_at', 'id']
+        indexes = [
+            # the allocator's lookup: one coach's waiting entries on a date,
+            # already in the order they are served
+            models.Index(
+                fields=['coach', 'date', '-priority', 'created_at'],
+                condition=models.Q(status='waiting'),
+                name='waitlist_queue_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(earliest__isnull=True)
+                    | models.Q(latest__isnull=True)
+                    | models.Q(latest__gte=models.F('earliest'))
+                ),
+                name='waitlist_window_ordered',
+                violation_error_message="Latest must not be before earliest.",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.client} waiting for {self.coach} on {self.date} ({self.get_status_display()})"
+
+
+class SlotOpening(models.Model):
+    """
+    A slot freed by a cancelled session, queued for the waitlist worker
+    (manage.py process_waitlist). Written in the transaction that deletes
+    the session, so an opening exists exactly when the cancellation
+    committed.
+    """
+    # no database constraint: the slot may be deleted along with the
+    # session (its coach or itself deleted), the worker then drops the row
+    timeslot = models.ForeignKey(
+        TimeSlot, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Opening of slot {self.timeslot_id}"
+
+
+class Task(models.Model):
+    """
+    A call to run in the background (manage.py run_tasks, see
+    coach_app.tasks): the function at dotted path `name`, with `kwargs`,
+    once `run_at` has passed. Written in the caller's transaction, so a
+    task exists exactly when what it follows up on committed.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        FAILED = 'failed', 'Failed'
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # queuing a task under a key replaces the pending one with that key
+    key = models.CharField(max_length=100, blank=True)
+    # the worker running the task, until locked_until: if it dies, another
+    # runs the task again once that has passed
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            # the worker's lookup: pending tasks in the order they are due
+            models.Index(fields=['run_at'], condition=models.Q(status='pending'), name='task_due_idx'),
+            models.Index(
+                fields=['key'], condition=models.Q(status='pending') & ~models.Q(key=''), name='task_key_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} at {self.run_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
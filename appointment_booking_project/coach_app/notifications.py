@@ -0,0 +1,75 @@
+"""
+Emails about sessions, written by the task worker (coach_app.tasks) rather
+than in the booking request: a booking queues one sessions_booked task,
+however many emails and reminders follow from it.
+"""
+from datetime import timedelta
+
+from django.core.mail import EmailMessage
+from django.utils import timezone
+
+from . import tasks
+from .models import Session
+
+REMINDER_BEFORE = timedelta(hours=24)
+
+
+def reminder_key(timeslot_id):
+    return f"reminder:{timeslot_id}"
+
+
+def _when(slot):
+    return f"{slot.date:%A %d %B %Y} at {slot.start_time:%H:%M}"
+
+
+def _email(user, subject, body):
+    # accounts may have no address
+    return EmailMessage(subject, body, to=[user.email]) if user.email else None
+
+
+def _sessions(**filters):
+    return Session.objects.filter(**filters).select_related("client", "coach", "timeslot")
+
+
+def sessions_booked(session_ids):
+    """
+    The client's confirmation and the coach's notice of each session, and
+    a reminder to the client REMINDER_BEFORE it starts. Sessions cancelled
+    since are skipped.
+    """
+    messages = []
+    now = timezone.now()
+    for session in _sessions(pk__in=session_ids):
+        slot = session.timeslot
+        messages.append(_email(
+            session.client,
+            f"Session booked with {session.coach.username}",
+            f"Your session \"{session.subject}\" with {session.coach.username} "
+            f"is booked for {_when(slot)} ({slot.duration} minutes).",
+        ))
+        messages.append(_email(
+            session.coach,
+            f"New session with {session.client.username}",
+            f"{session.client.username} booked \"{session.subject}\" for {_when(slot)} "
+            f"({slot.duration} minutes).",
+        ))
+        remind_at = slot.start_at - REMINDER_BEFORE
+        if remind_at > now:
+            tasks.enqueue(
+                session_reminder, run_at=remind_at, key=reminder_key(slot.pk), timeslot_id=slot.pk
+            )
+    return [message for message in messages if message is not None]
+
+
+def session_reminder(timeslot_id):
+    """Reminds the client of the session booked in slot `timeslot_id`, if it is still ahead."""
+    session = _sessions(timeslot_id=timeslot_id).first()
+    if session is None or session.timeslot.start_at <= timezone.now():
+        return []
+    message = _email(
+        session.client,
+        f"Reminder: session with {session.coach.username}",
+        f"Your session \"{session.subject}\" with {session.coach.username} "
+        f"is on {_when(session.timeslot)}.",
+    )
+    return [message] if message is not None else []
@@ -0,0 +1,170 @@
+"""
+Virtual slots from a coach's AvailabilityRules.
+
+A rule says "Mondays 09:00-18:00, 30-minute slots"; expand() turns rules
+and exceptions into the slot starts they offer on the dates asked for, one
+date at a time, so a query over a year holds a year of slots at most and
+the database holds none. A TimeSlot row is written when one of them is
+booked (booking.book_timeslot), under the (coach, date, start_time)
+constraint, so rows grow with bookings rather than with the horizon.
+"""
+from datetime import datetime, time, timedelta
+
+from .models import AvailabilityException, AvailabilityRule, TimeSlot
+
+
+def load(coach_id, dates):
+    """
+    (rules, exceptions) of coach `coach_id` that can apply to `dates`: one
+    query for the rules, and one for the exceptions only if a rule applies.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return [], []
+    weekdays = {day.weekday() for day in dates}
+    rules = [
+        rule
+        for rule in AvailabilityRule.objects.filter(coach_id=coach_id, weekday__in=weekdays)
+        if (rule.valid_from is None or rule.valid_from <= dates[-1])
+        and (rule.valid_until is None or rule.valid_until >= dates[0])
+    ]
+    if not rules:
+        return [], []
+    exceptions = list(
+        AvailabilityException.objects.filter(coach_id=coach_id, date__range=(dates[0], dates[-1]))
+    )
+    return rules, exceptions
+
+
+def expand(rules, exceptions, dates):
+    """
+    Yields (date, start_time, minutes) for every slot `rules` offer on
+    `dates`, in order, leaving out those an exception blocks. A slot lasts
+    and starts every `slot_minutes` and must fit before the rule's
+    end_time; overlapping rules offer each start once, at the length of the
+    first rule (by start time) offering it.
+    """
+    by_weekday = {}
+    for rule in rules:
+        by_weekday.setdefault(rule.weekday, []).append(rule)
+    blocked = {}
+    for exception in exceptions:
+        blocked.setdefault(exception.date, []).append(exception)
+
+    for day in dates:
+        starts = {}
+        for rule in by_weekday.get(day.weekday(), ()):
+            if not rule.applies_on(day):
+                continue
+            step = timedelta(minutes=rule.slot_minutes)
+            current = datetime.combine(day, rule.start_time)
+            end = datetime.combine(day, rule.end_time)
+            while current + step <= end:
+                starts.setdefault(current.time(), rule.slot_minutes)
+                current += step
+        day_off = blocked.get(day, ())
+        for start_time, minutes in sorted(starts.items()):
+            if day_off:
+                end_time = (datetime.combine(day, start_time) + timedelta(minutes=minutes)).time()
+                if any(exception.blocks(start_time, end_time) for exception in day_off):
+                    continue
+            yield day, start_time, minutes
+
+
+def _merged(blocks):
+    merged = []
+    for start, end in sorted(blocks):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def working_hours(rules, day):
+    """The (start_time, end_time) blocks `rules` cover on `day`, touching ones merged."""
+    return _merged((rule.start_time, rule.end_time) for rule in rules if rule.applies_on(day))
+
+
+def coach_hours(coach, day):
+    """
+    The (start_time, end_time) blocks `coach` works on `day`: those of
+    their rules, and the span from their first TimeSlot row that day to the
+    end of their last, merged.
+    """
+    return hours_by_day([(coach.pk, day)])[coach.pk, day]
+
+
+def hours_by_day(pairs):
+    """coach_hours() for each (coach_id, day) of `pairs`, in two queries however many there are."""
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    coach_ids = {coach_id for coach_id, _ in pairs}
+    days = {day for _, day in pairs}
+    rules = {}
+    for rule in AvailabilityRule.objects.filter(
+        coach_id__in=coach_ids, weekday__in={day.weekday() for day in days}
+    ):
+        rules.setdefault(rule.coach_id, []).append(rule)
+    blocks = {
+        (coach_id, day): [
+            (rule.start_time, rule.end_time) for rule in rules.get(coach_id, ()) if rule.applies_on(day)
+        ]
+        for coach_id, day in pairs
+    }
+    spans = {}
+    rows = TimeSlot.objects.filter(coach_id__in=coach_ids, date__in=days).values_list(
+        "coach_id", "date", "start_time", "duration"
+    )
+    for coach_id, day, start, minutes in rows:
+        if (coach_id, day) in blocks:
+            end = datetime.combine(day, start) + timedelta(minutes=minutes)
+            first, last = spans.get((coach_id, day), (start, end))
+            spans[coach_id, day] = (min(first, start), max(last, end))
+    for (coach_id, day), (first, last) in spans.items():
+        blocks[coach_id, day].append((first, last.time() if last.date() == day else time.max))
+    return {pair: _merged(day_blocks) for pair, day_blocks in blocks.items()}
+
+
+def within(hours, day, start_time, minutes):
+    """Whether `minutes` from `start_time` on `day` end that day, inside one of the blocks of `hours`."""
+    end = datetime.combine(day, start_time) + timedelta(minutes=minutes)
+    return end.date() == day and any(start <= start_time and end.time() <= stop for start, stop in hours)
+
+
+def virtual_slot(coach, day, start_time, duration=None):
+    """
+    The unsaved TimeSlot `coach`'s rules offer at `start_time` on `day`, or
+    None. With `duration` (minutes) the slot is that long instead of the
+    rule's slot_minutes, and must still end within the coach's hours and
+    clear of their exceptions. Saving it is what materializes the slot.
+    """
+    return virtual_slots(coach, [(day, start_time, duration)])[0]
+
+
+def virtual_slots(coach, wanted):
+    """virtual_slot() for each (day, start_time, duration) of `wanted`, on one load()."""
+    wanted = list(wanted)
+    dates = sorted({day for day, _, _ in wanted})
+    rules, exceptions = load(coach.pk, dates)
+    offered = {(day, start): minutes for day, start, minutes in expand(rules, exceptions, dates)}
+    slots = []
+    for day, start_time, duration in wanted:
+        minutes = offered.get((day, start_time))
+        if minutes is not None and duration is not None and duration != minutes:
+            end_time = (datetime.combine(day, start_time) + timedelta(minutes=duration)).time()
+            if (
+                not within(working_hours(rules, day), day, start_time, duration)
+                or any(e.date == day and e.blocks(start_time, end_time) for e in exceptions)
+            ):
+                minutes = None
+            else:
+                minutes = duration
+        if minutes is None:
+            slots.append(None)
+            continue
+        slot = TimeSlot(coach=coach, date=day, start_time=start_time, duration=minutes)
+        slot.fill_bounds()
+        slots.append(slot)
+    return slots
@@ -0,0 +1,82 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import notifications, tasks, waitlist
+from .availability import invalidate_days, invalidate_rules
+from .models import (
+    AvailabilityException, AvailabilityRule, CancelledSession, CustomUser, Session, TimeSlot,
+)
+
+
+@receiver(pre_save, sender=TimeSlot)
+def timeslot_moving(sender, instance, **kwargs):
+    # a slot moved to another day or coach leaves its old day changed too
+    if instance._state.adding:
+        return
+    stored = getattr(instance, '_stored', None)
+    if stored is None or None in stored:
+        stored = TimeSlot.objects.filter(pk=instance.pk).values_list('coach_id', 'date').first()
+    instance._moved_from = stored
+
+
+@receiver([post_save, post_delete], sender=TimeSlot)
+def timeslot_changed(sender, instance, **kwargs):
+    previous = getattr(instance, '_moved_from', None)
+    if previous is not None and previous != (instance.coach_id, instance.date):
+        invalidate_days(previous[0], [previous[1]])
+    invalidate_days(instance.coach_id, [instance.date])
+    instance._stored = (instance.coach_id, instance.date)
+    instance._moved_from = None
+
+
+@receiver(post_save, sender=TimeSlot)
+def timeslot_moved(sender, instance, created, **kwargs):
+    # a session's time is its slot's: feeds and syncs must see it change,
+    # and its reminder go with it
+    if not created:
+        Session.objects.filter(timeslot=instance).update(updated_at=timezone.now())
+        tasks.reschedule(notifications.reminder_key(instance.pk), instance.start_at - notifications.REMINDER_BEFORE)
+
+
+@receiver([post_save, post_delete], sender=Session)
+def session_changed(sender, instance, **kwargs):
+    # booking flips is_available with a queryset update(), which sends no
+    # signal of its own; the Session row written next to it does
+    try:
+        day = instance.timeslot.date
+    except TimeSlot.DoesNotExist:
+        return
+    invalidate_days(instance.coach_id, [day])
+
+
+@receiver(post_delete, sender=Session)
+def session_cancelled(sender, instance, **kwargs):
+    # in the deleting transaction: the slot reopens, and feeds learn the
+    # session is gone, only if the delete commits
+    waitlist.release(instance.timeslot_id)
+    try:
+        start_at, end_at = instance.timeslot.start_at, instance.timeslot.end_at
+    except TimeSlot.DoesNotExist:
+        start_at = end_at = None
+    CancelledSession.objects.create(
+        session_id=instance.pk,
+        coach_id=instance.coach_id,
+        client_id=instance.client_id,
+        start_at=start_at,
+        end_at=end_at,
+    )
+
+
+@receiver([post_save, post_delete], sender=AvailabilityRule)
+@receiver([post_save, post_delete], sender=AvailabilityException)
+def rules_changed(sender, instance, **kwargs):
+    # an edit can move a rule or exception to other dates: drop them all
+    invalidate_rules(instance.coach_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def coach_changed(sender, instance, update_fields=None, **kwargs):
+    # the buffer decides which slots are taken; logins only save last_login
+    if instance.is_coach and (update_fields is None or 'buffer_minutes' in update_fields):
+        invalidate_rules(instance.pk)
@@ -0,0 +1,74 @@
+import time as clock
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.db import transaction
+
+from .availability import invalidate_days
+from .models import TimeSlot
+
+# Default working-hours template: one 09:00-18:00 block
+WORKING_HOURS = [(time(9, 0), time(18, 0))]
+ALL_WEEKDAYS = frozenset(range(7))  # Monday = 0
+
+
+@dataclass
+class GenerationResult:
+    created: int
+    elapsed: float
+
+    @property
+    def rate(self):
+        """Rows inserted per second."""
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+
+def date_range(start_date, end_date, weekdays=ALL_WEEKDAYS):
+    """Yields the dates from start_date to end_date (inclusive) on `weekdays`."""
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            yield day
+        day += timedelta(days=1)
+
+
+def iter_slots(dates, *, coach, slot_minutes=30, hours=WORKING_HOURS):
+    """
+    Yields `coach`'s unsaved `slot_minutes`-long TimeSlots, back to back,
+    filling each block of `hours` on each date. A block's remainder too
+    short for a slot is left out.
+    """
+    step = timedelta(minutes=slot_minutes)
+    for day in dates:
+        for block_start, block_end in hours:
+            current = datetime.combine(day, block_start)
+            end = datetime.combine(day, block_end)
+            while current + step <= end:
+                yield TimeSlot(coach=coach, date=day, start_time=current.time(), duration=slot_minutes)
+                current += step
+
+
+def generate_slots(dates, *, coach, slot_minutes=30, hours=WORKING_HOURS, batch_size=1000):
+    """
+    Inserts `coach`'s slots for `dates` in chunks of `batch_size` rows.
+
+    Slots that already exist are skipped by the (coach, date, start_time)
+    unique constraint (ignore_conflicts) rather than checked one by one, so
+    a quarter's calendar is a handful of INSERTs.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return GenerationResult(created=0, elapsed=0.0)
+
+    in_range = TimeSlot.objects.filter(coach=coach, date__range=(dates[0], dates[-1]))
+    started = clock.perf_counter()
+    with transaction.atomic():
+        before = in_range.count()
+        slots = iter_slots(dates, coach=coach, slot_minutes=slot_minutes, hours=hours)
+        while chunk := list(islice(slots, batch_size)):
+            TimeSlot.objects.bulk_create(chunk, ignore_conflicts=True)
+        created = in_range.count() - before
+        # bulk_create() sends no post_save
+        invalidate_days(coach.pk, dates)
+    return GenerationResult(created=created, elapsed=clock.perf_counter() - started)
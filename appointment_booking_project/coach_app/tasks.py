@@ -0,0 +1,138 @@
+"""
+A task queue in the database, for what a request shouldn't wait for.
+
+enqueue() writes a Task row in the caller's transaction: the task exists
+if and only if the booking (or whatever it follows up on) commits, and
+costs the request one INSERT however much the task goes on to do. Workers
+(manage.py run_tasks) claim due tasks in batches with a conditional UPDATE,
+so several can share the queue, and run each in its own transaction.
+
+A task that raises is retried after RETRY_DELAY, doubled at each attempt,
+until it has had max_attempts; then it stays in the table as failed, with
+its last error, for the admin. A task whose worker died is run again once
+its LEASE has passed: tasks must be safe to run twice.
+
+Tasks return the EmailMessages they want sent instead of sending them: the
+worker sends those of its whole batch over one connection of the email
+backend, and retries the tasks behind them if that fails.
+
+    TASKS = {
+        "BATCH_SIZE": 100,  # tasks claimed per pass
+        "MAX_ATTEMPTS": 5,
+        "RETRY_DELAY": 30,  # seconds before the first retry
+        "LEASE": 300,       # seconds a claimed task is left to its worker
+    }
+"""
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"BATCH_SIZE": 100, "MAX_ATTEMPTS": 5, "RETRY_DELAY": 30, "LEASE": 300}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, "TASKS", {})}
+
+
+def task_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *, run_at=None, key="", max_attempts=None, **kwargs):
+    """
+    Queues func(**kwargs) to run at `run_at`, as soon as possible by
+    default; `kwargs` must be JSON. A `key` replaces the pending task
+    queued under it, if any.
+    """
+    if key:
+        Task.objects.filter(key=key, status=Task.Status.PENDING).delete()
+    return Task.objects.create(
+        name=task_name(func),
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        key=key,
+        max_attempts=max_attempts or _options()["MAX_ATTEMPTS"],
+    )
+
+
+def reschedule(key, run_at):
+    """Moves the pending task queued under `key`, if any, to `run_at`."""
+    return Task.objects.filter(key=key, status=Task.Status.PENDING).update(run_at=run_at)
+
+
+def run_due(limit=None):
+    """
+    Claims up to `limit` (BATCH_SIZE) due tasks and runs them, then sends
+    the emails they returned in one go. Returns (run, failed), `failed`
+    counting the tasks that will be retried or were given up on.
+    """
+    options = _options()
+    now = timezone.now()
+    worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    due = Task.objects.filter(status=Task.Status.PENDING, run_at__lte=now).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+    ids = list(due.values_list("id", flat=True)[: limit or options["BATCH_SIZE"]])
+    if not ids:
+        return 0, 0
+    due.filter(id__in=ids).update(
+        locked_by=worker,
+        locked_until=now + timedelta(seconds=options["LEASE"]),
+        attempts=F("attempts") + 1,
+    )
+    tasks = list(Task.objects.filter(id__in=ids, locked_by=worker))
+
+    done, failed, outbox = [], [], []
+    for task in tasks:
+        try:
+            with transaction.atomic():
+                messages = import_string(task.name)(**task.kwargs)
+        except Exception as exc:
+            logger.exception("Task %s (%s) failed", task.pk, task.name)
+            failed.append((task, exc))
+            continue
+        if messages:
+            outbox.append((task, messages))
+        else:
+            done.append(task)
+    if outbox:
+        try:
+            mail.get_connection().send_messages([message for _, messages in outbox for message in messages])
+        except Exception as exc:
+            logger.exception("Could not send the emails of %s tasks", len(outbox))
+            failed += [(task, exc) for task, _ in outbox]
+        else:
+            done += [task for task, _ in outbox]
+
+    Task.objects.filter(id__in=[task.pk for task in done], locked_by=worker).delete()
+    for task, exc in failed:
+        _retry(task, exc, worker, options)
+    return len(tasks), len(failed)
+
+
+def _retry(task, exc, worker, options):
+    if task.attempts >= task.max_attempts:
+        status, run_at = Task.Status.FAILED, task.run_at
+    else:
+        status = Task.Status.PENDING
+        run_at = timezone.now() + timedelta(seconds=options["RETRY_DELAY"] * 2 ** (task.attempts - 1))
+    Task.objects.filter(pk=task.pk, locked_by=worker).update(
+        status=status,
+        run_at=run_at,
+        locked_by="",
+        locked_until=None,
+        last_error=f"{type(exc).__name__}: {exc}",
+    )
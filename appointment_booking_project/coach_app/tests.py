@@ -15,7 +15,9 @@ class CustomUserModelTest(TestCase):
 
 class TimeSlotModelTest(TestCase):
     def setUp(self):
+        self.coach = CustomUser.objects.create_user(username='coach', password='password123', is_coach=True)
         self.timeslot = TimeSlot.objects.create(
+            coach=self.coach,
             date=date.today(),
             start_time=time(9, 0),
             is_available=True
@@ -35,16 +37,38 @@ class TimeSlotModelTest(TestCase):
         expected_str = f"{self.timeslot.date} at {self.timeslot.start_time} (Booked)"
         self.assertEqual(str(self.timeslot), expected_str)
 
+    def test_start_and_end_datetimes_follow_date_and_time(self):
+        self.assertEqual(self.timeslot.start_at.date(), self.timeslot.date)
+        self.assertEqual(self.timeslot.start_at.time(), self.timeslot.start_time)
+        self.assertEqual(self.timeslot.end_at - self.timeslot.start_at, timedelta(minutes=30))
+
+        self.timeslot.start_time = time(11, 30)
+        self.timeslot.save(update_fields=['start_time'])
+        self.timeslot.refresh_from_db()
+        self.assertEqual(self.timeslot.start_at.time(), time(11, 30))
+
+    def test_bulk_create_fills_start_and_end_datetimes(self):
+        slot, = TimeSlot.objects.bulk_create([TimeSlot(coach=self.coach, date=date.today(), start_time=time(12, 0))])
+        self.assertEqual(slot.end_at.time(), time(12, 30))
+
     def test_unique_together_constraint(self):
         # Trying to create a duplicate timeslot should raise an IntegrityError
         with self.assertRaises(Exception):
-            TimeSlot.objects.create(date=self.timeslot.date, start_time=self.timeslot.start_time)
+            TimeSlot.objects.create(
+                coach=self.coach, date=self.timeslot.date, start_time=self.timeslot.start_time
+            )
+
+    def test_other_coach_may_use_the_same_time(self):
+        other = CustomUser.objects.create_user(username='coach2', password='password123', is_coach=True)
+        TimeSlot.objects.create(coach=other, date=self.timeslot.date, start_time=self.timeslot.start_time)
+        self.assertEqual(TimeSlot.objects.filter(start_time=self.timeslot.start_time).count(), 2)
 
 
 class SessionModelTest(TestCase):
     def setUp(self):
         self.client_user = CustomUser.objects.create_user(username='client1', password='password123')
-        self.timeslot = TimeSlot.objects.create(date=date.today(), start_time=time(10, 0))
+        self.coach = CustomUser.objects.create_user(username='coach', password='password123', is_coach=True)
+        self.timeslot = TimeSlot.objects.create(coach=self.coach, date=date.today(), start_time=time(10, 0))
         self.session = Session.objects.create(
             client=self.client_user,
             timeslot=self.timeslot,
@@ -52,13 +76,16 @@ class SessionModelTest(TestCase):
             notes_coach='Focus on calculus',
         )
 
+    def test_coach_is_copied_from_the_timeslot(self):
+        self.assertEqual(self.session.coach, self.coach)
+
     def test_str_method(self):
         expected_str = f"Session 'Math Tutoring' on {self.timeslot.date} at {self.timeslot.start_time} with {self.client_user.username}"
         self.assertEqual(str(self.session), expected_str)
 
     def test_session_ordering(self):
         # Create another session at an earlier time to check ordering
-        earlier_timeslot = TimeSlot.objects.create(date=date.today(), start_time=time(9, 0))
+        earlier_timeslot = TimeSlot.objects.create(coach=self.coach, date=date.today(), start_time=time(9, 0))
         earlier_session = Session.objects.create(
             client=self.client_user,
             timeslot=earlier_timeslot,
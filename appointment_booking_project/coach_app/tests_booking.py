@@ -0,0 +1,338 @@
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from coach_app.availability import day_availability
+from coach_app.booking import ROLLED_BACK, SlotUnavailable, book_batch, book_timeslot
+from coach_app.forms import SessionForm
+from coach_app.models import MAX_SESSION_MINUTES, AvailabilityRule, CustomUser, Session, TimeSlot
+
+
+class BookTimeslotTests(TestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.timeslot = TimeSlot.objects.create(
+            coach=self.coach, date=timezone.now().date(), start_time=time(10, 0)
+        )
+
+    def test_booking_claims_slot(self):
+        session = book_timeslot(client=self.alice, timeslot=self.timeslot, subject='Intro')
+        self.assertEqual(session.client, self.alice)
+        self.assertEqual(session.coach, self.coach)
+        self.timeslot.refresh_from_db()
+        self.assertFalse(self.timeslot.is_available)
+
+    def test_second_booking_is_rejected(self):
+        book_timeslot(client=self.alice, timeslot=self.timeslot, subject='Intro')
+        stale = TimeSlot.objects.get(pk=self.timeslot.pk)
+        stale.is_available = True  # what a concurrent reader saw before the claim
+        with self.assertRaises(SlotUnavailable):
+            book_timeslot(client=self.bob, timeslot=stale, subject='Too late')
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_stale_availability_flag_does_not_raise_integrity_error(self):
+        Session.objects.create(client=self.alice, timeslot=self.timeslot, subject='Intro')
+        # is_available is still True, but the OneToOneField is taken
+        with self.assertRaises(SlotUnavailable):
+            book_timeslot(client=self.bob, timeslot=self.timeslot, subject='Too late')
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_view_reports_lost_race_as_form_error(self):
+        self.client.login(username='bob', password='testpass123')
+        picked = f"{self.timeslot.date:%Y-%m-%d} 10:00"
+
+        def claimed_meanwhile(*, client, timeslot, subject):
+            book_timeslot(client=self.alice, timeslot=timeslot, subject='Intro')
+            return book_timeslot(client=client, timeslot=timeslot, subject=subject)
+
+        with mock.patch('coach_app.forms.book_timeslot', side_effect=claimed_meanwhile):
+            response = self.client.post(
+                reverse('make_appointment'),
+                {'coach': self.coach.pk, 'timeslot': picked, 'subject': 'Too late'},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response.context['form'], 'timeslot',
+            'That slot was just booked. Please pick another.',
+        )
+        self.assertEqual(Session.objects.get().client, self.alice)
+
+
+class SessionFormBufferTests(TestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.day = timezone.now().date()
+        booked = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 0))
+        book_timeslot(client=self.alice, timeslot=booked, subject='Intro')
+
+    def form_for(self, start_time, coach=None):
+        coach = coach or self.coach
+        TimeSlot.objects.create(coach=coach, date=self.day, start_time=start_time)
+        return SessionForm({
+            'coach': coach.pk,
+            'timeslot': f"{self.day:%Y-%m-%d} {start_time:%H:%M}",
+            'subject': 'Next',
+        })
+
+    def test_slot_inside_buffer_is_rejected(self):
+        form = self.form_for(time(10, 10))
+        self.assertFalse(form.is_valid())
+        self.assertIn('timeslot', form.errors)
+
+    def test_slot_outside_buffer_is_accepted(self):
+        self.assertTrue(self.form_for(time(10, 30)).is_valid())
+
+    def test_other_coaches_sessions_do_not_count(self):
+        other = CustomUser.objects.create_user(username='coach2', password='testpass123', is_coach=True)
+        self.assertTrue(self.form_for(time(10, 10), coach=other).is_valid())
+
+    def test_slot_of_another_coach_is_not_offered(self):
+        other = CustomUser.objects.create_user(username='coach2', password='testpass123', is_coach=True)
+        TimeSlot.objects.create(coach=other, date=self.day, start_time=time(15, 0))
+        form = SessionForm({'coach': self.coach.pk, 'timeslot': f"{self.day:%Y-%m-%d} 15:00", 'subject': 'x'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['timeslot'], ["This time is not offered by the coach."])
+
+    def test_buffer_check_is_a_single_query(self):
+        for minute in (0, 30):
+            slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(14, minute))
+            book_timeslot(client=self.alice, timeslot=slot, subject='Busy')
+        form = self.form_for(time(12, 0))
+        # coach + slot lookup + buffer range query, however many sessions the day has
+        with self.assertNumQueries(3):
+            self.assertTrue(form.is_valid())
+
+
+class SessionDurationTests(TestCase):
+    """A 10:00-11:00 session with a 10-minute buffer; the day is 2030-01-07."""
+
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.coach = CustomUser.objects.create_user(
+            username='coach', password='testpass123', is_coach=True, buffer_minutes=10
+        )
+        # an hour-long slot: the coach has no hours to stretch a shorter one into
+        slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 0), duration=60)
+        book_timeslot(client=self.alice, timeslot=slot, subject='Long one', duration=60)
+
+    def form_for(self, start_time, duration=None):
+        TimeSlot.objects.get_or_create(coach=self.coach, date=self.day, start_time=start_time)
+        data = {'coach': self.coach.pk, 'timeslot': f"{self.day:%Y-%m-%d} {start_time:%H:%M}", 'subject': 'Next'}
+        if duration:
+            data['duration'] = duration
+        return SessionForm(data)
+
+    def test_booking_resizes_the_slot(self):
+        slot = TimeSlot.objects.get(start_time=time(10, 0))
+        self.assertEqual(slot.duration, 60)
+        self.assertEqual(slot.end_time, time(11, 0))
+        self.assertEqual(slot.end_at - slot.start_at, timedelta(hours=1))
+
+    def test_buffer_boundaries_after(self):
+        self.assertEqual(self.form_for(time(11, 5)).errors['timeslot'], [
+            "There must be at least 10 minutes between sessions.",
+        ])
+        self.assertTrue(self.form_for(time(11, 10)).is_valid())
+
+    def test_buffer_boundaries_before(self):
+        self.assertFalse(self.form_for(time(9, 0), duration=55).is_valid())
+        self.assertTrue(self.form_for(time(9, 0), duration=50).is_valid())
+
+    def test_overlap(self):
+        self.assertEqual(self.form_for(time(10, 30)).errors['timeslot'], [
+            "That time overlaps another session.",
+        ])
+        self.assertEqual(self.form_for(time(9, 30), duration=120).errors['timeslot'], [
+            "That time overlaps another session.",
+        ])
+
+    def test_longest_session_is_found(self):
+        slot = TimeSlot.objects.create(
+            coach=self.coach, date=self.day, start_time=time(13, 0), duration=MAX_SESSION_MINUTES
+        )
+        book_timeslot(client=self.alice, timeslot=slot, subject='Workshop')
+        self.assertFalse(self.form_for(time(16, 50)).is_valid())
+        self.assertTrue(self.form_for(time(17, 10), duration=30).is_valid())
+
+    def test_must_end_by_closing_time(self):
+        self.assertEqual(self.form_for(time(17, 30), duration=60).errors['timeslot'], [
+            "Appointments must end within the coach's working hours.",
+        ])
+
+    def test_hours_are_the_coachs_own(self):
+        # an early slot is bookable, and stretches as far as the coach's last slot
+        self.assertTrue(self.form_for(time(7, 0)).is_valid())
+        TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(19, 30))
+        self.assertTrue(self.form_for(time(18, 30), duration=90).is_valid())
+        self.assertFalse(self.form_for(time(19, 30), duration=60).is_valid())
+
+    def test_booking_checks_the_coachs_hours(self):
+        slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(17, 30))
+        with self.assertRaisesMessage(SlotUnavailable, "Appointments must end within the coach's working hours."):
+            book_timeslot(client=self.alice, timeslot=slot, subject='Late', duration=60)
+        # up to the end of the coach's last slot
+        early = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(16, 0))
+        session = book_timeslot(client=self.alice, timeslot=early, subject='Fits', duration=120)
+        self.assertEqual(session.timeslot.end_time, time(18, 0))
+
+    def test_booking_rechecks_conflicts(self):
+        # both validated before either was booked
+        first = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(14, 0))
+        second = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(14, 30))
+        book_timeslot(client=self.alice, timeslot=first, subject='A', duration=45)
+        with self.assertRaises(SlotUnavailable):
+            book_timeslot(client=self.alice, timeslot=second, subject='B')
+        second.refresh_from_db()
+        self.assertTrue(second.is_available)
+
+    def test_availability_lists_overlapped_slots_as_taken(self):
+        TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 30))
+        TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(11, 0))
+        TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(11, 30))
+        slots = day_availability(self.coach.pk, self.day).slots
+        self.assertEqual([slot.is_available for slot in slots], [False, False, False, True])
+
+    def test_buffer_change_refreshes_availability(self):
+        TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(11, 0))
+        self.assertFalse(day_availability(self.coach.pk, self.day).slots[-1].is_available)
+        self.coach.buffer_minutes = 0
+        self.coach.save()
+        self.assertTrue(day_availability(self.coach.pk, self.day).slots[-1].is_available)
+
+
+class BookBatchTests(TestCase):
+    # 2030-01-07 is a Monday
+    monday = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.slots = TimeSlot.objects.bulk_create(
+            TimeSlot(coach=self.coach, date=self.monday + timedelta(weeks=week), start_time=time(10, 0))
+            for week in range(10)
+        )
+
+    def item(self, slot, client=None, **extra):
+        return {'client_id': (client or self.alice).pk, 'timeslot_id': slot.pk, 'subject': 'Weekly', **extra}
+
+    def test_books_a_series(self):
+        results = book_batch([self.item(slot) for slot in self.slots])
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(Session.objects.filter(client=self.alice, coach=self.coach).count(), 10)
+        self.assertFalse(TimeSlot.objects.filter(is_available=True).exists())
+        self.assertFalse(day_availability(self.coach.pk, self.monday).slots[0].is_available)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        more = TimeSlot.objects.bulk_create(
+            TimeSlot(coach=self.coach, date=self.monday + timedelta(days=day), start_time=time(hour))
+            for day in range(1, 11) for hour in (8, 9, 11, 12, 13, 14, 15, 16, 17)
+        )
+        AvailabilityRule.objects.bulk_create(
+            AvailabilityRule(coach=self.coach, weekday=weekday, start_time=time(8), end_time=time(18))
+            for weekday in range(7)
+        )
+        # ... two reading the hours of the lengthened slots' days, and one
+        # INSERT queuing the batch's emails
+        with self.assertNumQueries(15):
+            book_batch([self.item(slot, duration=45) for slot in self.slots[:2]])
+        with self.assertNumQueries(15):
+            book_batch([self.item(slot, duration=45) for slot in more])
+        self.assertEqual(Session.objects.count(), 92)
+        self.assertEqual(TimeSlot.objects.filter(duration=45).count(), 92)
+
+    def test_lengthened_slots_must_fit_the_coachs_hours(self):
+        late = TimeSlot.objects.create(coach=self.coach, date=self.monday, start_time=time(23, 30))
+        AvailabilityRule.objects.create(coach=self.coach, weekday=0, start_time=time(9), end_time=time(12))
+        results = book_batch([
+            self.item(late, duration=240),  # would end at 03:30 the next day
+            self.item(self.slots[1], duration=120),  # 10:00-12:00, within the rule
+            self.item(self.slots[2], duration=150),  # 10:00-12:30, past it
+        ], atomic=False)
+        self.assertEqual([result.error for result in results], [
+            "Appointments must end within the coach's working hours.",
+            None,
+            "Appointments must end within the coach's working hours.",
+        ])
+        late.refresh_from_db()
+        self.assertEqual((late.duration, late.is_available), (30, True))
+
+    def test_atomic_batches_book_all_or_nothing(self):
+        book_timeslot(client=self.bob, timeslot=self.slots[3], subject='Taken')
+        results = book_batch([self.item(slot) for slot in self.slots])
+        self.assertEqual(results[3].error, "That slot was just booked. Please pick another.")
+        self.assertEqual(results[0].error, ROLLED_BACK)
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_partial_batches_book_the_valid_items(self):
+        book_timeslot(client=self.bob, timeslot=self.slots[3], subject='Taken')
+        results = book_batch([self.item(slot) for slot in self.slots], atomic=False)
+        self.assertEqual([result.session is None for result in results], [n == 3 for n in range(10)])
+        self.assertEqual(Session.objects.filter(client=self.alice).count(), 9)
+
+    def test_items_are_checked_against_each_other_and_the_buffer(self):
+        self.coach.buffer_minutes = 15
+        self.coach.save()
+        nearby = TimeSlot.objects.create(coach=self.coach, date=self.monday, start_time=time(10, 30))
+        later = TimeSlot.objects.create(coach=self.coach, date=self.monday, start_time=time(11, 0))
+        results = book_batch([
+            self.item(self.slots[0], duration=60),
+            self.item(nearby, client=self.bob),
+            self.item(later, client=self.bob),
+            self.item(self.slots[0], client=self.bob),
+            {'client_id': 0, 'timeslot_id': self.slots[1].pk, 'subject': 'Nobody'},
+            {'client_id': self.bob.pk, 'timeslot_id': 0, 'subject': 'Nowhere'},
+        ], atomic=False)
+        self.assertEqual([result.error for result in results], [
+            None,
+            "That time overlaps another session.",
+            "There must be at least 15 minutes between sessions.",
+            "That slot was just booked. Please pick another.",
+            "Unknown client.",
+            "Unknown time slot.",
+        ])
+
+    def test_rule_slots_by_coach_and_start(self):
+        AvailabilityRule.objects.create(coach=self.coach, weekday=1, start_time=time(9, 0), end_time=time(12, 0))
+        tuesdays = [self.monday + timedelta(days=1, weeks=week) for week in range(4)]
+        start = timezone.make_aware(datetime.combine(tuesdays[0], time(9, 30)))
+        results = book_batch([
+            {'client_id': self.alice.pk, 'coach_id': self.coach.pk, 'subject': 'Rule', 'duration': 60,
+             'start': timezone.make_aware(datetime.combine(day, time(9, 0)))}
+            for day in tuesdays
+        ] + [
+            {'client_id': self.bob.pk, 'coach_id': self.coach.pk, 'subject': 'Off grid',
+             'start': start + timedelta(minutes=5)},
+        ], atomic=False)
+        self.assertEqual([result.error for result in results], [None] * 4 + ["This time is not offered by the coach."])
+        self.assertEqual(TimeSlot.objects.filter(date__in=tuesdays, duration=60, is_available=False).count(), 4)
+
+    def test_falls_back_to_single_bookings_when_contended(self):
+        # the claim finds one slot gone, as if booked by someone else after
+        # validation: the batch is rolled back and booked item by item
+        real_filter = TimeSlot.objects.filter
+
+        def claim_misses_one(*args, **kwargs):
+            queryset = real_filter(*args, **kwargs)
+            if kwargs.get('is_available') is True and 'pk__in' in kwargs:
+                queryset = queryset.exclude(pk=self.slots[1].pk)
+            return queryset
+
+        with mock.patch.object(TimeSlot.objects, 'filter', side_effect=claim_misses_one), \
+                mock.patch('coach_app.booking.book_timeslot', wraps=book_timeslot) as single:
+            results = book_batch([self.item(slot) for slot in self.slots[:3]])
+        self.assertEqual(single.call_count, 3)
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(Session.objects.filter(client=self.alice).count(), 3)
@@ -0,0 +1,138 @@
+from datetime import date, time, timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from coach_app.booking import book_timeslot
+from coach_app.feeds import feed_token, render_feed
+from coach_app.models import CancelledSession, CustomUser, Session, TimeSlot
+
+
+class FeedTests(TestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 0))
+        self.session = book_timeslot(client=self.alice, timeslot=slot, subject='Intro; career, goals')
+        self.url = reverse('calendar_feed', args=[feed_token(self.coach)])
+
+    def test_feed_lists_the_users_sessions(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'UID:session-{self.session.pk}@coach-booking\r\n', body)
+        self.assertIn('DTSTART:20300107T100000Z\r\nDTEND:20300107T103000Z\r\n', body)
+        self.assertIn('SUMMARY:Intro\\; career\\, goals with alice\r\n', body)
+
+        client_feed = render_feed(self.alice)
+        self.assertIn('SUMMARY:Intro\\; career\\, goals with coach\r\n', client_feed)
+
+    def test_long_lines_are_folded(self):
+        self.session.subject = 'é' * 100
+        self.session.save()
+        lines = render_feed(self.coach).split('\r\n')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertIn('\r\n ', render_feed(self.coach))
+
+    def test_polls_are_revalidated(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.session.notes_coach = 'Bring the CV'
+        self.session.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cancelled_sessions_are_listed_as_cancelled(self):
+        etag = self.client.get(self.url)['ETag']
+        session_id = self.session.pk
+        self.session.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('STATUS:CANCELLED\r\nDTSTART:20300107T100000Z', response.content.decode())
+        gone = CancelledSession.objects.get()
+        self.assertEqual((gone.session_id, gone.coach_id, gone.client_id), (session_id, self.coach.pk, self.alice.pk))
+
+    def test_moving_the_slot_counts_as_a_change(self):
+        before = Session.objects.get().updated_at
+        slot = TimeSlot.objects.get()
+        slot.start_time = time(11, 0)
+        slot.save()
+        self.assertGreater(Session.objects.get().updated_at, before)
+        self.assertIn('DTSTART:20300107T110000Z', render_feed(self.coach))
+
+    def test_bad_tokens_are_a_404(self):
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=['1:forged'])).status_code, 404)
+
+    def test_dashboard_links_the_feed(self):
+        self.client.login(username='alice', password='testpass123')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, reverse('calendar_feed', args=[feed_token(self.alice)]))
+
+
+class ChangesAPITests(APITestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.slots = [
+            TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(hour, 0))
+            for hour in (9, 10, 11)
+        ]
+        self.first = book_timeslot(client=self.alice, timeslot=self.slots[0], subject='First')
+        self.second = book_timeslot(client=self.bob, timeslot=self.slots[1], subject='Second')
+
+    def changes(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/sessions/changes/', params)
+
+    def test_delta_sync(self):
+        Session.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+        full = self.changes(self.coach)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual([row['id'] for row in full.data['changed']], [self.first.pk, self.second.pk])
+        self.assertEqual(full.data['cancelled'], [])
+
+        second = self.second.pk
+        third = book_timeslot(client=self.alice, timeslot=self.slots[2], subject='Third')
+        self.second.delete()
+        delta = self.changes(self.coach, since=full.data['next'])
+        self.assertEqual([row['id'] for row in delta.data['changed']], [third.pk])
+        self.assertEqual(delta.data['cancelled'], [second])
+
+        # alice only sees her own
+        delta = self.changes(self.alice, since=full.data['next'])
+        self.assertEqual([row['id'] for row in delta.data['changed']], [third.pk])
+        self.assertEqual(delta.data['cancelled'], [])
+
+    def test_unchanged_is_a_304(self):
+        first = self.changes(self.coach, since='0')
+        response = self.client.get(
+            '/api/sessions/changes/', {'since': '0'}, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_bad_parameters_are_a_400(self):
+        self.assertEqual(self.changes(self.coach, since='yesterday').status_code, 400)
+
+    def test_sync_clients_use_the_feed_token(self):
+        response = self.client.get('/api/sessions/changes/', {'feed': feed_token(self.alice)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['changed']], [self.first.pk])
+
+        forged = self.client.get('/api/sessions/changes/', {'feed': f'{self.bob.pk}:forged'})
+        self.assertIn(forged.status_code, (401, 403))
+
+    def test_anonymous_requests_are_refused(self):
+        # the user is never taken from the query string
+        response = self.client.get('/api/sessions/changes/', {'user': self.coach.pk})
+        self.assertIn(response.status_code, (401, 403))
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from datetime import date, time
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from coach_app import live
+from coach_app.booking import book_timeslot
+from coach_app.models import CustomUser, TimeSlot
+
+
+def parse(event):
+    fields = dict(line.split(': ', 1) for line in event.decode().strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+class AvailabilityStreamTests(TestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 0))
+        TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(11, 0))
+        self.url = f"{reverse('availability_stream')}?coach={self.coach.pk}&date={self.day}"
+
+    def book(self, slot):
+        with self.captureOnCommitCallbacks(execute=True):
+            book_timeslot(client=self.alice, timeslot=slot, subject='Intro')
+
+    async def test_changes_are_pushed(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        try:
+            name, day = parse(await anext(events))
+            self.assertEqual(name, 'slots')
+            self.assertEqual(day['slots'], [
+                {'time': '10:00', 'available': True}, {'time': '11:00', 'available': True},
+            ])
+
+            await sync_to_async(self.book)(self.slot)
+            _, day = parse(await asyncio.wait_for(anext(events), 5))
+            self.assertEqual(day['slots'][0], {'time': '10:00', 'available': False})
+
+            # the browser goes away: the ASGI handler cancels the waiting response
+            waiting = asyncio.ensure_future(anext(events))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            self.assertEqual(live.get_broker().subscriber_count(), 0)
+        finally:
+            await events.aclose()
+
+    @override_settings(LIVE_UPDATES={'KEEPALIVE': 0.01})
+    async def test_idle_streams_are_kept_alive(self):
+        response = await self.async_client.get(self.url)
+        events = aiter(response.streaming_content)
+        try:
+            await anext(events)
+            self.assertEqual(await asyncio.wait_for(anext(events), 5), b': keepalive\n\n')
+        finally:
+            await events.aclose()
+
+    async def test_slow_subscribers_only_keep_the_latest_event(self):
+        mailbox = live.Mailbox()
+        for n in range(5):
+            mailbox.put(n)
+        self.assertEqual(await mailbox.get(), 4)
+        self.assertTrue(mailbox.empty())
+
+    def test_wsgi_gets_one_event_and_polls(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'retry: '))
+        self.assertIn(b'"time": "10:00", "available": true', body)
+
+    def test_unknown_coach_is_a_400(self):
+        url = f"{reverse('availability_stream')}?coach={self.alice.pk}&date={self.day}"
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+    def test_booking_page_subscribes(self):
+        self.client.login(username='alice', password='testpass123')
+        self.assertContains(self.client.get(reverse('make_appointment')), reverse('availability_stream'))
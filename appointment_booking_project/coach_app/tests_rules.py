@@ -0,0 +1,188 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from coach_app.availability import day_availability, free_windows
+from coach_app.booking import SlotUnavailable, book_timeslot
+from coach_app.forms import SessionForm
+from coach_app.models import AvailabilityException, AvailabilityRule, CustomUser, Session, TimeSlot
+from coach_app.rules import expand, load, virtual_slot
+from coach_app.slots import date_range
+
+
+def starts(coach, day):
+    rules, exceptions = load(coach.pk, [day])
+    return [start for _, start, _ in expand(rules, exceptions, [day])]
+
+
+class RuleExpansionTests(TestCase):
+    # 2030-01-07 is a Monday
+    monday = date(2030, 1, 7)
+
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        AvailabilityRule.objects.create(
+            coach=self.coach, weekday=0, start_time=time(9, 0), end_time=time(12, 0)
+        )
+
+    def test_slots_on_the_rules_weekday_only(self):
+        self.assertEqual(starts(self.coach, self.monday), [
+            time(9, 0), time(9, 30), time(10, 0), time(10, 30), time(11, 0), time(11, 30),
+        ])
+        self.assertEqual(starts(self.coach, self.monday + timedelta(days=1)), [])
+
+    def test_slot_length_and_overlapping_rules(self):
+        AvailabilityRule.objects.create(
+            coach=self.coach, weekday=0, start_time=time(11, 0), end_time=time(14, 30), slot_minutes=60
+        )
+        self.assertEqual(starts(self.coach, self.monday)[-4:], [
+            time(11, 0), time(11, 30), time(12, 0), time(13, 0),
+        ])
+
+    def test_validity_range(self):
+        AvailabilityRule.objects.update(valid_from=self.monday + timedelta(days=7))
+        self.assertEqual(starts(self.coach, self.monday), [])
+        self.assertEqual(len(starts(self.coach, self.monday + timedelta(days=7))), 6)
+
+    def test_holidays_and_partial_days_off(self):
+        AvailabilityException.objects.create(coach=self.coach, date=self.monday, reason='Holiday')
+        self.assertEqual(starts(self.coach, self.monday), [])
+
+        next_monday = self.monday + timedelta(days=7)
+        AvailabilityException.objects.create(
+            coach=self.coach, date=next_monday, start_time=time(9, 45), end_time=time(11, 0)
+        )
+        self.assertEqual(starts(self.coach, next_monday), [time(9, 0), time(11, 0), time(11, 30)])
+
+    def test_a_year_is_two_queries(self):
+        days = list(date_range(self.monday, self.monday + timedelta(days=364)))
+        with self.assertNumQueries(2):
+            rules, exceptions = load(self.coach.pk, days)
+        self.assertEqual(sum(1 for _ in expand(rules, exceptions, days)), 53 * 6)
+
+    def test_coaches_without_rules_skip_the_exceptions(self):
+        other = CustomUser.objects.create_user(username='other', password='testpass123', is_coach=True)
+        with self.assertNumQueries(1):
+            self.assertEqual(load(other.pk, [self.monday]), ([], []))
+
+
+class RuleAvailabilityTests(TestCase):
+    monday = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.rule = AvailabilityRule.objects.create(
+            coach=self.coach, weekday=0, start_time=time(9, 0), end_time=time(12, 0)
+        )
+
+    def test_rule_slots_are_listed_without_rows(self):
+        slots = day_availability(self.coach.pk, self.monday).slots
+        self.assertEqual(len(slots), 6)
+        self.assertTrue(all(slot.id is None and slot.is_available for slot in slots))
+        self.assertEqual(TimeSlot.objects.count(), 0)
+
+    def test_rows_win_over_rule_slots(self):
+        TimeSlot.objects.create(coach=self.coach, date=self.monday, start_time=time(9, 0), is_available=False)
+        TimeSlot.objects.create(coach=self.coach, date=self.monday, start_time=time(15, 0))
+        slots = day_availability(self.coach.pk, self.monday).slots
+        self.assertEqual([slot.start_time for slot in slots][:2], [time(9, 0), time(9, 30)])
+        self.assertFalse(slots[0].is_available)
+        self.assertEqual(slots[-1].start_time, time(15, 0))
+
+    def test_changing_a_rule_invalidates_every_day(self):
+        start = timezone.make_aware(datetime(2030, 1, 7))
+        end = start + timedelta(days=28)
+        self.assertEqual(len(free_windows(self.coach.pk, start, end)), 4)
+        self.rule.end_time = time(10, 0)
+        self.rule.save()
+        windows = free_windows(self.coach.pk, start, end)
+        self.assertEqual({e - s for s, e in windows}, {timedelta(hours=1)})
+
+        AvailabilityException.objects.create(coach=self.coach, date=self.monday)
+        self.assertEqual(len(free_windows(self.coach.pk, start, end)), 3)
+
+
+class RuleBookingTests(TestCase):
+    monday = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        AvailabilityRule.objects.create(
+            coach=self.coach, weekday=0, start_time=time(9, 0), end_time=time(18, 0)
+        )
+
+    def test_booking_writes_the_row(self):
+        slot = virtual_slot(self.coach, self.monday, time(10, 0))
+        session = book_timeslot(client=self.alice, timeslot=slot, subject='Intro')
+        row = TimeSlot.objects.get()
+        self.assertEqual(session.timeslot, row)
+        self.assertEqual(session.coach, self.coach)
+        self.assertFalse(row.is_available)
+        self.assertFalse(day_availability(self.coach.pk, self.monday).slots[2].is_available)
+
+    def test_only_one_of_two_bookings_writes_the_row(self):
+        first = virtual_slot(self.coach, self.monday, time(10, 0))
+        second = virtual_slot(self.coach, self.monday, time(10, 0))
+        book_timeslot(client=self.alice, timeslot=first, subject='Intro')
+        with self.assertRaises(SlotUnavailable):
+            book_timeslot(client=self.bob, timeslot=second, subject='Too late')
+        self.assertEqual(TimeSlot.objects.count(), 1)
+        self.assertEqual(Session.objects.get().client, self.alice)
+
+    def test_times_outside_the_rules_are_not_offered(self):
+        self.assertIsNone(virtual_slot(self.coach, self.monday, time(10, 15)))
+        self.assertIsNone(virtual_slot(self.coach, self.monday + timedelta(days=1), time(10, 0)))
+
+    def test_longer_sessions_must_fit_the_hours(self):
+        AvailabilityRule.objects.create(
+            coach=self.coach, weekday=1, start_time=time(9, 0), end_time=time(12, 0)
+        )
+        AvailabilityRule.objects.create(
+            coach=self.coach, weekday=1, start_time=time(12, 0), end_time=time(13, 0)
+        )
+        tuesday = self.monday + timedelta(days=1)
+        self.assertEqual(virtual_slot(self.coach, tuesday, time(11, 30), 90).end_time, time(13, 0))
+        self.assertIsNone(virtual_slot(self.coach, tuesday, time(11, 30), 120))
+        AvailabilityException.objects.create(
+            coach=self.coach, date=tuesday, start_time=time(12, 30), end_time=time(13, 0)
+        )
+        self.assertIsNone(virtual_slot(self.coach, tuesday, time(11, 30), 90))
+
+    def test_booking_page(self):
+        self.client.login(username='alice', password='testpass123')
+        response = self.client.post(reverse('make_appointment'), {
+            'coach': self.coach.pk, 'timeslot': '2030-01-07 10:00', 'subject': 'Intro',
+        })
+        self.assertRedirects(response, reverse('dashboard'))
+
+        form = SessionForm({'coach': self.coach.pk, 'timeslot': '2030-01-07 10:00', 'subject': 'Again'})
+        self.assertFalse(form.is_valid())
+        form = SessionForm({'coach': self.coach.pk, 'timeslot': '2030-01-07 10:15', 'subject': 'Off grid'})
+        self.assertEqual(form.errors['timeslot'], ["This time is not offered by the coach."])
+
+    def test_evening_rules_are_bookable(self):
+        AvailabilityRule.objects.create(
+            coach=self.coach, weekday=1, start_time=time(19, 0), end_time=time(21, 0)
+        )
+        data = {'coach': self.coach.pk, 'timeslot': '2030-01-08 20:00', 'subject': 'Evening'}
+        self.assertTrue(SessionForm(data).is_valid())
+        form = SessionForm({**data, 'duration': 90})
+        self.assertEqual(form.errors['timeslot'], ["This time is not offered by the coach."])
+
+    def test_rows_grow_with_bookings_not_with_the_horizon(self):
+        start = timezone.make_aware(datetime(2030, 1, 7))
+        windows = free_windows(self.coach.pk, start, start + timedelta(days=365))
+        self.assertEqual(len(windows), 53)
+        self.assertEqual(TimeSlot.objects.count(), 0)
+        for week in range(3):
+            slot = virtual_slot(self.coach, self.monday + timedelta(weeks=week), time(9, 0))
+            book_timeslot(client=self.alice, timeslot=slot, subject='Weekly')
+        self.assertEqual(TimeSlot.objects.count(), 3)
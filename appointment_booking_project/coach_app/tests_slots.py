@@ -0,0 +1,111 @@
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from coach_app.models import CustomUser, TimeSlot
+from coach_app.slots import date_range, generate_slots
+
+
+class GenerateSlotsTests(TestCase):
+    # 2030-01-07 is a Monday
+    monday = date(2030, 1, 7)
+    sunday = date(2030, 1, 13)
+
+    def setUp(self):
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+
+    def test_fills_working_hours_for_each_day(self):
+        result = generate_slots(date_range(self.monday, self.sunday), coach=self.coach)
+        self.assertEqual(result.created, 7 * 18)
+        self.assertEqual(TimeSlot.objects.filter(date=self.monday).count(), 18)
+        self.assertEqual(TimeSlot.objects.first().start_time, time(9, 0))
+        self.assertEqual(TimeSlot.objects.last().start_time, time(17, 30))
+
+    def test_weekday_mask_and_hours_template(self):
+        generate_slots(
+            date_range(self.monday, self.sunday, weekdays={0, 2}),
+            coach=self.coach,
+            slot_minutes=60,
+            hours=[(time(9, 0), time(12, 0)), (time(14, 0), time(16, 0))],
+        )
+        self.assertEqual(
+            sorted({slot.date.weekday() for slot in TimeSlot.objects.all()}), [0, 2]
+        )
+        self.assertEqual(
+            list(TimeSlot.objects.filter(date=self.monday).values_list('start_time', flat=True)),
+            [time(9, 0), time(10, 0), time(11, 0), time(14, 0), time(15, 0)],
+        )
+
+    def test_slots_are_slot_minutes_long(self):
+        generate_slots(
+            [self.monday], coach=self.coach, slot_minutes=45, hours=[(time(9, 0), time(11, 0))]
+        )
+        slots = TimeSlot.objects.order_by('start_time')
+        # 10:30 would end past 11:00
+        self.assertEqual([slot.start_time for slot in slots], [time(9, 0), time(9, 45)])
+        self.assertEqual({slot.duration for slot in slots}, {45})
+        self.assertEqual(slots.last().end_at - slots.last().start_at, timedelta(minutes=45))
+
+    def test_existing_slots_are_kept_and_not_counted(self):
+        TimeSlot.objects.create(coach=self.coach, date=self.monday, start_time=time(9, 0), is_available=False)
+        result = generate_slots([self.monday], coach=self.coach, batch_size=5)
+        self.assertEqual(result.created, 17)
+        self.assertFalse(TimeSlot.objects.get(date=self.monday, start_time=time(9, 0)).is_available)
+        self.assertEqual(generate_slots([self.monday], coach=self.coach).created, 0)
+
+    def test_calendars_are_per_coach(self):
+        other = CustomUser.objects.create_user(username='coach2', password='testpass123', is_coach=True)
+        generate_slots([self.monday], coach=self.coach)
+        self.assertEqual(generate_slots([self.monday], coach=other).created, 18)
+        self.assertEqual(other.timeslots.count(), 18)
+
+    def test_quarter_takes_a_handful_of_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = generate_slots(date_range(self.monday, date(2030, 3, 31)), coach=self.coach)
+        self.assertEqual(result.created, 84 * 18)
+        # multi-row INSERTs (split further by the backend's parameter limit)
+        # instead of an exists() + create() per slot
+        self.assertLess(len(queries), 20)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command(
+            'generate_slots', '--coach', 'coach', '--from', '2030-01-07', '--to', '2030-01-13',
+            '--weekdays', 'mon,tue,wed,thu,fri', stdout=out,
+        )
+        self.assertIn('Inserted 90 slots', out.getvalue())
+        self.assertFalse(TimeSlot.objects.filter(date=self.sunday).exists())
+
+    def test_management_command_slot_length(self):
+        call_command(
+            'generate_slots', '--coach', 'coach', '--from', '2030-01-07', '--to', '2030-01-07',
+            '--slot-minutes', '60', stdout=StringIO(),
+        )
+        self.assertEqual(set(TimeSlot.objects.values_list('duration', flat=True)), {60})
+        self.assertEqual(TimeSlot.objects.count(), 9)
+        with self.assertRaisesMessage(CommandError, "--slot-minutes must be between 5 and 240."):
+            call_command(
+                'generate_slots', '--coach', 'coach', '--from', '2030-01-07', '--to', '2030-01-07',
+                '--slot-minutes', '0',
+            )
+
+    def test_management_command_needs_a_coach(self):
+        with self.assertRaisesMessage(CommandError, "No coach with username 'nobody'."):
+            call_command('generate_slots', '--coach', 'nobody', '--from', '2030-01-07', '--to', '2030-01-13')
+
+    def test_admin_action(self):
+        admin_user = CustomUser.objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_login(admin_user)
+        seed = TimeSlot.objects.create(coach=self.coach, date=self.monday, start_time=time(9, 0))
+        response = self.client.post(
+            reverse('admin:coach_app_timeslot_changelist'),
+            {'action': 'generate_timeslots', '_selected_action': [seed.pk]},
+            follow=True,
+        )
+        self.assertContains(response, 'Created 17 slots')
+        self.assertEqual(TimeSlot.objects.filter(date=self.monday).count(), 18)
@@ -0,0 +1,127 @@
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from coach_app import tasks
+from coach_app.booking import book_batch, book_timeslot
+from coach_app.models import CustomUser, Task, TimeSlot
+from coach_app.notifications import REMINDER_BEFORE, reminder_key, session_reminder
+
+
+def flaky():
+    raise RuntimeError("boom")
+
+
+class BrokenBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("no SMTP server")
+
+
+class TaskQueueTests(TestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='testpass123')
+        self.coach = CustomUser.objects.create_user(
+            username='coach', email='coach@example.com', password='testpass123', is_coach=True
+        )
+        self.slots = [
+            TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(hour, 0))
+            for hour in range(9, 17)
+        ]
+
+    def test_booking_only_queues_a_task(self):
+        book_timeslot(client=self.alice, timeslot=self.slots[0], subject='Intro')
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(list(Task.objects.values_list('name', flat=True)), ['coach_app.notifications.sessions_booked'])
+
+        self.assertEqual(tasks.run_due(), (1, 0))
+        self.assertEqual(
+            sorted((message.to[0], message.subject) for message in mail.outbox),
+            [('alice@example.com', 'Session booked with coach'), ('coach@example.com', 'New session with alice')],
+        )
+        self.assertIn('Monday 07 January 2030 at 09:00', mail.outbox[0].body)
+        reminder = Task.objects.get()
+        self.assertEqual(reminder.key, reminder_key(self.slots[0].pk))
+        self.assertEqual(reminder.run_at, self.slots[0].start_at - REMINDER_BEFORE)
+        self.assertEqual(tasks.run_due(), (0, 0))  # not due yet
+
+    def test_batch_emails_go_out_over_one_connection(self):
+        book_batch([
+            {'client_id': self.alice.pk, 'timeslot_id': slot.pk, 'subject': 'Weekly'} for slot in self.slots
+        ])
+        self.assertEqual(Task.objects.count(), 1)
+        with mock.patch('coach_app.tasks.mail.get_connection', wraps=mail.get_connection) as get_connection:
+            tasks.run_due()
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 16)
+        self.assertEqual(Task.objects.filter(name=tasks.task_name(session_reminder)).count(), 8)
+
+    def test_reminders_follow_the_session(self):
+        book_timeslot(client=self.alice, timeslot=self.slots[0], subject='Intro')
+        tasks.run_due()
+        mail.outbox.clear()
+
+        slot = self.slots[0]
+        slot.start_time = time(18, 0)
+        slot.save()
+        self.assertEqual(Task.objects.get().run_at, slot.start_at - REMINDER_BEFORE)
+
+        Task.objects.update(run_at=timezone.now())
+        tasks.run_due()
+        self.assertEqual(mail.outbox[0].subject, 'Reminder: session with coach')
+        self.assertIn('at 18:00', mail.outbox[0].body)
+
+    def test_cancelled_sessions_get_no_reminder(self):
+        session = book_timeslot(client=self.alice, timeslot=self.slots[0], subject='Intro')
+        tasks.run_due()
+        session.delete()
+        mail.outbox.clear()
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(tasks.run_due(), (1, 0))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_tasks_are_retried_then_given_up(self):
+        task = tasks.enqueue(flaky, max_attempts=2)
+        with self.assertLogs('coach_app.tasks', 'ERROR'):
+            self.assertEqual(tasks.run_due(), (1, 1))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.last_error), ('pending', 1, 'RuntimeError: boom'))
+        self.assertGreater(task.run_at, timezone.now())
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('coach_app.tasks', 'ERROR'):
+            tasks.run_due()
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('failed', 2))
+        self.assertEqual(tasks.run_due(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='coach_app.tests_tasks.BrokenBackend')
+    def test_tasks_are_retried_when_their_emails_cannot_be_sent(self):
+        book_timeslot(client=self.alice, timeslot=self.slots[0], subject='Intro')
+        with self.assertLogs('coach_app.tasks', 'ERROR'):
+            self.assertEqual(tasks.run_due(), (1, 1))
+        task = Task.objects.get(name='coach_app.notifications.sessions_booked')
+        self.assertEqual(task.last_error, 'ConnectionRefusedError: no SMTP server')
+
+    def test_tasks_of_a_dead_worker_are_run_again(self):
+        task = tasks.enqueue(session_reminder, timeslot_id=self.slots[0].pk)
+        Task.objects.update(locked_by='gone', locked_until=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(tasks.run_due(), (0, 0))
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(tasks.run_due(), (1, 0))
+        self.assertFalse(Task.objects.filter(pk=task.pk).exists())
+
+    def test_command(self):
+        book_timeslot(client=self.alice, timeslot=self.slots[0], subject='Intro')
+        out = StringIO()
+        call_command('run_tasks', '--once', stdout=out)
+        self.assertIn("Ran 1 tasks, 0 failed.", out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
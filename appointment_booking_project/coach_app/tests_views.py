@@ -1,7 +1,12 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from datetime import time
+from datetime import time, timedelta
+from coach_app.availability import day_availability
+from coach_app.booking import book_timeslot
 from coach_app.models import CustomUser, TimeSlot, Session
 
 
@@ -15,6 +20,7 @@ class ViewTests(TestCase):
             username='coachuser', password='testpass123', is_coach=True
         )
         self.timeslot = TimeSlot.objects.create(
+            coach=self.coach_user,
             date=timezone.now().date(),
             start_time=time(10, 0),
             is_available=True
@@ -78,7 +84,8 @@ class ViewTests(TestCase):
     def test_make_appointment_post_success(self):
         self.client.login(username='clientuser', password='testpass123')
         response = self.client.post(self.make_appointment_url, {
-            'timeslot': self.timeslot.id,
+            'coach': self.coach_user.pk,
+            'timeslot': f"{self.timeslot.date:%Y-%m-%d} 10:00",
             'subject': 'Test Subject'
         })
         self.assertEqual(response.status_code, 302)
@@ -86,6 +93,7 @@ class ViewTests(TestCase):
         self.assertEqual(Session.objects.count(), 1)
         session = Session.objects.first()
         self.assertEqual(session.client, self.client_user)
+        self.assertEqual(session.coach, self.coach_user)
         self.assertEqual(session.subject, 'Test Subject')
         self.timeslot.refresh_from_db()
         self.assertFalse(self.timeslot.is_available)
@@ -96,10 +104,163 @@ class ViewTests(TestCase):
 
         self.client.login(username='clientuser', password='testpass123')
         response = self.client.post(self.make_appointment_url, {
-            'timeslot': self.timeslot.id,
+            'coach': self.coach_user.pk,
+            'timeslot': f"{self.timeslot.date:%Y-%m-%d} 10:00",
             'subject': 'Test Fail Subject'
         })
 
         self.assertEqual(response.status_code, 200)
-        self.assertFormError(response, 'form', 'timeslot', 'Ce créneau est déjà réservé.')
+        self.assertFormError(
+            response.context['form'], 'timeslot',
+            'That slot was just booked. Please pick another.',
+        )
         self.assertEqual(Session.objects.count(), 0)
+
+
+class DashboardQueryTests(TestCase):
+    def setUp(self):
+        self.coach_user = CustomUser.objects.create_user(
+            username='coachuser', password='testpass123', is_coach=True
+        )
+        self.client_user = CustomUser.objects.create_user(
+            username='clientuser', password='testpass123'
+        )
+        self.today = timezone.now().date()
+        self.next_day = 0
+
+    def add_sessions(self, n, days_from_today, coach=None):
+        # one session per day, 09:00, walking away from today
+        slots = []
+        for _ in range(n):
+            self.next_day += 1
+            day = self.today + timedelta(days=self.next_day * days_from_today)
+            slots.append(TimeSlot(
+                coach=coach or self.coach_user, date=day, start_time=time(9, 0), is_available=False
+            ))
+        slots = TimeSlot.objects.bulk_create(slots)
+        Session.objects.bulk_create(
+            Session(client=self.client_user, timeslot=slot, subject='s') for slot in slots
+        )
+
+    def dashboard_queries(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_sessions(self):
+        for user in (self.coach_user, self.client_user):
+            self.add_sessions(1, days_from_today=1)
+            self.add_sessions(1, days_from_today=-1)
+            _, few = self.dashboard_queries(user)
+
+            self.add_sessions(60, days_from_today=1)
+            self.add_sessions(60, days_from_today=-1)
+            _, many = self.dashboard_queries(user)
+
+            self.assertEqual(few, many)
+
+    def test_sessions_split_and_past_paginated(self):
+        self.add_sessions(3, days_from_today=1)
+        self.add_sessions(25, days_from_today=-1)
+        response, _ = self.dashboard_queries(self.coach_user)
+
+        upcoming = response.context['upcoming_sessions']
+        past = response.context['past_sessions']
+        self.assertEqual(len(upcoming), 3)
+        self.assertTrue(all(s.timeslot.date > self.today for s in upcoming))
+        self.assertEqual(upcoming[0].timeslot.date, self.today + timedelta(days=1))
+        self.assertEqual(past.paginator.count, 25)
+        self.assertEqual(len(past), 20)
+        # most recent first
+        self.assertGreater(past[0].timeslot.date, past[1].timeslot.date)
+
+        response = self.client.get(reverse('dashboard'), {'past_page': 2})
+        self.assertEqual(len(response.context['past_sessions']), 5)
+
+    def test_past_sessions_are_paged_by_the_database(self):
+        self.add_sessions(45, days_from_today=-1)
+        self.client.force_login(self.client_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'), {'past_page': 2})
+        past = response.context['past_sessions']
+        self.assertEqual([s.timeslot.date for s in past], [
+            self.today - timedelta(days=n) for n in range(21, 41)
+        ])
+        # one page of rows fetched, not the whole history
+        page_query, = [q['sql'] for q in queries.captured_queries if 'LIMIT 20' in q['sql']]
+        self.assertIn('OFFSET 20', page_query)
+
+    def test_coach_sees_only_their_sessions(self):
+        other = CustomUser.objects.create_user(username='coach2', password='testpass123', is_coach=True)
+        self.add_sessions(2, days_from_today=1)
+        self.add_sessions(3, days_from_today=1, coach=other)
+        response, _ = self.dashboard_queries(other)
+        self.assertEqual(len(response.context['upcoming_sessions']), 3)
+        self.assertTrue(all(s.coach_id == other.pk for s in response.context['upcoming_sessions']))
+
+
+class TimeSlotCalendarViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = timezone.now().date()
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 0))
+        self.url = reverse('timeslot_calendar')
+        self.params = {'coach': self.coach.pk, 'date': self.day.isoformat()}
+
+    def test_lists_slots_for_the_date(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'calendar/timeslot_list.html')
+        self.assertEqual([s.id for s in response.context['timeslots']], [self.slot.id])
+        self.assertContains(response, 'Available')
+
+    def test_other_coaches_slots_are_not_listed(self):
+        other = CustomUser.objects.create_user(username='coach2', password='testpass123', is_coach=True)
+        TimeSlot.objects.create(coach=other, date=self.day, start_time=time(11, 0))
+        response = self.client.get(self.url, self.params)
+        self.assertEqual([s.id for s in response.context['timeslots']], [self.slot.id])
+
+    def test_second_render_hits_the_cache(self):
+        self.client.get(self.url, self.params)
+        # the coach lookup and the coach <select>, none for the slots
+        with self.assertNumQueries(2):
+            self.client.get(self.url, self.params)
+
+    def test_revalidation_until_the_date_changes(self):
+        response = self.client.get(self.url, self.params)
+        etag = response['ETag']
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        user = CustomUser.objects.create_user(username='clientuser', password='testpass123')
+        book_timeslot(client=user, timeslot=self.slot, subject='Intro')
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Booked')
+
+    def test_moved_slots_leave_their_old_day(self):
+        tomorrow = self.day + timedelta(days=1)
+        other = CustomUser.objects.create_user(username='coach2', password='testpass123', is_coach=True)
+        self.client.get(self.url, self.params)
+        self.client.get(self.url, {'coach': other.pk, 'date': tomorrow.isoformat()})
+
+        slot = TimeSlot.objects.get(pk=self.slot.pk)
+        slot.date = tomorrow
+        slot.save()
+        self.assertEqual(day_availability(self.coach.pk, self.day).slots, ())
+        self.assertEqual([s.id for s in day_availability(self.coach.pk, tomorrow).slots], [slot.id])
+
+        slot.coach = other
+        slot.save()
+        self.assertEqual(day_availability(self.coach.pk, tomorrow).slots, ())
+        response = self.client.get(self.url, {'coach': other.pk, 'date': tomorrow.isoformat()})
+        self.assertEqual([s.id for s in response.context['timeslots']], [slot.id])
+
+    def test_without_a_date(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['selected_date'], self.day)
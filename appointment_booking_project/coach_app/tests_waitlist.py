@@ -0,0 +1,143 @@
+from datetime import date, time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from coach_app.booking import book_timeslot
+from coach_app.models import CustomUser, Session, SlotOpening, TimeSlot, WaitlistEntry
+from coach_app.waitlist import process_openings
+
+
+class WaitlistTests(TestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        self.carol = CustomUser.objects.create_user(username='carol', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 0))
+        self.session = book_timeslot(client=self.alice, timeslot=self.slot, subject='Intro')
+
+    def wait(self, client, **kwargs):
+        return WaitlistEntry.objects.create(
+            client=client, coach=self.coach, date=self.day, subject='Waiting', **kwargs
+        )
+
+    def test_cancelling_reopens_the_slot_and_queues_it(self):
+        self.session.delete()
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_available)
+        self.assertEqual(SlotOpening.objects.get().timeslot_id, self.slot.pk)
+
+    def test_a_rolled_back_cancellation_changes_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.session.delete()
+            raise RuntimeError
+        self.slot.refresh_from_db()
+        self.assertFalse(self.slot.is_available)
+        self.assertFalse(SlotOpening.objects.exists())
+
+    def test_queryset_deletes_reopen_too(self):
+        Session.objects.filter(client=self.alice).delete()
+        self.assertTrue(TimeSlot.objects.get().is_available)
+        self.assertEqual(SlotOpening.objects.count(), 1)
+
+    def test_priority_then_first_come(self):
+        self.wait(self.bob)
+        carol = self.wait(self.carol, priority=1)
+        self.session.delete()
+        self.assertEqual(process_openings(), (1, 1))
+
+        carol.refresh_from_db()
+        self.assertEqual(carol.status, WaitlistEntry.Status.BOOKED)
+        self.assertEqual(carol.session.client, self.carol)
+        self.assertEqual(carol.session.timeslot_id, self.slot.pk)
+        self.assertFalse(TimeSlot.objects.get().is_available)
+        self.assertEqual(WaitlistEntry.objects.get(client=self.bob).status, WaitlistEntry.Status.WAITING)
+        self.assertFalse(SlotOpening.objects.exists())
+
+    def test_first_come_first_served(self):
+        bob = self.wait(self.bob)
+        self.wait(self.carol)
+        self.session.delete()
+        process_openings()
+        bob.refresh_from_db()
+        self.assertEqual(bob.status, WaitlistEntry.Status.BOOKED)
+
+    def test_time_window_and_withdrawn_entries(self):
+        self.wait(self.bob, earliest=time(11, 0))
+        self.wait(self.carol, status=WaitlistEntry.Status.WITHDRAWN)
+        self.session.delete()
+        self.assertEqual(process_openings(), (1, 0))
+        self.assertTrue(TimeSlot.objects.get().is_available)
+
+    def test_a_slot_booked_meanwhile_stays_with_its_client(self):
+        entry = self.wait(self.bob)
+        self.session.delete()
+        book_timeslot(client=self.carol, timeslot=TimeSlot.objects.get(), subject='Quick')
+        self.assertEqual(process_openings(), (1, 0))
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, WaitlistEntry.Status.WAITING)
+        self.assertEqual(Session.objects.get().client, self.carol)
+
+    def test_deleted_slots_are_dropped(self):
+        self.wait(self.bob)
+        self.slot.delete()
+        self.assertEqual(process_openings(), (1, 0))
+        self.assertFalse(SlotOpening.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+    def test_worker_command(self):
+        self.wait(self.bob)
+        self.session.delete()
+        out = StringIO()
+        call_command('process_waitlist', '--once', stdout=out)
+        self.assertIn("Processed 1 openings, booked 1 sessions", out.getvalue())
+        self.assertEqual(Session.objects.get().client, self.bob)
+
+
+class WaitlistAPITests(APITestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='testpass123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='testpass123')
+        self.coach = CustomUser.objects.create_user(username='coach', password='testpass123', is_coach=True)
+        self.slot = TimeSlot.objects.create(coach=self.coach, date=self.day, start_time=time(10, 0))
+
+    def join(self, **extra):
+        return self.client.post('/api/waitlist/', {
+            'client': self.bob.pk, 'coach': self.coach.pk, 'date': '2030-01-07', 'subject': 'Any time',
+            **extra,
+        }, format='json')
+
+    def test_no_waiting_for_a_free_slot(self):
+        response = self.join()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("10:00 is free", response.data['date'][0])
+        self.assertEqual(self.join(earliest='11:00').status_code, 201)
+
+    def test_cancel_through_the_api(self):
+        session = book_timeslot(client=self.alice, timeslot=self.slot, subject='Intro')
+        response = self.join()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'waiting')
+
+        self.assertEqual(self.client.delete(f'/api/sessions/{session.pk}/').status_code, 204)
+        process_openings()
+        entry = self.client.get(f"/api/waitlist/{response.data['id']}/").data
+        self.assertEqual(entry['status'], 'booked')
+        self.assertEqual(Session.objects.get(pk=entry['session']).client, self.bob)
+
+    def test_bad_window(self):
+        book_timeslot(client=self.alice, timeslot=self.slot, subject='Intro')
+        response = self.join(earliest='12:00', latest='11:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('latest', response.data)
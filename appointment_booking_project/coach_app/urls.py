@@ -14,6 +14,9 @@ urlpatterns = [
 
     path('dashboard/', views.dashboard, name='dashboard'),
     path('appointment/', views.make_appointment, name='make_appointment'),
+    path('calendar/', views.timeslot_calendar_view, name='timeslot_calendar'),
+    path('calendar/stream/', views.availability_stream, name='availability_stream'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
     
     path('session/<int:session_id>/edit-notes/', views.edit_notes, name='edit_notes')
 
@@ -1,21 +1,35 @@
-from datetime import date as date_today
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, LogoutView
-from django.http import HttpResponseForbidden
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse_lazy
-from django.utils.timezone import now
-
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.timezone import localdate, now
+
+from . import live
+from .availability import day_availability
+from .booking import SlotUnavailable
+from .feeds import InvalidToken, feed_state, feed_token, feed_user_id, render_feed
 from .forms import (
     CoachNotesForm,
     CustomUserCreationForm,
     DateSelectionForm,
     SessionForm,          # <- now the new Form, not ModelForm
 )
-from .models import CustomUser, Session, TimeSlot
+from .models import CustomUser, Session
 
 
 # ─────────────────────────────────────────────
@@ -58,56 +72,53 @@ def signup(request):
 
 
 # ─────────────────────────────────────────────
-# Dashboard (unchanged)
+# Dashboard
 # ─────────────────────────────────────────────
+PAST_SESSIONS_PER_PAGE = 20
+
+
 @login_required
 def dashboard(request):
     user = request.user
     current_time = now()
 
-    if user.is_coach or user.is_superuser:
-        upcoming_sessions = (
-            Session.objects.filter(timeslot__date__gt=current_time.date())
-            | Session.objects.filter(
-                timeslot__date=current_time.date(), timeslot__start_time__gte=current_time.time()
-            )
-        )
-        past_sessions = (
-            Session.objects.filter(timeslot__date__lt=current_time.date())
-            | Session.objects.filter(
-                timeslot__date=current_time.date(), timeslot__start_time__lt=current_time.time()
-            )
-        )
+    # the timeslot and client joined in, and only the columns the templates use
+    sessions = Session.objects.select_related("timeslot", "client").only(
+        "subject",
+        "notes_coach",
+        "timeslot__date",
+        "timeslot__start_time",
+        "timeslot__start_at",
+        "client__username",
+    )
+    if user.is_superuser:
+        template = "dashboard_coach.html"
+    elif user.is_coach:
+        # the coach's own sessions, on Session.coach: no join to filter
+        sessions = sessions.filter(coach=user)
         template = "dashboard_coach.html"
     else:
-        upcoming_sessions = (
-            Session.objects.filter(client=user, timeslot__date__gt=current_time.date())
-            | Session.objects.filter(
-                client=user,
-                timeslot__date=current_time.date(),
-                timeslot__start_time__gte=current_time.time(),
-            )
-        )
-        past_sessions = (
-            Session.objects.filter(client=user, timeslot__date__lt=current_time.date())
-            | Session.objects.filter(
-                client=user,
-                timeslot__date=current_time.date(),
-                timeslot__start_time__lt=current_time.time(),
-            )
-        )
+        sessions = sessions.filter(client=user)
         template = "dashboard_client.html"
 
+    # two indexed range scans on the denormalized start: the upcoming
+    # sessions in full, and one page of history, newest first, counted and
+    # sliced by the database
+    upcoming_sessions = list(
+        sessions.filter(timeslot__start_at__gte=current_time).order_by("timeslot__start_at")
+    )
+    past_sessions = Paginator(
+        sessions.filter(timeslot__start_at__lt=current_time).order_by("-timeslot__start_at"),
+        PAST_SESSIONS_PER_PAGE,
+    ).get_page(request.GET.get("past_page"))
+
     return render(
         request,
         template,
         {
-            "upcoming_sessions": upcoming_sessions.order_by(
-                "timeslot__date", "timeslot__start_time"
-            ),
-            "past_sessions": past_sessions.order_by(
-                "-timeslot__date", "-timeslot__start_time"
-            ),
+            "upcoming_sessions": upcoming_sessions,
+            "past_sessions": past_sessions,
+            "feed_url": request.build_absolute_uri(reverse("calendar_feed", args=[feed_token(user)])),
         },
     )
 
@@ -120,11 +131,15 @@ def make_appointment(request):
     if request.method == "POST":
         form = SessionForm(request.POST)
         if form.is_valid():
-            form.save(client=request.user)
-            messages.success(request, "Your session has been booked ✔")
-            return redirect("dashboard")
-        else:
-            messages.error(request, "Please fix the errors below.")
+            try:
+                form.save(client=request.user)
+            except SlotUnavailable as exc:
+                # lost the race for the slot after validation
+                form.add_error("timeslot", str(exc))
+            else:
+                messages.success(request, "Your session has been booked ✔")
+                return redirect("dashboard")
+        messages.error(request, "Please fix the errors below.")
     else:
         form = SessionForm()
 
@@ -136,30 +151,87 @@ def make_appointment(request):
 # ─────────────────────────────────────────────
 def timeslot_calendar_view(request):
     form = DateSelectionForm(request.GET or None)
-    timeslots = []
-
-    selected_date = None
-    if form.is_valid():
-        selected_date = form.cleaned_data["date"]
-        timeslots = TimeSlot.objects.filter(date=selected_date).order_by("start_time")
+    if not form.is_valid():
+        return render(
+            request,
+            "calendar/timeslot_list.html",
+            {"form": form, "timeslots": [], "selected_date": now().date()},
+        )
 
-    return render(
-        request,
-        "calendar/timeslot_list.html",
-        {
-            "form": form,
-            "timeslots": timeslots,
-            "selected_date": selected_date or date_today(),
-        },
+    # served from the per-coach, per-date availability cache; the ETag /
+    # Last-Modified pair only changes when a slot or session on that date does
+    selected_date = form.cleaned_data["date"]
+    day = day_availability(form.cleaned_data["coach"].pk, selected_date)
+    response = get_conditional_response(
+        request, etag=day.etag, last_modified=int(day.modified)
     )
+    if response is None:
+        response = render(
+            request,
+            "calendar/timeslot_list.html",
+            {"form": form, "timeslots": day.slots, "selected_date": selected_date},
+        )
+    response.headers["ETag"] = day.etag
+    response.headers["Last-Modified"] = http_date(day.modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+POLL_RETRY_MS = 10_000  # how often a browser asks again when not served over ASGI
+
+
+async def availability_stream(request):
+    """
+    The slots of ?coach= on ?date= as Server-Sent Events, sent again after
+    every change to that day (see coach_app.live), so the booking page
+    never offers a slot that is already taken. An open stream only holds a
+    queue: serve it through asgi.py. Under WSGI, where it would hold a
+    worker, the slots are sent once and the browser told to ask again in
+    POLL_RETRY_MS.
+    """
+    form = DateSelectionForm(request.GET)
+    if not await sync_to_async(form.is_valid)():
+        return HttpResponseBadRequest("Pick a coach and a date.")
+    coach_id, day = form.cleaned_data["coach"].pk, form.cleaned_data["date"]
+    if isinstance(request, ASGIRequest):
+        events = live.stream(coach_id, day)
+    else:
+        payload = await sync_to_async(live.day_payload)(coach_id, day)
+        events = [f"retry: {POLL_RETRY_MS}\n" + live.sse(payload, "slots")]
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy hold the events back
+    return response
+
+
+def calendar_feed(request, token):
+    """
+    The user's sessions as an iCalendar feed, for calendar apps to
+    subscribe to. The ETag is checked before anything is read but the
+    latest change times (see feeds.feed_state), so a poll finding nothing
+    new costs one query and gets a 304.
+    """
+    try:
+        user_id = feed_user_id(token)
+    except InvalidToken:
+        raise Http404("No such calendar.")
+    # the feed's window moves with the date
+    etag = feed_state(user_id, localdate())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        user = get_object_or_404(CustomUser, pk=user_id)
+        response = HttpResponse(render_feed(user), content_type="text/calendar; charset=utf-8")
+    response.headers["ETag"] = etag
+    patch_cache_control(response, no_cache=True, private=True)
+    return response
 
 
 @login_required
 def edit_notes(request, session_id):
     session = get_object_or_404(Session, id=session_id)
 
-    if not request.user.is_coach:
-        return HttpResponseForbidden("Only coaches can edit notes.")
+    if session.coach_id != request.user.pk:
+        return HttpResponseForbidden("Only the session's coach can edit notes.")
 
     if request.method == "POST":
         form = CoachNotesForm(request.POST, instance=session)
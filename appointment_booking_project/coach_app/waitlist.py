@@ -0,0 +1,102 @@
+"""
+Waitlist allocation for cancelled sessions.
+
+Deleting a Session (SessionViewSet.destroy, the admin, a cascade) calls
+release() from a post_delete signal, inside the deleting transaction: the
+slot is made available again and a SlotOpening is queued, both or
+neither. Allocation runs outside the request, in the worker
+(manage.py process_waitlist), which books each opening for the first
+matching waiting entry: highest priority first, then first come, first
+served. A waitlisted client is booked without asking, so there is nothing
+for them to poll.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .booking import SlotUnavailable, book_timeslot
+from .models import SlotOpening, TimeSlot, WaitlistEntry
+
+logger = logging.getLogger(__name__)
+
+
+def release(timeslot_id):
+    """Puts slot `timeslot_id` back on offer and queues it for the waitlist."""
+    TimeSlot.objects.filter(pk=timeslot_id).update(is_available=True)
+    SlotOpening.objects.create(timeslot_id=timeslot_id)
+
+
+def waiting_for(slot):
+    """The waiting entries `slot` suits, in the order they are served."""
+    return (
+        WaitlistEntry.objects.filter(
+            coach_id=slot.coach_id, date=slot.date, status=WaitlistEntry.Status.WAITING
+        )
+        .filter(Q(earliest__isnull=True) | Q(earliest__lte=slot.start_time))
+        .filter(Q(latest__isnull=True) | Q(latest__gte=slot.start_time))
+        .select_related('client')
+        .order_by('-priority', 'created_at', 'id')
+    )
+
+
+def allocate(timeslot_id):
+    """
+    Books slot `timeslot_id` for the first waiting entry it suits and
+    returns that entry, or None if the slot is gone, taken, already
+    started or wanted by nobody.
+
+    An entry is claimed with a conditional UPDATE ... WHERE status =
+    'waiting' in the booking's transaction, so an entry withdrawn or served
+    meanwhile is skipped and a failed booking un-claims it.
+    """
+    slot = (
+        TimeSlot.objects.select_related('coach')
+        .filter(pk=timeslot_id, is_available=True, start_at__gt=timezone.now())
+        .first()
+    )
+    if slot is None:
+        return None
+    for entry in waiting_for(slot):
+        try:
+            with transaction.atomic():
+                claimed = WaitlistEntry.objects.filter(
+                    pk=entry.pk, status=WaitlistEntry.Status.WAITING
+                ).update(status=WaitlistEntry.Status.BOOKED)
+                if not claimed:
+                    continue
+                entry.session = book_timeslot(client=entry.client, timeslot=slot, subject=entry.subject)
+                entry.status = WaitlistEntry.Status.BOOKED
+                entry.save(update_fields=['session', 'status'])
+        except SlotUnavailable:
+            # booked again, or too close to another session: the next
+            # entry would get the same answer
+            return None
+        return entry
+    return None
+
+
+def process_openings(limit=100):
+    """
+    Allocates up to `limit` queued openings, oldest first, and returns
+    (openings processed, sessions booked).
+
+    Deleting an opening is how a worker claims it, in the transaction that
+    books the slot: of several workers only one deletes the row, and an
+    allocation that fails puts it back. An opening that raises is logged
+    and dropped; its slot stays on offer to everyone.
+    """
+    processed = booked = 0
+    for opening_id, timeslot_id in SlotOpening.objects.values_list('id', 'timeslot_id')[:limit]:
+        try:
+            with transaction.atomic():
+                if not SlotOpening.objects.filter(pk=opening_id).delete()[0]:
+                    continue  # another worker has it
+                processed += 1
+                if allocate(timeslot_id) is not None:
+                    booked += 1
+        except Exception:
+            logger.exception("Could not allocate slot %s to the waitlist", timeslot_id)
+            SlotOpening.objects.filter(pk=opening_id).delete()
+    return processed, booked
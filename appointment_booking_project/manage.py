@@ -7,7 +7,7 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault(
-        "DJANGO_SETTINGS_MODULE", "appointment_booking_project.settings"
+        "DJANGO_SETTINGS_MODULE", "appointment_booking_project.settings.development"
     )
     try:
         from django.core.management import execute_from_command_line